@@ -0,0 +1,330 @@
+"""
+Consultas permanentes (alertas): en vez de sondear /search, los temas guardados se
+evalúan contra cada lote de artículos recién indexados y las coincidencias se empujan.
+
+- Registro: embeddings de las consultas en una matriz NumPy (n, d) + umbral por fila.
+  Cada lote indexado (index_many / UpsertStage) se puntúa contra TODAS las consultas
+  con un solo producto matricial; un artículo troceado puntúa con su mejor pasaje.
+- Entrega: stream SSE (GET /alerts/stream, colas acotadas por suscriptor) y webhook
+  por consulta (o ALERTS_WEBHOOK_URL) con un POST por consulta y lote, en segundo plano.
+- Cada (consulta, url) se notifica una sola vez por proceso (re-ingestas del mismo feed).
+
+ALERTS_REGISTRY persiste las consultas en JSON y es lo que las comparte entre procesos
+(varios workers de la API, worker standalone python -m ingest.worker): cada uno ve las
+altas/bajas de los demás. Sin él, las consultas son locales a cada proceso. El SSE sólo
+ve lo que indexa el propio proceso.
+"""
+import datetime as dt
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+import urllib.request
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter
+
+log = logging.getLogger(__name__)
+
+ALERTS_REGISTRY = os.getenv("ALERTS_REGISTRY", "").strip()
+ALERTS_DEFAULT_THRESHOLD = float(os.getenv("ALERTS_DEFAULT_THRESHOLD", "0.55"))
+ALERTS_MAX = int(os.getenv("ALERTS_MAX", "10000"))
+ALERTS_WEBHOOK_URL = os.getenv("ALERTS_WEBHOOK_URL", "").strip()
+ALERTS_WEBHOOK_TIMEOUT = float(os.getenv("ALERTS_WEBHOOK_TIMEOUT", "5"))
+ALERTS_STREAM_QUEUE = int(os.getenv("ALERTS_STREAM_QUEUE", "1000"))
+ALERTS_SEEN_SIZE = int(os.getenv("ALERTS_SEEN_SIZE", "100000"))
+
+ALERTS_MATCHED = Counter("alerts_matched_total", "Coincidencias de consultas permanentes")
+ALERTS_DROPPED = Counter("alerts_dropped_total", "Alertas descartadas (suscriptor SSE lento)")
+ALERTS_WEBHOOK_ERRORS = Counter("alerts_webhook_errors_total", "Webhooks de alertas fallidos")
+
+
+@dataclass
+class StandingQuery:
+    q: str
+    threshold: float = ALERTS_DEFAULT_THRESHOLD
+    source: Optional[str] = None
+    webhook: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    created_at: str = field(default_factory=lambda: dt.datetime.now(dt.timezone.utc).isoformat())
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """Consultas + matriz (n, d) + umbrales; se reemplaza entera, nunca se modifica."""
+
+    queries: Tuple[StandingQuery, ...] = ()
+    matrix: Optional[np.ndarray] = None
+    thresholds: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float32))
+
+
+# -----------------------------------
+# Registro (matriz de consultas)
+# -----------------------------------
+class AlertRegistry:
+    """
+    Consultas permanentes + su matriz de embeddings. Las lecturas (match) toman la
+    instantánea vigente (_Snapshot); altas/bajas publican una nueva en una sola asignación.
+
+    Con 'path' el archivo es la fuente de verdad entre procesos (workers de uvicorn /
+    api.serve, worker de ingesta): altas/bajas releen y fusionan bajo flock antes de
+    escribir, y cada lectura recarga si cambió el mtime (sólo se embeben las consultas
+    nuevas). Sin 'path' el registro vive en este proceso: usar un solo worker.
+    """
+
+    def __init__(self, embed: Optional[Callable[[List[str]], np.ndarray]] = None, path: str = ALERTS_REGISTRY):
+        if embed is None:
+            from embedding.provider import embed_texts
+
+            embed = embed_texts
+        self._embed = embed
+        self.path = path
+        self._lock = threading.Lock()
+        self._snap = _Snapshot()
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._seen: "OrderedDict[tuple, None]" = OrderedDict()
+        self._sync()
+
+    def _vectors(self, queries: List[StandingQuery]) -> Optional[np.ndarray]:
+        """Matriz de 'queries' reutilizando las filas ya embebidas (por id)."""
+        if not queries:
+            return None
+        snap = self._snap
+        known = {x.id: i for i, x in enumerate(snap.queries)}
+        todo = [x.q for x in queries if x.id not in known]
+        fresh: Iterator[np.ndarray] = iter(np.asarray(self._embed(todo), dtype=np.float32) if todo else [])
+        rows = [snap.matrix[known[x.id]] if x.id in known and snap.matrix is not None else next(fresh) for x in queries]
+        return np.vstack(rows).astype(np.float32)
+
+    def _publish(self, queries: List[StandingQuery]) -> None:
+        self._snap = _Snapshot(
+            queries=tuple(queries),
+            matrix=self._vectors(queries),
+            thresholds=np.asarray([x.threshold for x in queries], dtype=np.float32),
+        )
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        # os.replace en cada escritura: el inodo cambia aunque mtime/tamaño coincidan
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _read(self) -> List[StandingQuery]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            return [StandingQuery(**x) for x in json.load(f)]
+
+    def _sync(self) -> None:
+        """Recarga desde 'path' si otro proceso lo modificó."""
+        if not self.path or self._file_stamp() == self._stamp:
+            return
+        with self._lock, self._file_lock(shared=True):
+            stamp = self._file_stamp()
+            if stamp != self._stamp:
+                self._publish(self._read())
+                self._stamp = stamp
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False) -> Iterator[None]:
+        if not self.path:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _update(self, change: Callable[[List[StandingQuery]], List[StandingQuery]]) -> None:
+        """Lee (lo último del archivo), aplica 'change', escribe y publica, todo bajo flock."""
+        with self._lock, self._file_lock():
+            current = self._read() if self.path else list(self._snap.queries)
+            queries = change(current)
+            if self.path:
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump([asdict(x) for x in queries], f, ensure_ascii=False, indent=2)
+                os.replace(tmp, self.path)
+                self._stamp = self._file_stamp()
+            self._publish(queries)
+
+    def __len__(self) -> int:
+        self._sync()
+        return len(self._snap.queries)
+
+    def list(self) -> List[StandingQuery]:
+        self._sync()
+        return list(self._snap.queries)
+
+    def get(self, query_id: str) -> Optional[StandingQuery]:
+        return next((x for x in self.list() if x.id == query_id), None)
+
+    def add(self, sq: StandingQuery) -> StandingQuery:
+        def change(current: List[StandingQuery]) -> List[StandingQuery]:
+            if len(current) >= ALERTS_MAX:
+                raise ValueError(f"Máximo de consultas permanentes alcanzado ({ALERTS_MAX})")
+            return current + [sq]
+
+        self._update(change)
+        return sq
+
+    def remove(self, query_id: str) -> bool:
+        removed = False
+
+        def change(current: List[StandingQuery]) -> List[StandingQuery]:
+            nonlocal removed
+            keep = [x for x in current if x.id != query_id]
+            removed = len(keep) < len(current)
+            return keep
+
+        self._update(change)
+        return removed
+
+    def _first_time(self, key: tuple) -> bool:
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen[key] = None
+            while len(self._seen) > ALERTS_SEEN_SIZE:
+                self._seen.popitem(last=False)
+            return True
+
+    def match(self, points: List[Any]) -> List[Dict]:
+        """
+        Puntúa los puntos recién indexados (con vector y payload) contra todas las
+        consultas. Devuelve una coincidencia por (consulta, artículo) sobre el umbral.
+        """
+        self._sync()
+        snap = self._snap
+        queries, matrix, thresholds = snap.queries, snap.matrix, snap.thresholds
+        if matrix is None or not points:
+            return []
+        # Artículo = parent_id (pasajes) o el propio id; el artículo usa el payload de su cabeza
+        keys = [str((p.payload or {}).get("parent_id") or p.id) for p in points]
+        articles = list(dict.fromkeys(keys))
+        row = {k: i for i, k in enumerate(articles)}
+        heads: Dict[str, Dict] = {}
+        for k, p in zip(keys, points, strict=True):
+            if not (p.payload or {}).get("chunk_index"):
+                heads[k] = p.payload or {}
+
+        V = np.asarray([p.vector for p in points], dtype=np.float32)
+        scores = np.full((len(articles), len(queries)), -np.inf, dtype=np.float32)
+        np.maximum.at(scores, np.asarray([row[k] for k in keys]), V @ matrix.T)
+
+        out: List[Dict] = []
+        for a, qi in zip(*np.nonzero(scores >= thresholds), strict=True):
+            p, sq = heads.get(articles[a], {}), queries[qi]
+            # Los casi-duplicados enlazados ya alertaron a través de su original
+            if p.get("canonical_id") not in (None, articles[a]):
+                continue
+            if sq.source and p.get("source") != sq.source:
+                continue
+            if not self._first_time((sq.id, p.get("url") or articles[a])):
+                continue
+            published = p.get("published_at")
+            out.append({
+                "query_id": sq.id,
+                "q": sq.q,
+                "score": float(scores[a, qi]),
+                "title": p.get("title"),
+                "url": p.get("url"),
+                "source": p.get("source"),
+                "published_at": published.isoformat() if isinstance(published, dt.datetime) else published,
+            })
+        return out
+
+
+# -----------------------------------
+# Entrega: SSE + webhooks
+# -----------------------------------
+class AlertHub:
+    """Difunde coincidencias a suscriptores SSE (colas acotadas) y a webhooks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[queue.Queue] = []
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="alerts-webhook")
+
+    def subscribe(self) -> "queue.Queue":
+        q: queue.Queue = queue.Queue(maxsize=ALERTS_STREAM_QUEUE)
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: "queue.Queue") -> None:
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def publish(self, matches: List[Dict], queries: Dict[str, StandingQuery]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for m in matches:
+            for q in subscribers:
+                try:
+                    q.put_nowait(m)
+                except queue.Full:
+                    ALERTS_DROPPED.inc()
+        by_hook: Dict[tuple, List[Dict]] = {}
+        for m in matches:
+            sq = queries.get(m["query_id"])
+            url = (sq.webhook if sq else None) or ALERTS_WEBHOOK_URL
+            if url:
+                by_hook.setdefault((url, m["query_id"]), []).append(m)
+        for (url, query_id), items in by_hook.items():
+            self._pool.submit(_post_webhook, url, {"query_id": query_id, "q": items[0]["q"], "matches": items})
+
+
+def _post_webhook(url: str, body: Dict) -> None:
+    req = urllib.request.Request(
+        url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=ALERTS_WEBHOOK_TIMEOUT) as resp:
+            resp.read()
+    except Exception as e:
+        ALERTS_WEBHOOK_ERRORS.inc()
+        log.warning("Webhook de alertas %s falló: %s", url, e)
+
+
+@lru_cache(maxsize=1)
+def registry() -> AlertRegistry:
+    return AlertRegistry()
+
+
+@lru_cache(maxsize=1)
+def hub() -> AlertHub:
+    return AlertHub()
+
+
+def notify_indexed(points: List[Any]) -> List[Dict]:
+    """
+    Hook post-upsert: evalúa el lote contra las consultas permanentes y empuja las
+    coincidencias. Nunca propaga errores a la ingesta. Devuelve las coincidencias.
+    """
+    try:
+        reg = registry()
+        if not len(reg):
+            return []
+        matches = reg.match(points)
+        if matches:
+            ALERTS_MATCHED.inc(len(matches))
+            hub().publish(matches, {x.id: x for x in reg.list()})
+        return matches
+    except Exception as e:
+        log.warning("No se pudieron evaluar las alertas: %s", e)
+        return []
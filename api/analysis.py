@@ -1,13 +1,18 @@
 from __future__ import annotations
 from typing import List, Dict, Tuple, Optional
 import datetime as dt
+import os
 from collections import Counter, defaultdict
 
 import numpy as np
 from sklearn.cluster import AgglomerativeClustering
-from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy import sparse  # type: ignore[import-untyped]
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize  # type: ignore[import-untyped]
 import spacy
 
+from .timing import timed
+
 # Modelo spaCy (ligero y en español). Cárgalo una vez.
 # En Docker instalaremos es_core_news_md.
 try:
@@ -19,7 +24,7 @@ except Exception:
 _POS = set(["bueno","positiva","beneficio","mejora","avance","exitoso","crecimiento","favorable"])
 _NEG = set(["malo","negativa","crisis","caída","retroceso","fracaso","escándalo","riesgo"])
 
-def _sentiment_score(text: str) -> float:
+def lexicon_score(text: str) -> float:
     tokens = [t.lower() for t in text.split()]
     pos = sum(t in _POS for t in tokens)
     neg = sum(t in _NEG for t in tokens)
@@ -27,6 +32,7 @@ def _sentiment_score(text: str) -> float:
         return 0.0
     return (pos - neg) / max(1, pos + neg)
 
+@timed("ner")
 def extract_entities(text: str) -> List[Tuple[str,str]]:
     """Devuelve [(label, type)] con types normalizados: PERSON, ORG, LOC, MISC"""
     doc = _NLP(text[:20000])  # recorta por seguridad
@@ -37,30 +43,155 @@ def extract_entities(text: str) -> List[Tuple[str,str]]:
         ents.append((e.text.strip(), t))
     return ents
 
-def tfidf_top_terms(texts: List[str], k: int = 10) -> List[str]:
+class TermModel:
+    """
+    Vocabulario (uni+bigramas) y document frequency a nivel corpus para TF-IDF.
+    Se ajusta sobre una muestra de la colección y se actualiza incrementalmente al
+    indexar (sólo df de términos ya en el vocabulario; los nuevos entran al re-ajustar).
+    """
+
+    def __init__(self, vocab_size: int = 2048, min_df: int = 1):
+        self.vocab_size = vocab_size
+        self.min_df = min_df
+        self.n_docs = 0
+        self.df = np.zeros(0, dtype=np.float64)
+        self.terms = np.zeros(0, dtype=object)
+        self._counts: Optional[CountVectorizer] = None
+
+    def fit(self, texts: List[str]) -> "TermModel":
+        cv = CountVectorizer(
+            ngram_range=(1, 2),
+            max_features=self.vocab_size,
+            min_df=min(self.min_df, max(1, len(texts))),
+            binary=True,
+        )
+        try:
+            X = cv.fit_transform(texts)
+        except ValueError:  # vocabulario vacío (textos sin tokens)
+            return self
+        self.df = np.asarray(X.sum(axis=0), dtype=np.float64).ravel()
+        self.n_docs = len(texts)
+        self.terms = cv.get_feature_names_out()
+        self._counts = CountVectorizer(ngram_range=(1, 2), vocabulary=cv.vocabulary_)
+        return self
+
+    @property
+    def fitted(self) -> bool:
+        return self._counts is not None
+
+    def partial_update(self, texts: List[str]) -> None:
+        """Suma la df de 'texts' (nuevos documentos del corpus)."""
+        if self._counts is None or not texts:
+            return
+        X = self._counts.transform(texts)
+        X.data[:] = 1
+        # Reemplazo atómico: los lectores concurrentes ven el array viejo o el nuevo
+        self.df = self.df + np.asarray(X.sum(axis=0), dtype=np.float64).ravel()
+        self.n_docs += len(texts)
+
+    def save(self, path: str) -> None:
+        """Escribe vocabulario y df en 'path' (.npz) de forma atómica (tmp + replace)."""
+        tmp = f"{path}.tmp.{os.getpid()}.npz"
+        np.savez(tmp, terms=np.asarray(self.terms, dtype=str), df=self.df,
+                 meta=np.asarray([self.n_docs, self.vocab_size, self.min_df], dtype=np.int64))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TermModel":
+        with np.load(path) as data:
+            n_docs, vocab_size, min_df = (int(v) for v in data["meta"])
+            model = cls(vocab_size=vocab_size, min_df=min_df)
+            model.terms = data["terms"].astype(object)
+            model.df = data["df"].astype(np.float64)
+        model.n_docs = n_docs
+        if len(model.terms):
+            vocab = {t: i for i, t in enumerate(model.terms)}
+            model._counts = CountVectorizer(ngram_range=(1, 2), vocabulary=vocab)
+        return model
+
+    def idf(self) -> np.ndarray:
+        # Igual que TfidfVectorizer(smooth_idf=True)
+        return np.log((1.0 + self.n_docs) / (1.0 + self.df)) + 1.0
+
+    def transform(self, texts: List[str]) -> sparse.csr_matrix:
+        """TF-IDF (tf crudo * idf del corpus, filas L2-normalizadas) en un solo transform."""
+        if self._counts is None:
+            raise ValueError("TermModel sin ajustar: llama a fit() antes de transform()")
+        X = self._counts.transform(texts).astype(np.float64)
+        X = sparse.csr_matrix(X.multiply(self.idf()))
+        return normalize(X, norm="l2", copy=False)
+
+
+@timed("tfidf")
+def grouped_top_terms(
+    texts: List[str],
+    groups: List[str],
+    k: int = 10,
+    model: Optional[TermModel] = None,
+) -> Dict[str, List[str]]:
+    """
+    Top-k términos por grupo (p. ej. fuente): un único transform TF-IDF de todos los
+    textos y agregación por grupo con una matriz dispersa (media de TF-IDF por grupo).
+    Sin 'model' (o sin ajustar) se ajusta uno local sobre los propios textos.
+    """
     if not texts:
-        return []
-    vec = TfidfVectorizer(
-        max_features=2048,
-        ngram_range=(1, 2),
-        min_df=1,
-        norm="l2",
-        use_idf=True,
-        smooth_idf=True,
-        sublinear_tf=False,
-    )
-    X = vec.fit_transform(texts)                 # (n_docs, vocab)
-    scores = np.asarray(X.mean(axis=0)).ravel()  # (vocab,)
-    vocab = vec.get_feature_names_out()          # (vocab,)
-
-    order = np.argsort(scores)[::-1]
-    top = [vocab[i] for i in order[:k] if scores[i] > 0]
-    return top
+        return {}
+    if model is None or not model.fitted:
+        model = TermModel().fit(texts)
+        if not model.fitted:
+            return {g: [] for g in groups}
+    X = model.transform(texts)
+    labels, inv = np.unique(np.asarray(groups, dtype=object), return_inverse=True)
+    sizes = np.bincount(inv)
+    G = sparse.csr_matrix((1.0 / sizes[inv], (inv, np.arange(len(texts)))), shape=(len(labels), len(texts)))
+    S = (G @ X).tocsr()
+
+    out: Dict[str, List[str]] = {}
+    for g, label in enumerate(labels):
+        row = slice(S.indptr[g], S.indptr[g + 1])
+        data, cols = S.data[row], S.indices[row]
+        order = np.argsort(-data, kind="stable")[:k]
+        out[label] = [str(model.terms[cols[i]]) for i in order if data[i] > 0]
+    return out
+
+
+def tfidf_top_terms(texts: List[str], k: int = 10, model: Optional[TermModel] = None) -> List[str]:
+    return grouped_top_terms(texts, [""] * len(texts), k=k, model=model).get("", [])
 
 def cosine_matrix(X: np.ndarray) -> np.ndarray:
     Xn = X / (np.linalg.norm(X, axis=1, keepdims=True) + 1e-9)
     return Xn @ Xn.T
 
+# Maximal Marginal Relevance: relevancia a la consulta vs. redundancia con lo ya elegido
+def mmr_select(query: np.ndarray, candidates: np.ndarray, k: int, lam: float = 0.5) -> List[int]:
+    """
+    Devuelve los índices de hasta k candidatos elegidos por MMR:
+    argmax_i  lam * sim(q, c_i) - (1 - lam) * max_{j elegido} sim(c_i, c_j)
+    Vectorizado: una matriz de similitud y un vector de 'máxima similitud a elegidos'
+    que se actualiza en cada paso (O(k·n)).
+    """
+    n = len(candidates)
+    if n == 0 or k <= 0:
+        return []
+    C = np.asarray(candidates, dtype=np.float32)
+    C = C / (np.linalg.norm(C, axis=1, keepdims=True) + 1e-9)
+    qv = np.asarray(query, dtype=np.float32)
+    qv = qv / (np.linalg.norm(qv) + 1e-9)
+    rel = C @ qv                      # (n,)
+    sim = C @ C.T                     # (n, n)
+    max_red = np.full(n, -np.inf, dtype=np.float32)
+    chosen = np.zeros(n, dtype=bool)
+    out: List[int] = []
+    for _ in range(min(k, n)):
+        red = np.where(np.isfinite(max_red), max_red, 0.0)
+        score = lam * rel - (1.0 - lam) * red
+        score[chosen] = -np.inf
+        i = int(np.argmax(score))
+        out.append(i)
+        chosen[i] = True
+        max_red = np.maximum(max_red, sim[i])
+    return out
+
 # --- Normalización de fechas para evitar naive vs aware ---
 def _to_utc_aware(d: Optional[dt.datetime]) -> Optional[dt.datetime]:
     """Devuelve datetime aware en UTC. Si d es None, retorna None."""
@@ -73,6 +204,7 @@ def _to_utc_aware(d: Optional[dt.datetime]) -> Optional[dt.datetime]:
     return d.astimezone(dt.timezone.utc)
 
 # crear grupos (clusters) de noticias similares y ordenados por fecha para /storyline
+@timed("clustering")
 def storyline_clusters(
     embeddings: List[List[float]],
     titles: List[str],
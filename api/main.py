@@ -1,18 +1,29 @@
+import dataclasses
 import datetime as dt
+import hmac
+import json
+import os
+import queue
 import time
-from typing import Annotated, List, Optional
+from functools import lru_cache
+from typing import Annotated, Any, Dict, List, Literal, Optional
 
-from fastapi import FastAPI, HTTPException, Query
-from pydantic import BaseModel, HttpUrl
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl
 
 from prometheus_fastapi_instrumentator import Instrumentator
 from prometheus_client import Counter, Histogram
 
+from clients import qdrant_client as qc
 from clients.qdrant_client import ensure_collection
-from ingest.rss import ingest_feed
+from ingest.worker import IngestWorker
+from ingest.write_behind import INDEX_WRITE_BEHIND, WriteBehindBuffer
+from api.timing import SERVER_TIMING, start_trace
+from api import alerts, profiling
 
 # Servicio 
-from api.service import index_one, search_query, get_doc_by_url
+from api.service import index_one, search_query, search_queries, similar_docs, get_doc_by_url, get_docs_by_url
 # Builders BONUS
 from api.service import build_storyline, build_perspective, build_graph
 # Schemas BONUS (para response_model)
@@ -42,6 +53,32 @@ class SearchResult(BaseModel):
     score: float
     snippet: Optional[str] = None
     published_at: Optional[dt.datetime] = None
+    duplicates: Optional[List[str]] = None  # URLs agrupadas con collapse=duplicates
+
+
+# Máximo de consultas por POST /search/batch y de URLs por POST /docs
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "256"))
+DOCS_BATCH_MAX = int(os.getenv("DOCS_BATCH_MAX", "1000"))
+
+
+# Una consulta de POST /search/batch (mismos filtros que /search)
+class SearchQuery(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    q: str = Field(min_length=2)
+    k: int = 10
+    title_contains: Optional[str] = None
+    source: Optional[str] = None
+    collapse: Optional[Literal["duplicates"]] = None
+    diversify: bool = False
+    mmr_lambda: float = Field(0.5, alias="lambda", ge=0.0, le=1.0)
+
+
+class SearchBatchIn(BaseModel):
+    queries: List[SearchQuery] = Field(min_length=1, max_length=SEARCH_BATCH_MAX)
+    ef: Optional[int] = Field(None, ge=1)
+    exact: Optional[bool] = None
+    score_threshold: Optional[float] = None
 
 
 # -----------------------------
@@ -54,6 +91,20 @@ SEARCH_LATENCY = Histogram("search_latency_seconds", "Latencia de /search en seg
 
 Instrumentator().instrument(app).expose(app, include_in_schema=False, endpoint="/metrics")
 
+
+# Latencia por etapa (api.timing): un Trace por petición, exportado al terminar
+@app.middleware("http")
+async def _stage_timing(request: Request, call_next):
+    trace = start_trace()
+    response = await call_next(request)
+    if trace.stages:
+        # Template de la ruta ("/doc/{...}") para no disparar la cardinalidad de labels
+        route = request.scope.get("route")
+        trace.observe(getattr(route, "path", None) or request.url.path)
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = trace.server_timing()
+    return response
+
 # -----------------------------
 # Startup: Antes de aceptar tráfico, esperar Qdrant + /metrics
 # -----------------------------
@@ -70,6 +121,15 @@ def _init_collections():
             time.sleep(1 + i * 0.2)
     else:
         raise RuntimeError(f"Qdrant no se pudo inicializar a tiempo: {last}")
+    # Re-encola lo que quedó en el journal de write-behind (si el proceso anterior cayó)
+    if INDEX_WRITE_BEHIND:
+        _index_buffer()
+
+
+@app.on_event("shutdown")
+def _drain_index_buffer():
+    if _index_buffer.cache_info().currsize:
+        _index_buffer().stop()
 
 
 
@@ -86,17 +146,38 @@ def readyz():
     return {"ready": True}
 
 # Se está creando/actualizando recursos (puntos) en la base vectorial
+# Buffer write-behind de /index (INDEX_WRITE_BEHIND): lotes por tamaño/tiempo + journal
+@lru_cache(maxsize=1)
+def _index_buffer() -> WriteBehindBuffer:
+    return WriteBehindBuffer(on_indexed=INDEX_TOTAL.inc).start()
+
+
 @app.post("/index")
 def index_article(item: ArticleIn):
     """
     Indexa un artículo en Qdrant (embedding título+contenido).
     Incrementa métrica INDEX_TOTAL.
+    Con INDEX_WRITE_BEHIND responde 202 al quedar en el journal; se escribe por lotes.
     """
+    if INDEX_WRITE_BEHIND:
+        try:
+            seq = _index_buffer().submit(item.model_dump(mode="json"))
+        except queue.Full:
+            raise HTTPException(status_code=503, detail="Buffer de indexación lleno, reintenta más tarde") from None
+        return JSONResponse(status_code=202, content={"indexed": False, "queued": True, "seq": seq, "url": str(item.url)})
     index_one(item.model_dump())
     INDEX_TOTAL.inc()
     return {"indexed": True, "url": str(item.url)}
 
 
+@app.get("/index/buffer")
+def index_buffer_stats():
+    """Estado del buffer write-behind: pendientes, lag, último seq y checkpoint del journal."""
+    if not INDEX_WRITE_BEHIND:
+        return {"enabled": False}
+    return {"enabled": True, **_index_buffer().stats()}
+
+
 
 @app.get("/search", response_model=List[SearchResult])
 def search(
@@ -104,6 +185,12 @@ def search(
     k: int = 10,
     title_contains: Optional[str] = Query(None, description="Filtro full-text en título"),
     source: Optional[str] = Query(None, description="Fuente exacta (payload.source)"),
+    ef: Optional[int] = Query(None, ge=1, description="hnsw_ef de búsqueda (más alto = más recall, más lento)"),
+    exact: Optional[bool] = Query(None, description="Búsqueda exacta (sin HNSW)"),
+    score_threshold: Optional[float] = Query(None, description="Score mínimo de los resultados"),
+    collapse: Optional[Literal["duplicates"]] = Query(None, description="'duplicates' agrupa casi-duplicados"),
+    diversify: bool = Query(False, description="Re-ranking MMR para diversificar resultados"),
+    mmr_lambda: Annotated[float, Query(alias="lambda", ge=0.0, le=1.0, description="MMR: 1 = relevancia, 0 = diversidad")] = 0.5,
 ):
     """
     Búsqueda semántica con filtros opcionales (title_contains, source).
@@ -114,30 +201,68 @@ def search(
 
     with SEARCH_LATENCY.time():
         results = [SearchResult(**x) for x in search_query(
-            q, k, title_contains=title_contains, source=source
+            q, k, title_contains=title_contains, source=source,
+            ef=ef, exact=exact, score_threshold=score_threshold, collapse=collapse,
+            diversify=diversify, mmr_lambda=mmr_lambda,
         )]
     SEARCH_TOTAL.inc()
     return results
 
 
-@app.api_route("/ingest/feed", methods=["GET", "POST"])
+@app.post("/search/batch", response_model=List[List[SearchResult]])
+def search_batch(body: SearchBatchIn):
+    """
+    Varias búsquedas en una petición: un solo embedding por lotes y una sola búsqueda
+    por lotes en Qdrant. Devuelve una lista de resultados por consulta, en el mismo orden.
+    """
+    results = search_queries(
+        [x.model_dump() for x in body.queries],
+        ef=body.ef, exact=body.exact, score_threshold=body.score_threshold,
+    )
+    SEARCH_TOTAL.inc(len(body.queries))
+    return [[SearchResult(**x) for x in rows] for rows in results]
+
+
+# Worker de ingesta in-process: se arranca con el primer job encolado
+@lru_cache(maxsize=1)
+def _ingest_worker() -> IngestWorker:
+    return IngestWorker(on_indexed=INGEST_TOTAL.inc).start()
+
+
+@app.api_route("/ingest/feed", methods=["GET", "POST"], status_code=202)
 def ingest_feed_endpoint(
     url: Annotated[HttpUrl, Query(description="URL del feed RSS")],
     limit: Annotated[int, Query(ge=1, le=100)] = 20,
     lang: Annotated[Optional[str], Query(description="Idioma deseado (opcional)")] = None,
 ):
     """
-    Ingesta desde feed RSS y devuelve cuántos artículos se indexaron.
-    Incrementa INGEST_TOTAL con el total indexado.
+    Encola la ingesta del feed RSS y devuelve el id del job (ver /ingest/jobs/{job_id}).
+    INGEST_TOTAL se incrementa a medida que el worker indexa artículos.
     """
-    total = ingest_feed(str(url), limit=limit, lang=lang)
     try:
-        # suma por cantidad de items procesados
-        INGEST_TOTAL.inc(total)
-    except Exception:
-        # fallback defensivo (por si total no es numérico)
-        INGEST_TOTAL.inc()
-    return {"indexed": total, "feed": str(url)}
+        job = _ingest_worker().submit(str(url), limit=limit, lang=lang)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Cola de ingesta llena, reintenta más tarde") from None
+    return {"job_id": job.id, "status": job.status, "feed": str(url)}
+
+
+@app.get("/ingest/stats")
+def ingest_stats():
+    """Tiempos/conteos por etapa del pipeline de ingesta y profundidad de las colas."""
+    w = _ingest_worker()
+    return {"stages": w.stats(), "queues": w.depth()}
+
+
+@app.get("/ingest/jobs/{job_id}")
+def ingest_job_status(job_id: str):
+    """
+    Estado y contadores de un job de ingesta (queued | running | done | failed).
+    Lo responde cualquier worker: el estado se comparte vía INGEST_JOBS_DIR.
+    """
+    job = _ingest_worker().status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    return job
 
 
 @app.get("/doc", response_model=ArticleIn)
@@ -146,7 +271,7 @@ def get_doc(
     max_chars: Annotated[int, Query(ge=0, description="Trunca content a N chars (0 = sin truncar)")] = 0,
 ):
     """
-    Recupera el documento completo por URL exacta (payload.url).
+    Recupera el documento completo por URL exacta (lookup por ID derivado de la URL).
     Permite truncar el contenido para evitar respuestas muy grandes.
     """
     doc = get_doc_by_url(str(url))
@@ -160,6 +285,124 @@ def get_doc(
     return doc  # FastAPI lo valida contra ArticleIn
 
 
+@app.get("/doc/similar", response_model=List[SearchResult])
+def get_doc_similar(
+    url: Annotated[HttpUrl, Query(description="URL del artículo de referencia")],
+    k: int = 10,
+    negative: Annotated[Optional[List[HttpUrl]], Query(description="URLs de ejemplos negativos (repetible)")] = None,
+    title_contains: Optional[str] = Query(None, description="Filtro full-text en título"),
+    source: Optional[str] = Query(None, description="Fuente exacta (payload.source)"),
+    ef: Optional[int] = Query(None, ge=1, description="hnsw_ef de búsqueda (más alto = más recall, más lento)"),
+    exact: Optional[bool] = Query(None, description="Búsqueda exacta (sin HNSW)"),
+    score_threshold: Optional[float] = Query(None, description="Score mínimo de los resultados"),
+    collapse: Optional[Literal["duplicates"]] = Query(None, description="'duplicates' agrupa casi-duplicados"),
+    diversify: bool = Query(False, description="Re-ranking MMR para diversificar resultados"),
+    mmr_lambda: Annotated[float, Query(alias="lambda", ge=0.0, le=1.0, description="MMR: 1 = relevancia, 0 = diversidad")] = 0.5,
+    strategy: Optional[Literal["average_vector", "best_score", "sum_scores"]] = Query(
+        None, description="Estrategia de recommend de Qdrant (default: average_vector)"
+    ),
+):
+    """
+    Artículos parecidos a 'url' usando su vector ya indexado (sin re-embeber).
+    Mismos filtros que /search; 'negative' aleja los resultados de esos artículos.
+    """
+    with SEARCH_LATENCY.time():
+        rows = similar_docs(
+            str(url), k, negative_urls=[str(u) for u in negative or []],
+            title_contains=title_contains, source=source, ef=ef, exact=exact,
+            score_threshold=score_threshold, collapse=collapse,
+            diversify=diversify, mmr_lambda=mmr_lambda, strategy=strategy,
+        )
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    SEARCH_TOTAL.inc()
+    return [SearchResult(**x) for x in rows]
+
+
+class DocsIn(BaseModel):
+    urls: List[HttpUrl] = Field(min_length=1, max_length=DOCS_BATCH_MAX)
+    fields: Optional[List[str]] = Field(None, description="Campos del payload a devolver (default: todos)")
+    max_chars: int = Field(0, ge=0, description="Trunca content a N chars (0 = sin truncar)")
+
+
+@app.post("/docs", response_model=List[Optional[Dict[str, Any]]])
+def get_docs(body: DocsIn):
+    """
+    Recupera varios documentos por URL exacta en una sola lectura por ID.
+    Devuelve los payloads en el orden de 'urls' (null si no existe).
+    """
+    docs = get_docs_by_url([str(u) for u in body.urls], fields=body.fields)
+    if body.max_chars:
+        for d in docs:
+            if d is not None and isinstance(d.get("content"), str):
+                d["content"] = d["content"][:body.max_chars]
+    return docs
+
+
+# -----------------------------
+# Alertas: consultas permanentes evaluadas al indexar (push por SSE / webhook)
+# -----------------------------
+ALERTS_HEARTBEAT_SECONDS = float(os.getenv("ALERTS_HEARTBEAT_SECONDS", "15"))
+
+
+class AlertIn(BaseModel):
+    q: str = Field(min_length=2, description="Consulta semántica permanente")
+    threshold: float = Field(alerts.ALERTS_DEFAULT_THRESHOLD, ge=-1.0, le=1.0, description="Score coseno mínimo")
+    source: Optional[str] = Field(None, description="Sólo artículos de esta fuente")
+    webhook: Optional[HttpUrl] = Field(None, description="POST de las coincidencias (default: ALERTS_WEBHOOK_URL)")
+
+
+@app.post("/alerts", status_code=201)
+def create_alert(body: AlertIn):
+    """Registra una consulta permanente; cada lote indexado se evalúa contra ella."""
+    sq = alerts.StandingQuery(
+        q=body.q, threshold=body.threshold, source=body.source, webhook=str(body.webhook) if body.webhook else None
+    )
+    try:
+        alerts.registry().add(sq)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    return dataclasses.asdict(sq)
+
+
+@app.get("/alerts")
+def list_alerts():
+    return [dataclasses.asdict(x) for x in alerts.registry().list()]
+
+
+@app.delete("/alerts/{alert_id}", status_code=204)
+def delete_alert(alert_id: str):
+    if not alerts.registry().remove(alert_id):
+        raise HTTPException(status_code=404, detail="Alerta no encontrada")
+
+
+def _sse_events(sub: "queue.Queue", query_id: Optional[str] = None, heartbeat: float = ALERTS_HEARTBEAT_SECONDS):
+    """Eventos SSE desde la cola del suscriptor; comentario keepalive si no hay novedades."""
+    try:
+        while True:
+            try:
+                m = sub.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if m is None:
+                return
+            if query_id is None or m["query_id"] == query_id:
+                yield f"event: alert\ndata: {json.dumps(m, ensure_ascii=False)}\n\n"
+    finally:
+        alerts.hub().unsubscribe(sub)
+
+
+@app.get("/alerts/stream")
+def stream_alerts(query_id: Optional[str] = Query(None, description="Sólo coincidencias de esta alerta")):
+    """Server-Sent Events con las coincidencias de las alertas a medida que se indexa."""
+    return StreamingResponse(
+        _sse_events(alerts.hub().subscribe(), query_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # -----------------------------
 # Endpoints BONUS
 # -----------------------------
@@ -171,15 +414,23 @@ def get_storyline(
     source: Optional[str] = Query(None, description="Fuente exacta"),
     date_from: Optional[str] = Query(None, description="ISO 8601 (YYYY-MM-DD o fecha/hora)"),
     date_to: Optional[str] = Query(None, description="ISO 8601 (YYYY-MM-DD o fecha/hora)"),
+    ef: Optional[int] = Query(None, ge=1, description="hnsw_ef de búsqueda (default: ANALYSIS_SEARCH_EF)"),
+    exact: Optional[bool] = Query(None, description="Búsqueda exacta (sin HNSW)"),
+    score_threshold: Optional[float] = Query(None, description="Score mínimo (default: ANALYSIS_SCORE_THRESHOLD)"),
+    collapse: Optional[Literal["duplicates"]] = Query(None, description="'duplicates' agrupa casi-duplicados"),
 ):
     """
     Agrupa top-N resultados en hilos (clusters) por similitud y orden temporal.
     """
-    filters = {
+    filters: Dict[str, Any] = {
         "title_contains": title_contains,
         "source": source,
         "date_from": date_from,
         "date_to": date_to,
+        "ef": ef,
+        "exact": exact,
+        "score_threshold": score_threshold,
+        "collapse": collapse,
     }
     return build_storyline(q=q, k=k, **{k: v for k, v in filters.items() if v is not None})
 
@@ -189,15 +440,28 @@ def get_perspective(
     q: Annotated[str, Query(min_length=2, description="Consulta semántica base")],
     sources: Optional[str] = Query(None, description="CSV de fuentes a comparar"),
     k: int = 40,
+    per_source: Optional[int] = Query(None, ge=1, description="Documentos por fuente (default: k repartido entre fuentes)"),
     title_contains: Optional[str] = Query(None, description="Subcadena en título"),
     date_from: Optional[str] = Query(None, description="ISO 8601 (YYYY-MM-DD o fecha/hora)"),
     date_to: Optional[str] = Query(None, description="ISO 8601 (YYYY-MM-DD o fecha/hora)"),
+    ef: Optional[int] = Query(None, ge=1, description="hnsw_ef de búsqueda (default: ANALYSIS_SEARCH_EF)"),
+    exact: Optional[bool] = Query(None, description="Búsqueda exacta (sin HNSW)"),
+    score_threshold: Optional[float] = Query(None, description="Score mínimo (default: ANALYSIS_SCORE_THRESHOLD)"),
 ):
     """
     Compara cobertura por fuente: entidades, tono (heurístico), términos y volumen.
+    Cada fuente aporta hasta per_source documentos (búsqueda agrupada por fuente).
     """
-    filters = {"title_contains": title_contains, "date_from": date_from, "date_to": date_to}
-    sources_filter = [s.strip() for s in sources.split(",")] if sources else None
+    filters: Dict[str, Any] = {
+        "title_contains": title_contains,
+        "date_from": date_from,
+        "date_to": date_to,
+        "ef": ef,
+        "exact": exact,
+        "score_threshold": score_threshold,
+        "per_source": per_source,
+    }
+    sources_filter = [s.strip() for s in sources.split(",") if s.strip()] if sources else None
     return build_perspective(q=q, sources_filter=sources_filter, k=k, **{k: v for k, v in filters.items() if v is not None})
 
 
@@ -209,15 +473,89 @@ def get_graph(
     source: Optional[str] = Query(None, description="Fuente exacta"),
     date_from: Optional[str] = Query(None, description="ISO 8601 (YYYY-MM-DD o fecha/hora)"),
     date_to: Optional[str] = Query(None, description="ISO 8601 (YYYY-MM-DD o fecha/hora)"),
+    ef: Optional[int] = Query(None, ge=1, description="hnsw_ef de búsqueda (default: ANALYSIS_SEARCH_EF)"),
+    exact: Optional[bool] = Query(None, description="Búsqueda exacta (sin HNSW)"),
+    score_threshold: Optional[float] = Query(None, description="Score mínimo (default: ANALYSIS_SCORE_THRESHOLD)"),
+    collapse: Optional[Literal["duplicates"]] = Query(None, description="'duplicates' agrupa casi-duplicados"),
 ):
     """
     Grafo de co-ocurrencia de entidades principales (a nivel documento).
     _________
     """
-    filters = {
+    filters: Dict[str, Any] = {
         "title_contains": title_contains,
         "source": source,
         "date_from": date_from,
         "date_to": date_to,
+        "ef": ef,
+        "exact": exact,
+        "score_threshold": score_threshold,
+        "collapse": collapse,
     }
     return build_graph(q=q, k=k, **{k: v for k, v in filters.items() if v is not None})
+
+
+# -----------------------------
+# Endpoints admin: profiling bajo demanda y retención (requieren X-Admin-Token = ADMIN_TOKEN)
+# -----------------------------
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def _require_admin(x_admin_token: Annotated[Optional[str], Header()] = None) -> None:
+    # Sin ADMIN_TOKEN configurado los endpoints admin no existen
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Token admin inválido")
+
+
+@app.get("/admin/profile/cpu", dependencies=[Depends(_require_admin)], include_in_schema=False)
+def admin_profile_cpu(
+    seconds: Annotated[float, Query(gt=0, le=profiling.PROFILE_MAX_SECONDS)] = 10.0,
+    interval_ms: Annotated[float, Query(ge=1, le=1000)] = 5.0,
+    format: Annotated[Literal["json", "folded"], Query(description="folded = flamegraph/speedscope")] = "json",
+    idle: bool = False,
+    top: Annotated[int, Query(ge=1, le=500)] = 30,
+):
+    """
+    Perfil de CPU por muestreo de pilas de todos los hilos durante 'seconds'.
+    """
+    if not profiling.PROFILE_LOCK.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Ya hay un profiling en curso")
+    try:
+        stacks = profiling.sample_cpu(seconds, interval=interval_ms / 1000.0, idle=idle)
+    finally:
+        profiling.PROFILE_LOCK.release()
+    if format == "folded":
+        return PlainTextResponse(profiling.folded(stacks))
+    return {"samples": sum(stacks.values()), "seconds": seconds, "top": profiling.top_functions(stacks, top)}
+
+
+@app.get("/admin/profile/memory", dependencies=[Depends(_require_admin)], include_in_schema=False)
+def admin_profile_memory(
+    seconds: Annotated[float, Query(ge=0, le=profiling.PROFILE_MAX_SECONDS)] = 10.0,
+    top: Annotated[int, Query(ge=1, le=500)] = 25,
+    group_by: Annotated[Literal["lineno", "filename", "traceback"], Query()] = "lineno",
+):
+    """
+    Top de asignaciones (tracemalloc). Con seconds > 0 incluye el crecimiento en esa ventana.
+    """
+    if not profiling.PROFILE_LOCK.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Ya hay un profiling en curso")
+    try:
+        return profiling.memory_profile(seconds, limit=top, key_type=group_by)
+    finally:
+        profiling.PROFILE_LOCK.release()
+
+
+@app.post("/admin/partitions/retention", dependencies=[Depends(_require_admin)], include_in_schema=False)
+def admin_partitions_retention(
+    months: Annotated[Optional[int], Query(ge=1, description="Meses a conservar (default: PARTITION_RETENTION_MONTHS)")] = None,
+):
+    """
+    Borra las colecciones-mes fuera de la ventana de retención (PARTITION_BY=month).
+    """
+    if not qc.partitioned():
+        raise HTTPException(status_code=409, detail="Particiones por tiempo desactivadas")
+    dropped = qc.apply_retention(months)
+    return {"dropped": dropped, "partitions": qc.list_partitions()}
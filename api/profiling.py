@@ -0,0 +1,152 @@
+"""
+Profiling bajo demanda de un pod en vivo (sin dependencias extra).
+
+- CPU: muestreo de las pilas de todos los hilos (sys._current_frames) cada 'interval'
+  segundos durante 'seconds'. Devuelve pilas colapsadas ("a;b;c N", formato de
+  flamegraph.pl / speedscope) y el top de funciones por muestras propias/acumuladas.
+- Memoria: tracemalloc entre dos snapshots separados 'seconds' (crecimiento) o el
+  estado actual si ya venía trazando (TRACEMALLOC=1 lo activa al arrancar), más
+  RSS/PSS del proceso (memoria compartida entre workers de api.serve).
+
+Un solo profiling a la vez por proceso (PROFILE_LOCK).
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import FrameType
+from typing import Dict, List, Optional
+
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+
+PROFILE_LOCK = threading.Lock()
+
+if os.getenv("TRACEMALLOC", "0").strip().lower() in ("1", "true", "yes", "on"):
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+
+
+# -----------------------------------
+# CPU
+# -----------------------------------
+# Hojas de hilos ociosos (esperando trabajo/IO del loop)
+_IDLE_MODULES = {"threading", "queue", "selectors", "concurrent.futures.thread", "asyncio.base_events"}
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+
+def sample_cpu(seconds: float, interval: float = 0.005, idle: bool = False) -> Counter:
+    """
+    Muestrea las pilas de todos los hilos (menos el propio). Devuelve Counter de pilas
+    colapsadas raíz->hoja. Con idle=False se descartan hilos bloqueados en espera
+    (hoja en threading/queue/selectors), que sólo son ruido del threadpool.
+    """
+    me = threading.get_ident()
+    stacks: Counter = Counter()
+    deadline = time.perf_counter() + min(seconds, PROFILE_MAX_SECONDS)
+    while time.perf_counter() < deadline:
+        for tid, frame in sys._current_frames().items():
+            if tid == me:
+                continue
+            labels: List[str] = []
+            f: Optional[FrameType] = frame
+            while f is not None:
+                labels.append(_frame_label(f))
+                f = f.f_back
+            if not idle and labels and labels[0].split(":", 1)[0] in _IDLE_MODULES:
+                continue
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def folded(stacks: Counter) -> str:
+    """Pilas colapsadas, una por línea: 'frame;frame;... muestras'."""
+    return "\n".join(f"{stack} {n}" for stack, n in stacks.most_common())
+
+
+def top_functions(stacks: Counter, limit: int = 30) -> List[Dict]:
+    """Top por muestras propias (hoja) con sus muestras acumuladas (aparece en la pila)."""
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for stack, n in stacks.items():
+        frames = [f.rsplit(":", 1)[0] for f in stack.split(";")]
+        own[frames[-1]] += n
+        for fn in set(frames):
+            total[fn] += n
+    samples = sum(stacks.values()) or 1
+    return [
+        {"function": fn, "self": n, "cumulative": total[fn], "self_pct": round(100.0 * n / samples, 2)}
+        for fn, n in own.most_common(limit)
+    ]
+
+
+# -----------------------------------
+# Memoria
+# -----------------------------------
+_SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def process_memory() -> Dict[str, float]:
+    """
+    Memoria del proceso en KB desde /proc/self/smaps_rollup (Linux): rss, pss (la parte
+    proporcional de páginas compartidas) y shared_*; con api.serve los pesos de los
+    modelos cuentan como compartidos entre workers. Vacío si no está disponible.
+    """
+    out: Dict[str, float] = {}
+    try:
+        with open("/proc/self/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                fields = rest.split()
+                if key in _SMAPS_FIELDS and len(fields) == 2:
+                    out[key.lower() + "_kb"] = float(fields[0])
+    except OSError:
+        pass
+    return out
+
+
+def memory_profile(seconds: float = 0.0, limit: int = 25, key_type: str = "lineno") -> Dict:
+    """
+    Top de asignaciones vivas según tracemalloc. Si no estaba trazando, lo activa
+    durante 'seconds' y reporta lo asignado en esa ventana (y lo desactiva al final).
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    try:
+        before = tracemalloc.take_snapshot() if seconds > 0 else None
+        if seconds > 0:
+            time.sleep(min(seconds, PROFILE_MAX_SECONDS))
+        snap = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    def _row(stat) -> Dict:
+        return {
+            "where": str(stat.traceback[0]) if stat.traceback else "?",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+
+    out: Dict = {
+        "process": process_memory(),
+        "traced_kb": round(current / 1024, 1),
+        "peak_kb": round(peak / 1024, 1),
+        "top": [_row(s) for s in snap.statistics(key_type)[:limit]],
+    }
+    if before is not None:
+        out["growth"] = [
+            {**_row(s), "size_diff_kb": round(s.size_diff / 1024, 1), "count_diff": s.count_diff}
+            for s in snap.compare_to(before, key_type)[:limit]
+        ]
+    return out
+
@@ -37,7 +37,7 @@ class SourcePerspective(BaseModel):
     source: str
     volume: int
     top_entities: List[str]
-    avg_sentiment: float  # -1..+1 (heurística simple)
+    avg_sentiment: float  # -1..+1 (motor SENTIMENT_ENGINE: lexicón u ONNX)
     top_terms: List[str]
     time_histogram: Dict[str, int]  # yyyy-mm-dd -> count
 
@@ -0,0 +1,196 @@
+"""
+Motor de sentimiento enchufable: tono en [-1, 1] por documento, siempre por lotes.
+
+- lexicon: heurística de lexicón corto (sin modelo, microsegundos; fallback)
+- onnx:    clasificador ONNX en CPU con onnxruntime (el runtime que ya trae fastembed).
+           Lotes ordenados por longitud (menos padding); el score es la esperanza de la
+           distribución de etiquetas mapeadas a [-1, 1] (negative/neutral/positive o "N stars").
+
+Los scores del modelo se cachean por hash de contenido (LRU en proceso) y, con
+SENTIMENT_AT_INGEST, se calculan al indexar y quedan en el payload ('sentiment',
+'sentiment_engine'): los builders sólo puntúan lo que falta.
+"""
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, List, Optional
+
+import numpy as np
+
+from embedding.cache import content_hash
+from embedding.chunking import length_sorted_order
+
+from .analysis import lexicon_score
+from .timing import timed
+
+log = logging.getLogger(__name__)
+
+SENTIMENT_ENGINE = os.getenv("SENTIMENT_ENGINE", "lexicon").strip().lower()
+# Repo de Hugging Face (o directorio local) con el .onnx, tokenizer.json y config.json (id2label)
+SENTIMENT_MODEL = os.getenv("SENTIMENT_MODEL", "Xenova/bert-base-multilingual-uncased-sentiment")
+SENTIMENT_ONNX_FILE = os.getenv("SENTIMENT_ONNX_FILE", "onnx/model_quantized.onnx")
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "32"))
+SENTIMENT_MAX_TOKENS = int(os.getenv("SENTIMENT_MAX_TOKENS", "256"))
+SENTIMENT_THREADS = int(os.getenv("SENTIMENT_THREADS", "0"))  # 0 = default de onnxruntime
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "50000"))
+SENTIMENT_AT_INGEST = os.getenv("SENTIMENT_AT_INGEST", "1").strip().lower() in ("1", "true", "yes", "on")
+
+
+# -----------------------------------
+# Motores
+# -----------------------------------
+class LexiconEngine:
+    """Heurística de lexicón (api.analysis.lexicon_score); no vale la pena cachearla."""
+
+    name = "lexicon"
+    cacheable = False
+
+    def score(self, texts: List[str]) -> np.ndarray:
+        return np.asarray([lexicon_score(t) for t in texts], dtype=np.float32)
+
+
+def label_values(labels: List[str]) -> np.ndarray:
+    """
+    Valor en [-1, 1] de cada etiqueta del clasificador: negative/neutral/positive,
+    "N stars" (1..max lineal) o, si no se reconocen, equiespaciadas en orden.
+    """
+    stars = [re.match(r"\s*(\d+)\s*star", lab.lower()) for lab in labels]
+    if all(stars):
+        n = [int(m.group(1)) for m in stars if m]
+        lo, hi = min(n), max(n)
+        return np.asarray([2.0 * (x - lo) / max(1, hi - lo) - 1.0 for x in n], dtype=np.float32)
+    out = []
+    for lab in labels:
+        lab = lab.lower()
+        if lab.startswith("neg"):
+            out.append(-1.0)
+        elif lab.startswith("pos"):
+            out.append(1.0)
+        elif lab.startswith("neu"):
+            out.append(0.0)
+        else:
+            return np.linspace(-1.0, 1.0, len(labels), dtype=np.float32)
+    return np.asarray(out, dtype=np.float32)
+
+
+class OnnxEngine:
+    """Clasificador de secuencias ONNX (sesión onnxruntime + tokenizers) por lotes."""
+
+    cacheable = True
+
+    def __init__(self, session: Any, tokenizer: Any, labels: List[str], name: str, batch_size: int = 32):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.values = label_values(labels)
+        self.name = name
+        self.batch_size = max(1, batch_size)
+        self.inputs = {i.name for i in session.get_inputs()}
+
+    def score(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros(len(texts), dtype=np.float32)
+        order = length_sorted_order(texts)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            enc = self.tokenizer.encode_batch([texts[i] for i in idx])
+            feeds = {
+                "input_ids": np.asarray([e.ids for e in enc], dtype=np.int64),
+                "attention_mask": np.asarray([e.attention_mask for e in enc], dtype=np.int64),
+            }
+            if "token_type_ids" in self.inputs:
+                feeds["token_type_ids"] = np.asarray([e.type_ids for e in enc], dtype=np.int64)
+            logits = np.asarray(self.session.run(None, {k: v for k, v in feeds.items() if k in self.inputs})[0])
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            out[idx] = probs @ self.values
+        return out
+
+
+def load_onnx_engine(model: str = SENTIMENT_MODEL, onnx_file: str = SENTIMENT_ONNX_FILE) -> OnnxEngine:
+    """Descarga (o lee de disco) el modelo y arma la sesión CPU de onnxruntime."""
+    import onnxruntime as ort  # type: ignore[import-untyped]
+    from tokenizers import Tokenizer
+
+    root = model
+    if not os.path.isdir(model):
+        from huggingface_hub import snapshot_download
+
+        root = snapshot_download(model, allow_patterns=[onnx_file, "tokenizer.json", "config.json"])
+    with open(os.path.join(root, "config.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    id2label = config.get("id2label") or {}
+    labels = [id2label.get(str(i), str(i)) for i in range(len(id2label))]
+
+    tokenizer = Tokenizer.from_file(os.path.join(root, "tokenizer.json"))
+    tokenizer.enable_truncation(max_length=SENTIMENT_MAX_TOKENS)
+    pad_id = int(config.get("pad_token_id") or 0)
+    tokenizer.enable_padding(pad_id=pad_id, pad_token=tokenizer.id_to_token(pad_id) or "[PAD]")
+
+    opts = ort.SessionOptions()
+    if SENTIMENT_THREADS:
+        opts.intra_op_num_threads = SENTIMENT_THREADS
+    session = ort.InferenceSession(
+        os.path.join(root, onnx_file), sess_options=opts, providers=["CPUExecutionProvider"]
+    )
+    return OnnxEngine(session, tokenizer, labels, name=f"onnx:{model}", batch_size=SENTIMENT_BATCH_SIZE)
+
+
+@lru_cache(maxsize=1)
+def engine():
+    """Motor configurado (SENTIMENT_ENGINE); si el modelo no carga, el lexicón."""
+    if SENTIMENT_ENGINE == "onnx":
+        try:
+            return load_onnx_engine()
+        except Exception as e:
+            log.warning("No se pudo cargar el modelo de sentimiento '%s', uso el lexicón: %s", SENTIMENT_MODEL, e)
+    return LexiconEngine()
+
+
+def engine_name() -> str:
+    """Nombre del motor vigente sin cargar el modelo (sirve para validar payloads)."""
+    if engine.cache_info().currsize:
+        return engine().name
+    return f"onnx:{SENTIMENT_MODEL}" if SENTIMENT_ENGINE == "onnx" else LexiconEngine.name
+
+
+# -----------------------------------
+# Scores por lotes con caché por contenido
+# -----------------------------------
+_CACHE: "OrderedDict[str, float]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+@timed("sentiment")
+def score_texts(texts: List[str]) -> List[float]:
+    """Tono en [-1, 1] de cada texto, en el mismo orden (una pasada por lotes del motor)."""
+    if not texts:
+        return []
+    eng = engine()
+    if not eng.cacheable:
+        return [float(x) for x in eng.score(texts)]
+
+    keys = [f"{eng.name}:{content_hash(t)}" for t in texts]
+    out: List[Optional[float]] = [None] * len(texts)
+    with _CACHE_LOCK:
+        for i, k in enumerate(keys):
+            if k in _CACHE:
+                _CACHE.move_to_end(k)
+                out[i] = _CACHE[k]
+    todo: dict = {}
+    for i, k in enumerate(keys):
+        if out[i] is None:
+            todo.setdefault(k, i)
+    if todo:
+        fresh = eng.score([texts[i] for i in todo.values()])
+        with _CACHE_LOCK:
+            for k, v in zip(todo, fresh, strict=True):
+                _CACHE[k] = float(v)
+                _CACHE.move_to_end(k)
+            while len(_CACHE) > SENTIMENT_CACHE_SIZE:
+                _CACHE.popitem(last=False)
+        scores = dict(zip(todo, (float(v) for v in fresh), strict=True))
+        out = [v if v is not None else scores[k] for v, k in zip(out, keys, strict=True)]
+    return [float(v) for v in out if v is not None]
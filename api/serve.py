@@ -0,0 +1,177 @@
+"""
+Servidor pre-fork con modelos precargados (copy-on-write entre workers).
+
+`uvicorn --workers N` arranca cada worker con spawn: cada uno importa api.main y carga
+su propio modelo de embeddings, spaCy y el clasificador de sentimiento, así la memoria
+del pod crece lineal con los workers. Aquí el proceso maestro importa la app, calienta
+los modelos, congela el heap (gc.freeze) y hace fork de N workers que atienden el mismo
+socket: los pesos quedan en páginas compartidas (copy-on-write) y cada worker extra
+cuesta sólo su memoria propia (ver Pss en /admin/profile/memory).
+
+Uso:
+    python -m api.serve --workers 4 --port 8000
+    UVICORN_PRELOAD=1 en la imagen (deploy/docker/entrypoint.sh)
+
+onnxruntime no es fork-safe si la sesión ya creó su pool de hilos: en este modo las
+sesiones usan un hilo intra-op (EMBED_{QUERY,INGEST}_THREADS y SENTIMENT_THREADS = 1
+salvo que se indiquen) y el paralelismo lo dan los workers. Requiere os.fork (Linux).
+"""
+import argparse
+import gc
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+# Un worker que muere antes de esto se considera caído al arrancar: se espera antes de relanzarlo
+_MIN_WORKER_UPTIME = 5.0
+
+
+def fork_safe_threads() -> None:
+    """Un hilo intra-op por sesión ONNX salvo configuración explícita (antes de importar la app)."""
+    for name in ("EMBED_QUERY_THREADS", "EMBED_INGEST_THREADS", "SENTIMENT_THREADS"):
+        os.environ.setdefault(name, "1")
+
+
+def preload() -> Dict[str, float]:
+    """
+    Importa la app y carga los modelos en este proceso (embeddings por modo, spaCy,
+    sentimiento) con una inferencia de calentamiento. Devuelve segundos por modelo.
+    """
+    timings: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    import api.main  # noqa: F401  (spaCy se carga al importar api.analysis)
+    from api.analysis import _NLP
+
+    _NLP("Calentamiento del modelo en Bogotá.")
+    timings["app_nlp"] = time.perf_counter() - t0
+
+    from embedding.provider import EMBED_MODES, embed_texts
+
+    t0 = time.perf_counter()
+    for mode in EMBED_MODES:
+        embed_texts(["calentamiento"], mode=mode)
+    timings["embeddings"] = time.perf_counter() - t0
+
+    from api import sentiment
+
+    t0 = time.perf_counter()
+    sentiment.engine().score(["calentamiento"])
+    timings["sentiment"] = time.perf_counter() - t0
+    return timings
+
+
+def _load_app(path: str) -> Any:
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr or "app")
+
+
+def _bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app: Any, sock: socket.socket, log_level: str) -> None:
+    import uvicorn
+
+    # uvicorn instala sus propios handlers (apagado ordenado con SIGTERM)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on", timeout_graceful_shutdown=20)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(
+    app_path: str = "api.main:app",
+    host: str = "0.0.0.0",
+    port: int = 8000,
+    workers: int = 2,
+    preload_models: bool = True,
+    log_level: str = "info",
+) -> int:
+    """Precarga, hace fork de 'workers' procesos y los supervisa (relanza los caídos)."""
+    if preload_models:
+        fork_safe_threads()
+        log.info("Modelos precargados: %s", preload())
+    app = _load_app(app_path)
+    sock = _bind(host, port)
+    # Lo cargado hasta acá queda fuera del GC: sus páginas no se tocan tras el fork
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(app, sock, log_level)
+            except BaseException:
+                log.exception("Worker %d terminó con error", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(max(1, workers)):
+        spawn()
+    log.info("Maestro %d sirviendo en %s:%d con %d workers", os.getpid(), host, port, len(children))
+
+    status = 0
+    while children:
+        try:
+            pid, code = os.wait()
+        except ChildProcessError:
+            break
+        started: Optional[float] = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+        status = 1
+        log.warning("Worker %d salió (status %d); relanzando", pid, code)
+        if time.monotonic() - started < _MIN_WORKER_UPTIME:
+            time.sleep(_MIN_WORKER_UPTIME)
+        if not stopping:
+            spawn()
+    sock.close()
+    return 0 if stopping else status
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Servidor pre-fork con modelos compartidos (copy-on-write).")
+    parser.add_argument("--app", default="api.main:app", help="Aplicación ASGI 'modulo:atributo'")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("UVICORN_WORKERS", "2")))
+    parser.add_argument("--no-preload", action="store_true", help="No precargar modelos (sólo fork)")
+    parser.add_argument("--log-level", default=os.getenv("APP_LOG_LEVEL", "info").lower())
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper())
+    return serve(args.app, args.host, args.port, args.workers, not args.no_preload, args.log_level)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,11 @@
 from typing import Dict, List, Optional, Any
+import fcntl
+import itertools
+import logging
+import os
+import tempfile
+import threading
+import time
 import uuid
 import datetime as dt
 from collections import defaultdict, Counter
@@ -7,7 +14,10 @@ import numpy as np
 from qdrant_client.http.models import Filter, FieldCondition, MatchValue, MatchText
 
 import clients.qdrant_client as qc
-from embedding.provider import embed_texts, embed_batch
+from clients import content_store
+from qdrant_client.http import models as qm
+from embedding.provider import embed_texts, embed_batch, embed_documents
+from embedding.chunking import approx_tokens, chunk_text
 
 # Schemas de respuesta para los endpoints bonus
 from .schemas import (
@@ -18,8 +28,74 @@ from .schemas import (
 
 # Utilidades de análisis (clustering, NER, TF-IDF, heurística de tono)
 from .analysis import (
-    storyline_clusters, extract_entities, tfidf_top_terms, _sentiment_score
+    storyline_clusters, extract_entities, grouped_top_terms, mmr_select, TermModel
 )
+from .timing import span, timed
+from . import alerts, sentiment
+
+log = logging.getLogger(__name__)
+
+
+# -----------------------------------
+# Defaults de búsqueda para los builders de análisis
+# -----------------------------------
+# Los builders sobre-recuperan (k alto) y luego procesan con NLP: un ef más barato
+# y un umbral de score evitan pagar recall/latencia por documentos de cola.
+ANALYSIS_SEARCH_EF = int(os.getenv("ANALYSIS_SEARCH_EF", "64"))
+ANALYSIS_SCORE_THRESHOLD: Optional[float] = (
+    float(os.environ["ANALYSIS_SCORE_THRESHOLD"]) if os.getenv("ANALYSIS_SCORE_THRESHOLD") else None
+)
+# /analysis/perspective: búsqueda agrupada por fuente; sin lista de fuentes compara
+# hasta PERSPECTIVE_MAX_SOURCES y reparte k entre ellas (hits fijos por fuente).
+PERSPECTIVE_MAX_SOURCES = int(os.getenv("PERSPECTIVE_MAX_SOURCES", "8"))
+
+
+# -----------------------------------
+# Chunking de artículos largos en pasajes
+# -----------------------------------
+# CHUNK_MAX_TOKENS=0 desactiva el chunking (un punto por artículo, comportamiento histórico).
+# Con chunking, cada pasaje es un punto con 'parent_id'; la búsqueda sobre-recupera
+# (CHUNK_SEARCH_OVERSAMPLE) y agrega los hits de pasajes por artículo.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "0"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "16"))
+CHUNK_SEARCH_OVERSAMPLE = int(os.getenv("CHUNK_SEARCH_OVERSAMPLE", "3"))
+
+# -----------------------------------
+# Casi-duplicados (notas sindicadas) al indexar
+# -----------------------------------
+# NEAR_DUP_MODE: off | link (marca 'canonical_id' del original) | drop (no guarda el duplicado)
+# Un artículo es duplicado si su vector tiene similitud coseno >= NEAR_DUP_THRESHOLD con un
+# artículo ya indexado (Qdrant) o anterior en el mismo lote.
+NEAR_DUP_MODE = os.getenv("NEAR_DUP_MODE", "link").strip().lower()
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.95"))
+DUP_COLLAPSE_OVERSAMPLE = int(os.getenv("DUP_COLLAPSE_OVERSAMPLE", "3"))
+
+# /doc y /docs: lookup por ID determinista; con DOC_LEGACY_FALLBACK=1 las URLs que no
+# aparecen por ID se buscan por payload.url (puntos indexados con IDs aleatorios)
+DOC_LEGACY_FALLBACK = os.getenv("DOC_LEGACY_FALLBACK", "1").strip().lower() in ("1", "true", "yes", "on")
+
+# Diversificación MMR: tamaño del pool de candidatos = k * MMR_POOL_FACTOR
+MMR_POOL_FACTOR = int(os.getenv("MMR_POOL_FACTOR", "4"))
+
+# -----------------------------------
+# TF-IDF de /analysis/perspective: vocabulario + IDF a nivel corpus
+# -----------------------------------
+# Se ajusta en segundo plano sobre una muestra de TFIDF_CORPUS_SAMPLE artículos, se re-ajusta
+# cada TFIDF_REFIT_SECONDS y suma la df de los artículos nuevos que indexa este proceso. Mientras no
+# hay modelo, cada petición ajusta uno local sobre los documentos recuperados.
+# Con varios workers sólo ajusta el que tiene el flock de TFIDF_MODEL_PATH + ".lock" y
+# publica el modelo en TFIDF_MODEL_PATH; el resto lo recarga cuando cambia el archivo
+# (vacío = cada proceso ajusta el suyo).
+TFIDF_CORPUS_SAMPLE = int(os.getenv("TFIDF_CORPUS_SAMPLE", "5000"))
+TFIDF_VOCAB_SIZE = int(os.getenv("TFIDF_VOCAB_SIZE", "50000"))
+TFIDF_REFIT_SECONDS = int(os.getenv("TFIDF_REFIT_SECONDS", "3600"))
+TFIDF_RETRY_SECONDS = 60
+TFIDF_MODEL_PATH = os.getenv(
+    "TFIDF_MODEL_PATH", os.path.join(tempfile.gettempdir(), "news-term-model.npz")
+).strip()
+
+# Campos de payload que se replican en cada pasaje (para que los filtros sigan aplicando)
+_PASSAGE_FIELDS = ("title", "url", "source", "published_at", "language")
 
 
 # -----------------------------------
@@ -79,23 +155,329 @@ def _filter_by_date(results: List[Dict], date_from: Optional[str] = None, date_t
     return out
 
 
+def _search_opts(
+    ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+) -> Dict[str, Any]:
+    """kwargs para qc.search con sólo los knobs indicados (None = default del perfil)."""
+    opts: Dict[str, Any] = {}
+    if ef is not None:
+        opts["hnsw_ef"] = ef
+    if exact is not None:
+        opts["exact"] = exact
+    if score_threshold is not None:
+        opts["score_threshold"] = score_threshold
+    return opts
+
+
 # -----------------------------------
 # Ingesta Qdrant / Indexación
 # -----------------------------------
+def _passages(doc: Dict) -> List[str]:
+    """Textos a embeber para un documento: título+contenido, o título+pasaje si se trocea."""
+    title = doc.get("title", "") or ""
+    content = doc.get("content", "") or ""
+    if CHUNK_MAX_TOKENS <= 0 or approx_tokens(content) <= CHUNK_MAX_TOKENS:
+        return [f"{title} {content}".strip()]
+    return [f"{title} {p}".strip() for p in chunk_text(content, CHUNK_MAX_TOKENS, CHUNK_OVERLAP)]
+
+
+def build_point_groups(docs: List[Dict]) -> List[List[qm.PointStruct]]:
+    """
+    Embebe y arma los puntos Qdrant de varios documentos (sin escribir), agrupados por doc.
+    - Embebe título+contenido (o pasajes si CHUNK_MAX_TOKENS > 0), ordenados por longitud
+    - Usa ID determinista por URL (si existe) para idempotencia; los pasajes extra
+      usan IDs derivados de la URL y apuntan al artículo con 'parent_id'
+    - Con SENTIMENT_AT_INGEST guarda el tono del artículo en su payload (un lote por llamada)
+    - El 'content' queda en claro: se empaqueta al escribir (write_point_groups)
+    - Sella 'indexed_at' (epoch) en cabeza y pasajes: ingest.reindex lo usa para ponerse al día
+    """
+    passages = [_passages(doc) for doc in docs]
+    vecs = embed_documents([t for ps in passages for t in ps], mode="ingest")
+    tones: List[Dict[str, Any]] = [{} for _ in docs]
+    if sentiment.SENTIMENT_AT_INGEST:
+        # Primero puntúa: si el modelo no carga, el nombre debe ser el del fallback
+        scores = sentiment.score_texts([_doc_text(d) for d in docs])
+        name = sentiment.engine_name()
+        tones = [{"sentiment": s, "sentiment_engine": name} for s in scores]
+
+    groups: List[List[qm.PointStruct]] = []
+    row = 0
+    now = time.time()
+    for doc, ps, tone in zip(docs, passages, tones, strict=True):
+        url_str = str(doc.get("url", ""))
+        # 'indexed_at' de origen se conserva al re-embeber (ingest.reindex)
+        tone = {**tone, "indexed_at": doc.get("indexed_at") or now}
+        # Idempotencia entre corridas: mismo ID para misma URL
+        parent_id = _id_from_url(url_str) if url_str else str(uuid.uuid4())
+        n = len(ps)
+        group: List[qm.PointStruct] = []
+        for i in range(n):
+            if n == 1 and CHUNK_MAX_TOKENS <= 0:
+                payload = {**doc, **tone, "url": url_str}
+                pid = parent_id
+            elif i == 0:
+                payload = {**doc, **tone, "url": url_str, "parent_id": parent_id, "chunk_index": 0, "chunk_count": n}
+                pid = parent_id
+            else:
+                payload = {f: doc.get(f) for f in _PASSAGE_FIELDS}
+                payload.update({
+                    "url": url_str, "parent_id": parent_id, "chunk_index": i, "chunk_count": n,
+                    "indexed_at": tone["indexed_at"],
+                })
+                pid = _id_from_url(f"{url_str}#chunk={i}") if url_str else str(uuid.uuid4())
+            group.append(qm.PointStruct(id=pid, vector=vecs[row].tolist(), payload=payload))
+            row += 1
+        groups.append(group)
+    return groups
+
+
+def build_points(docs: List[Dict]) -> tuple:
+    """
+    Como build_point_groups, pero aplanado.
+    Devuelve (points, ids_de_artículos_troceados).
+    """
+    points = [p for g in build_point_groups(docs) for p in g]
+    chunked_ids = [str(p.id) for p in points if (p.payload or {}).get("chunk_index") == 0]
+    return points, chunked_ids
+
+
+def mark_near_duplicates(groups: List[List[qm.PointStruct]]) -> List[bool]:
+    """
+    Detecta casi-duplicados por similitud de embeddings y los enlaza a su original:
+    payload['canonical_id'] = id del original (o el propio id si es original).
+    - Contra Qdrant: una búsqueda por lote (query_batch_points, top-1 sobre artículos)
+    - Dentro del lote: matriz de similitud con NumPy
+    Devuelve una máscara 'conservar' por grupo (False sólo en modo 'drop').
+    """
+    keep = [True] * len(groups)
+    if NEAR_DUP_MODE == "off" or not groups:
+        return keep
+
+    heads = [g[0] for g in groups]
+    canonical = [str(h.id) for h in heads]
+    V = np.asarray([h.vector for h in heads], dtype=np.float32)
+
+    # 1) Contra lo ya indexado (excluye el propio id y los pasajes extra)
+    filters: List[Optional[Filter]] = [
+        Filter(
+            must_not=[
+                qm.HasIdCondition(has_id=[h.id]),
+                FieldCondition(key="chunk_index", range=qm.Range(gt=0)),
+            ]
+        )
+        for h in heads
+    ]
+    try:
+        results = qc.search_batch(
+            V.tolist(), top_k=1, query_filters=filters,
+            score_threshold=NEAR_DUP_THRESHOLD, with_payload=["canonical_id"],
+        )
+    except Exception:
+        # Colección vacía/no disponible: sólo deduplicamos dentro del lote
+        results = [[] for _ in heads]
+    matched = [False] * len(heads)
+    for i, hits in enumerate(results):
+        if hits:
+            other = hits[0]
+            canonical[i] = str((other.payload or {}).get("canonical_id") or other.id)
+            matched[i] = True
+
+    # 2) Dentro del lote: el primero de cada grupo de similares es el original
+    S = V @ V.T
+    for i in range(1, len(heads)):
+        if matched[i]:
+            continue
+        prev = np.nonzero(S[i, :i] >= NEAR_DUP_THRESHOLD)[0]
+        if prev.size:
+            canonical[i] = canonical[int(prev[0])]
+            matched[i] = True
+
+    for i, h in enumerate(heads):
+        if matched[i] and canonical[i] == str(h.id):
+            matched[i] = False
+        # Los pasajes heredan el canónico del artículo
+        for p in groups[i]:
+            if p.payload is None:
+                p.payload = {}
+            p.payload["canonical_id"] = canonical[i]
+        if matched[i] and NEAR_DUP_MODE == "drop":
+            keep[i] = False
+    return keep
+
+
+def index_many(docs: List[Dict]) -> int:
+    """
+    Indexa varios documentos en Qdrant con un solo embedding por lotes y un solo upsert.
+    Enlaza (o descarta, según NEAR_DUP_MODE) los casi-duplicados.
+    Devuelve la cantidad de documentos escritos.
+    """
+    if not docs:
+        return 0
+    groups = build_point_groups(docs)
+    keep = mark_near_duplicates(groups)
+    kept = [(d, g) for d, g, k in zip(docs, groups, keep, strict=True) if k]
+    return write_point_groups([d for d, _ in kept], [g for _, g in kept])
+
+
+def write_point_groups(docs: List[Dict], groups: List[List[qm.PointStruct]]) -> int:
+    """
+    Escribe grupos ya embebidos (y deduplicados) de 'docs': empaqueta el 'content' de las
+    cabezas (CONTENT_STORE; sólo lo que sobrevivió al descarte de casi-duplicados), borra
+    pasajes sobrantes, un solo upsert, evalúa alertas y actualiza el df del modelo de términos.
+    Compartido por index_many y la etapa de upsert del pipeline de ingesta.
+    """
+    model = _TERM_MODEL["model"]
+    new_docs = _unseen_docs(docs, groups) if model is not None else []
+    content_store.pack_many([(str(g[0].id), g[0].payload) for g in groups if g[0].payload is not None])
+    points = [p for g in groups for p in g]
+    chunked_ids = [str(p.id) for p in points if (p.payload or {}).get("chunk_index") == 0]
+    qc.delete_extra_passages(chunked_ids)
+    qc.upsert_articles(points)
+    alerts.notify_indexed(points)
+    if model is not None and new_docs:
+        model.partial_update([_doc_text(d) for d in new_docs])
+    return len(groups)
+
+
+def _unseen_docs(docs: List[Dict], groups: List[List[qm.PointStruct]]) -> List[Dict]:
+    """
+    Documentos cuyo artículo aún no está en la colección (una vez por id): re-ingerir
+    lo ya indexado no debe sumar df/n_docs al modelo de términos entre re-ajustes.
+    """
+    heads = [str(g[0].id) for g in groups]
+    try:
+        seen = {str(r.id) for r in qc.retrieve(heads, with_payload=False)}
+    except Exception as e:
+        log.debug("Sin lookup de ids para el modelo de términos: %s", e)
+        return []
+    out = []
+    for doc, pid in zip(docs, heads, strict=True):
+        if pid not in seen:
+            seen.add(pid)
+            out.append(doc)
+    return out
+
+
 def index_one(doc: Dict):
     """
     Indexa un documento en Qdrant.
     - Embebe título+contenido
     - Usa ID determinista por URL (si existe) para idempotencia
     """
-    url_str = str(doc.get("url", ""))
-    text = f"{doc.get('title', '')} {doc.get('content', '')}".strip()
-    vec = embed_texts([text])[0].tolist()
+    index_many([doc])
+
 
-    # Idempotencia entre corridas: mismo ID para misma URL
-    vec_id: Optional[str] = _id_from_url(url_str) if url_str else None
+# -----------------------------------
+# Modelo de términos (TF-IDF a nivel corpus)
+# -----------------------------------
+_TERM_MODEL: Dict[str, Any] = {"model": None, "at": None, "refitting": False, "mtime": None}
+_TERM_MODEL_LOCK = threading.Lock()
+# Archivo con el flock de dueño del re-ajuste (abierto mientras viva el proceso)
+_TERM_MODEL_OWNER: Dict[str, Any] = {"lock": None}
+
+
+def _doc_text(d: Dict) -> str:
+    return (d.get("title", "") or "") + "\n" + (d.get("content", "") or "")
+
+
+def _corpus_sample(limit: int) -> List[str]:
+    """Textos de hasta 'limit' artículos de la colección (sin pasajes extra; recientes primero)."""
+    flt = Filter(must_not=[FieldCondition(key="chunk_index", range=qm.Range(gt=0))])
+    fields = ["title", "content", *content_store.PACKED_FIELDS]
+    records = qc.scroll_points(flt, with_payload=fields, page_size=min(256, max(1, limit)))
+    return [
+        _doc_text(content_store.unpacked_payload(r.id, r.payload or {}))
+        for r in itertools.islice(records, limit)
+    ]
+
+
+def _owns_term_model() -> bool:
+    """True si este proceso es (o pasa a ser) el único que re-ajusta el modelo de términos."""
+    if _TERM_MODEL_OWNER["lock"] is not None:
+        return True
+    if not TFIDF_MODEL_PATH:
+        return True
+    try:
+        lock = open(f"{TFIDF_MODEL_PATH}.lock", "a")
+    except OSError as e:
+        log.warning("Sin lock del modelo TF-IDF (%s): se ajusta en este proceso", e)
+        return True
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return False
+    _TERM_MODEL_OWNER["lock"] = lock
+    return True
+
+
+def _published_age() -> float:
+    """Segundos desde que se publicó el modelo en TFIDF_MODEL_PATH (inf si no existe)."""
+    try:
+        return time.time() - os.stat(TFIDF_MODEL_PATH).st_mtime
+    except OSError:
+        return float("inf")
 
-    qc.upsert_article(vec_id, vec, payload={**doc, "url": url_str})
+
+def _load_term_model() -> None:
+    """Recarga el modelo publicado por el dueño si el archivo cambió."""
+    model: Optional[TermModel] = None
+    mtime = None
+    try:
+        mtime = os.stat(TFIDF_MODEL_PATH).st_mtime_ns
+        if mtime != _TERM_MODEL.get("mtime"):
+            model = TermModel.load(TFIDF_MODEL_PATH)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning("No se pudo cargar el modelo TF-IDF de %s: %s", TFIDF_MODEL_PATH, e)
+    with _TERM_MODEL_LOCK:
+        if model is not None and model.fitted:
+            _TERM_MODEL["model"] = model
+            _TERM_MODEL["mtime"] = mtime
+        _TERM_MODEL["at"] = time.monotonic()
+        _TERM_MODEL["refitting"] = False
+
+
+def refit_term_model() -> Optional[TermModel]:
+    """Ajusta el modelo de términos sobre una muestra del corpus, lo publica y lo guarda."""
+    model: Optional[TermModel] = None
+    try:
+        texts = _corpus_sample(TFIDF_CORPUS_SAMPLE)
+        model = TermModel(vocab_size=TFIDF_VOCAB_SIZE, min_df=2).fit(texts) if texts else None
+        if model is not None and model.fitted and TFIDF_MODEL_PATH:
+            model.save(TFIDF_MODEL_PATH)
+    except Exception as e:
+        log.warning("No se pudo ajustar el modelo TF-IDF: %s", e)
+    with _TERM_MODEL_LOCK:
+        if model is not None and model.fitted:
+            _TERM_MODEL["model"] = model
+        _TERM_MODEL["at"] = time.monotonic()
+        _TERM_MODEL["refitting"] = False
+    return _TERM_MODEL["model"]
+
+
+def term_model() -> Optional[TermModel]:
+    """
+    Modelo de términos vigente (None si aún no hay). Nunca bloquea: si falta o está
+    vencido, el dueño (ver _owns_term_model) lo re-ajusta en un hilo de fondo y el resto
+    de los procesos recarga el archivo publicado (cada TFIDF_RETRY_SECONDS como mucho).
+    """
+    now = time.monotonic()
+    with _TERM_MODEL_LOCK:
+        model, at = _TERM_MODEL["model"], _TERM_MODEL["at"]
+        owner = _owns_term_model()
+        ttl = TFIDF_REFIT_SECONDS if model is not None and owner else TFIDF_RETRY_SECONDS
+        stale = at is None or now - at > ttl
+        if stale and not _TERM_MODEL["refitting"]:
+            _TERM_MODEL["refitting"] = True
+            # Un dueño nuevo (p. ej. tras un reinicio) parte del modelo publicado si está al día
+            fresh = at is None and _published_age() < TFIDF_REFIT_SECONDS
+            target = refit_term_model if owner and not fresh else _load_term_model
+            threading.Thread(target=target, name="tfidf-refit", daemon=True).start()
+    return model
 
 
 # -----------------------------------
@@ -106,61 +488,332 @@ def search_query(
     k: int = 10,
     title_contains: Optional[str] = None,
     source: Optional[str] = None,
+    ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+    collapse: Optional[str] = None,
+    diversify: bool = False,
+    mmr_lambda: float = 0.5,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
 ) -> List[Dict]:
     """
     Búsqueda semántica (siempre) + filtros opcionales:
     - title_contains: full-text sobre 'title' (requiere índice de texto creado)
     - source: coincidencia exacta sobre 'source' (keyword index recomendado)
+    - ef / exact / score_threshold: knobs de calidad/velocidad (ver qc.search)
+    - collapse="duplicates": agrupa casi-duplicados bajo su original ('duplicates' = URLs)
+    - diversify: re-ranking MMR sobre un pool de k*MMR_POOL_FACTOR candidatos
+      (mmr_lambda=1 sólo relevancia, 0 sólo diversidad)
+    - date_from / date_to: con particiones por mes sólo consulta los meses del rango
+      (el filtro exacto por fecha lo aplica quien llama, ver get_topn_for_query)
     """
-    vec = embed_texts([q])[0].tolist()
+    with span("embed_query"):
+        vec = embed_texts([q])[0].tolist()
+    opts = _search_opts(ef, exact, score_threshold)
+    if diversify:
+        opts["with_vectors"] = True
+    opts.update({name: v for name, v in (("date_from", date_from), ("date_to", date_to)) if v})
+    with span("qdrant_search"):
+        hits = qc.search(
+            vec, top_k=_search_limit(k, collapse, diversify), query_filter=_query_filter(title_contains, source), **opts
+        )
+    return _rank(hits, vec, k, collapse, diversify, mmr_lambda)
+
+
+def search_queries(
+    queries: List[Dict[str, Any]],
+    ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+) -> List[List[Dict]]:
+    """
+    Varias búsquedas en lote: un solo embed_texts para todas las consultas y una sola
+    búsqueda por lotes en Qdrant (qc.search_batch). Cada consulta acepta los campos de
+    search_query (q, k, title_contains, source, collapse, diversify, mmr_lambda);
+    ef/exact/score_threshold son comunes al lote. Devuelve los resultados en el mismo orden.
+    """
+    if not queries:
+        return []
+    with span("embed_query"):
+        vecs = embed_texts([x["q"] for x in queries])
+    with span("qdrant_search"):
+        hits = qc.search_batch(
+            [v.tolist() for v in vecs],
+            top_k=[_search_limit(x.get("k", 10), x.get("collapse"), x.get("diversify", False)) for x in queries],
+            query_filters=[_query_filter(x.get("title_contains"), x.get("source")) for x in queries],
+            with_vectors=[bool(x.get("diversify")) for x in queries],
+            **_search_opts(ef, exact, score_threshold),
+        )
+    return [
+        _rank(h, v.tolist(), x.get("k", 10), x.get("collapse"), x.get("diversify", False), x.get("mmr_lambda", 0.5))
+        for x, v, h in zip(queries, vecs, hits, strict=True)
+    ]
+
 
+def _query_filter(title_contains: Optional[str] = None, source: Optional[str] = None) -> Optional[Filter]:
+    """Filtro de /search: full-text sobre 'title' y/o fuente exacta (None si no hay)."""
     must = []
     if title_contains and title_contains.strip():
         must.append(FieldCondition(key="title", match=MatchText(text=title_contains.strip())))
     if source and source.strip():
         must.append(FieldCondition(key="source", match=MatchValue(value=source.strip())))
+    return Filter(must=must) if must else None
+
+
+def _conditions(conds: Any) -> List[Any]:
+    """must/should/must_not de un Filter como lista (Qdrant admite una condición suelta)."""
+    if conds is None:
+        return []
+    return list(conds) if isinstance(conds, list) else [conds]
+
+
+def _search_limit(k: int, collapse: Optional[str] = None, diversify: bool = False) -> int:
+    """Hits a pedir a Qdrant para devolver k resultados tras colapsar/diversificar."""
+    # Con chunking varios pasajes del mismo artículo compiten por el top-k: sobre-recupera
+    limit = k * max(1, CHUNK_SEARCH_OVERSAMPLE) if CHUNK_MAX_TOKENS > 0 else k
+    if collapse == "duplicates":
+        limit *= max(1, DUP_COLLAPSE_OVERSAMPLE)
+    if diversify:
+        limit *= max(1, MMR_POOL_FACTOR)
+    return limit
+
+
+def _rank(
+    hits: List[Any],
+    vec: List[float],
+    k: int,
+    collapse: Optional[str] = None,
+    diversify: bool = False,
+    mmr_lambda: float = 0.5,
+) -> List[Dict]:
+    """Hits -> top-k resultados: agrega pasajes, colapsa duplicados y aplica MMR."""
+    collapse_dups = collapse == "duplicates"
+    pool = _search_limit(k, collapse, diversify) if (collapse_dups or diversify) else k
+    with span("collapse"):
+        pairs = _collapse_passages(hits, pool)
+        groups = _collapse_duplicates(pairs, pool) if collapse_dups else [(h, p, None) for h, p in pairs]
+    if diversify and groups:
+        with span("mmr"):
+            cand = np.asarray([g[0].vector for g in groups], dtype=np.float32)
+            groups = [groups[i] for i in mmr_select(np.asarray(vec), cand, k, mmr_lambda)]
+    return [_result(h, p, dups) for h, p, dups in groups[:k]]
+
+
+def _result(h: Any, p: Dict, duplicates: Optional[List[str]] = None) -> Dict:
+    """Fila de resultado de búsqueda a partir de un hit y el payload de su artículo."""
+    out = {
+        "title": p.get("title"),
+        "url": p.get("url"),
+        "source": p.get("source"),
+        "score": float(h.score),
+        "snippet": p["snippet"] if "snippet" in p else (p.get("content") or "")[:240],
+        "published_at": p.get("published_at"),
+        "content": p.get("content"),  # útil para análisis extra
+    }
+    # Contenido comprimido/externo: los builders lo descomprimen con _hydrate_content
+    if content_store.is_packed(p):
+        out["_packed"] = (p.get("parent_id") or getattr(h, "id", None), p)
+    if duplicates is not None:
+        out["duplicates"] = duplicates
+    # Tono calculado al indexar (sólo si lo produjo el motor vigente)
+    if p.get("sentiment") is not None and p.get("sentiment_engine") == sentiment.engine_name():
+        out["sentiment"] = float(p["sentiment"])
+    return out
+
+
+def _hydrate_content(docs: List[Dict]) -> List[Dict]:
+    """'content' en claro para los builders (sólo las filas con contenido empaquetado)."""
+    with span("unpack_content"):
+        for d in docs:
+            packed = d.pop("_packed", None)
+            if packed is not None:
+                d["content"] = content_store.unpack(*packed)
+    return docs
 
-    query_filter: Optional[Filter] = Filter(must=must) if must else None
 
-    hits = qc.search(vec, top_k=k, query_filter=query_filter)
+def _collapse_duplicates(pairs: List[tuple], k: int) -> List[tuple]:
+    """
+    Agrupa pares (hit, payload) por 'canonical_id' (o id) conservando el de mejor score.
+    Devuelve hasta k tríos (hit, payload, [urls de los duplicados agrupados]).
+    """
+    groups: Dict[str, list] = {}
+    for h, p in pairs:
+        key = str(p.get("canonical_id") or getattr(h, "id", None) or p.get("url"))
+        if key in groups:
+            groups[key][2].append(p.get("url"))
+        elif len(groups) < k:
+            groups[key] = [h, p, []]
+    return [tuple(g) for g in groups.values()]
+
+
+def _has_text(p: Dict) -> bool:
+    return "content" in p or "snippet" in p
+
 
-    results: List[Dict] = []
+def _collapse_passages(hits: List[Any], k: int) -> List[tuple]:
+    """
+    Agrega hits de pasajes a su artículo (mejor score por 'parent_id') y devuelve hasta k
+    pares (hit, payload_artículo). Los payloads de pasajes sin contenido (ni snippet) se
+    hidratan con el payload del artículo padre en una sola llamada a retrieve.
+    """
+    best: Dict[str, Any] = {}
     for h in hits:
         p = h.payload or {}
-        results.append(
-            {
-                "title": p.get("title"),
-                "url": p.get("url"),
-                "source": p.get("source"),
-                "score": float(h.score),
-                "snippet": (p.get("content") or "")[:240],
-                "published_at": p.get("published_at"),
-                "content": p.get("content"),  # útil para análisis extra
-            }
-        )
-    return results
+        key = str(p.get("parent_id") or getattr(h, "id", None) or p.get("url"))
+        if key not in best:
+            best[key] = h
+        if len(best) >= k:
+            break
+
+    missing = [
+        str(p["parent_id"]) for p in (h.payload or {} for h in best.values())
+        if not _has_text(p) and p.get("parent_id")
+    ]
+    parents: Dict[str, Dict] = {}
+    if missing:
+        parents = {str(r.id): (r.payload or {}) for r in qc.retrieve(missing)}
+
+    out: List[tuple] = []
+    for h in best.values():
+        p = h.payload or {}
+        if not _has_text(p) and p.get("parent_id"):
+            p = {**p, **parents.get(str(p["parent_id"]), {})}
+        out.append((h, p))
+    return out
 
 
 def get_doc_by_url(url: str) -> Optional[Dict]:
     """
     Devuelve el payload completo del documento cuyo payload.url == url, o None si no existe.
     """
-    client = qc.get_client()
-    flt = Filter(must=[FieldCondition(key="url", match=MatchValue(value=url))])
-    points, _ = client.scroll(
-        collection_name=qc.COLLECTION,
-        scroll_filter=flt,
-        with_payload=True,
-        limit=1,
+    return get_docs_by_url([url])[0]
+
+
+def get_docs_by_url(urls: List[str], fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+    """
+    Payloads de los documentos por URL exacta, en el mismo orden (None si no existe).
+    - Lookup directo por ID determinista (_id_from_url): un solo retrieve para todo el lote
+    - Puntos legacy (ID no derivado de la URL): scroll filtrado por 'url' (índice keyword)
+    - fields: sólo esos campos del payload (None = todos)
+    - 'content' comprimido o en el store externo se descomprime aquí (sólo si se pide)
+    """
+    if not urls:
+        return []
+    ids = [_id_from_url(u) for u in urls]
+    found = {
+        str(r.id): _public_payload(r.id, r.payload or {}, fields)
+        for r in qc.retrieve(ids, with_payload=_payload_fields(fields))
+    }
+    out: List[Optional[Dict]] = [found.get(i) for i in ids]
+    missing = [u for u, d in zip(urls, out, strict=True) if d is None]
+    if missing and DOC_LEGACY_FALLBACK:
+        legacy = _docs_by_url_scroll(missing, fields)
+        out = [d if d is not None else legacy.get(u) for u, d in zip(urls, out, strict=True)]
+    return out
+
+
+def _payload_fields(fields: Optional[List[str]]) -> Any:
+    """with_payload para leer 'fields' (con los campos empaquetados si se pide 'content')."""
+    if not fields:
+        return True
+    return list(dict.fromkeys([*fields, *content_store.PACKED_FIELDS] if "content" in fields else fields))
+
+
+def _public_payload(pid: Any, payload: Dict, fields: Optional[List[str]]) -> Dict:
+    return content_store.unpacked_payload(pid, payload, with_content=not fields or "content" in fields)
+
+
+def _docs_by_url_scroll(urls: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Mapa url -> payload del artículo (no pasajes) vía scroll filtrado por 'url'."""
+    flt = Filter(
+        must=[FieldCondition(key="url", match=qm.MatchAny(any=list(urls)))],
+        must_not=[FieldCondition(key="chunk_index", range=qm.Range(gt=0))],
     )
-    if not points:
+    with_payload: Any = sorted(set(_payload_fields(fields)) | {"url"}) if fields else True
+    out: Dict[str, Dict] = {}
+    for p in qc.scroll_points(flt, with_payload=with_payload, page_size=max(16, len(urls))):
+        payload = dict(_public_payload(p.id, p.payload or {}, fields))
+        url = payload.get("url") if fields is None or "url" in fields else payload.pop("url", None)
+        if url is not None:
+            out.setdefault(url, payload)
+        if len(out) >= len(set(urls)):
+            break
+    return out
+
+
+def _point_ids_by_url(urls: List[str], with_vectors: bool = False) -> Dict[str, Any]:
+    """
+    Mapa url -> punto del artículo (id y, opcionalmente, vector) sin pasar por el modelo:
+    retrieve por ID determinista y, para puntos legacy, scroll filtrado por 'url'.
+    """
+    if not urls:
+        return {}
+    by_id = {_id_from_url(u): u for u in urls}
+    out = {by_id[str(r.id)]: r for r in qc.retrieve(list(by_id), with_payload=False, with_vectors=with_vectors)}
+    missing = [u for u in urls if u not in out]
+    if missing and DOC_LEGACY_FALLBACK:
+        flt = Filter(
+            must=[FieldCondition(key="url", match=qm.MatchAny(any=missing))],
+            must_not=[FieldCondition(key="chunk_index", range=qm.Range(gt=0))],
+        )
+        for r in qc.scroll_points(flt, with_payload=["url"], with_vectors=with_vectors, page_size=max(16, len(missing))):
+            url = (r.payload or {}).get("url")
+            if url:
+                out.setdefault(str(url), r)
+            if len(out) >= len(urls):
+                break
+    return out
+
+
+def similar_docs(
+    url: str,
+    k: int = 10,
+    negative_urls: Optional[List[str]] = None,
+    title_contains: Optional[str] = None,
+    source: Optional[str] = None,
+    ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+    collapse: Optional[str] = None,
+    diversify: bool = False,
+    mmr_lambda: float = 0.5,
+    strategy: Optional[str] = None,
+) -> Optional[List[Dict]]:
+    """
+    "Más como esto" a partir de los vectores ya guardados (recommend de Qdrant): el
+    artículo 'url' como ejemplo positivo y 'negative_urls' como negativos, con los
+    mismos filtros y post-proceso que search_query. Nunca llama al modelo de embeddings.
+    Excluye el propio artículo (y sus pasajes). None si 'url' no está indexada.
+    """
+    negative_urls = [u for u in (negative_urls or []) if u != url]
+    with span("resolve_ids"):
+        points = _point_ids_by_url([url] + negative_urls, with_vectors=diversify)
+    if url not in points:
         return None
-    return points[0].payload
+    pos = points[url]
+    neg_ids = [str(points[u].id) for u in negative_urls if u in points]
+
+    flt = _query_filter(title_contains, source) or Filter()
+    flt.must_not = _conditions(flt.must_not) + [
+        qm.HasIdCondition(has_id=[pos.id]),
+        FieldCondition(key="parent_id", match=MatchValue(value=str(pos.id))),
+    ]
+    opts = _search_opts(ef, exact, score_threshold)
+    if diversify:
+        opts["with_vectors"] = True
+    with span("qdrant_recommend"):
+        hits = qc.recommend(
+            [str(pos.id)], neg_ids, top_k=_search_limit(k, collapse, diversify),
+            query_filter=flt, strategy=strategy, **opts,
+        )
+    return _rank(hits, pos.vector if diversify else [], k, collapse, diversify, mmr_lambda)
 
 
 # -----------------------------------
 # Helpers para endpoints BONUS
 # -----------------------------------
+@timed("topn")
 def get_topn_for_query(
     q: str,
     k: int = 20,
@@ -168,14 +821,25 @@ def get_topn_for_query(
     source: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+    collapse: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
     Wrapper que reutiliza search_query y aplica filtros de fecha en memoria.
     Mantiene la firma simple para ser invocado desde los builders.
+    Sin ef/score_threshold explícitos usa los defaults de análisis (ANALYSIS_*).
     """
-    items = search_query(q=q, k=k, title_contains=title_contains, source=source)
+    items = search_query(
+        q=q, k=k, title_contains=title_contains, source=source,
+        ef=ef if ef is not None else ANALYSIS_SEARCH_EF,
+        exact=exact,
+        score_threshold=score_threshold if score_threshold is not None else ANALYSIS_SCORE_THRESHOLD,
+        collapse=collapse, date_from=date_from, date_to=date_to,
+    )
     items = _filter_by_date(items, date_from=date_from, date_to=date_to)
-    return items
+    return _hydrate_content(items)
 
 
 # -----------------------------------
@@ -190,16 +854,22 @@ def build_storyline(
     source: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+    collapse: Optional[str] = None,
 ) -> StorylineResponse:
     """
     Agrupa top-N resultados en “hilos” (clusters) por similitud (coseno) y los ordena temporalmente.
     """
     docs = get_topn_for_query(
-        q, k=k, title_contains=title_contains, source=source, date_from=date_from, date_to=date_to
+        q, k=k, title_contains=title_contains, source=source, date_from=date_from, date_to=date_to,
+        ef=ef, exact=exact, score_threshold=score_threshold, collapse=collapse,
     )
     texts = [(d.get("title", "") or "") + "\n" + (d.get("content", "") or "") for d in docs]
     # embed_batch -> List[List[float]]
-    emb = embed_batch(texts)
+    with span("embed_docs"):
+        emb = embed_batch(texts)
 
     # Fechas normalizadas
     dates: List[Optional[dt.datetime]] = []
@@ -238,6 +908,48 @@ def build_storyline(
 
 
 # Agrupa por source
+def _topn_by_source(
+    q: str,
+    sources_filter: Optional[List[str]] = None,
+    per_source: int = 5,
+    max_sources: int = PERSPECTIVE_MAX_SOURCES,
+    title_contains: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Top 'per_source' documentos de cada fuente en una sola búsqueda agrupada por
+    'source' (qc.search_groups), así una fuente dominante no desplaza a las chicas.
+    sources_filter restringe las fuentes con MatchAny; sin él, las max_sources mejores.
+    """
+    with span("embed_query"):
+        vec = embed_texts([q])[0].tolist()
+    flt = _query_filter(title_contains) or Filter()
+    sources = [s.strip() for s in sources_filter or [] if s and s.strip()]
+    if sources:
+        flt.must = _conditions(flt.must) + [FieldCondition(key="source", match=qm.MatchAny(any=sources))]
+    # Con chunking varios pasajes de un artículo caen en el mismo grupo: sobre-recupera
+    oversample = max(1, CHUNK_SEARCH_OVERSAMPLE) if CHUNK_MAX_TOKENS > 0 else 1
+    with span("qdrant_search"):
+        groups = qc.search_groups(
+            vec, group_by="source", group_size=per_source * oversample,
+            limit=len(sources) if sources else max_sources,
+            query_filter=flt if (flt.must or flt.must_not) else None,
+            hnsw_ef=ef if ef is not None else ANALYSIS_SEARCH_EF,
+            exact=exact,
+            score_threshold=score_threshold if score_threshold is not None else ANALYSIS_SCORE_THRESHOLD,
+            date_from=date_from, date_to=date_to,
+        )
+    docs: List[Dict[str, Any]] = []
+    with span("collapse"):
+        for _, hits in groups:
+            docs.extend(_result(h, p) for h, p in _collapse_passages(hits, per_source))
+    return _hydrate_content(_filter_by_date(docs, date_from=date_from, date_to=date_to))
+
+
 def build_perspective(
     q: str,
     sources_filter: Optional[List[str]] = None,
@@ -245,41 +957,51 @@ def build_perspective(
     title_contains: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+    per_source: Optional[int] = None,
 ) -> PerspectiveResponse:
     """
     Compara cobertura por fuente: entidades, términos (TF-IDF), tono heurístico, volumen e histograma temporal.
+    Recupera un número fijo de documentos por fuente (per_source; por defecto k repartido
+    entre las fuentes pedidas o PERSPECTIVE_MAX_SOURCES).
     """
-    # Adaptamos filtro de fuentes: si hay varias, haremos filtrado en memoria después.
-    docs = get_topn_for_query(
-        q, k=k, title_contains=title_contains,
-        # Pasamos source sólo si es una única fuente (optimization),
-        source=(sources_filter[0] if sources_filter and len(sources_filter) == 1 else None),
-        date_from=date_from, date_to=date_to
+    n_sources = len(sources_filter) if sources_filter else PERSPECTIVE_MAX_SOURCES
+    per_source = per_source or max(1, -(-k // max(1, n_sources)))
+    docs = _topn_by_source(
+        q, sources_filter=sources_filter, per_source=per_source, title_contains=title_contains,
+        date_from=date_from, date_to=date_to, ef=ef, exact=exact, score_threshold=score_threshold,
     )
 
-    # Si se pidieron múltiples fuentes, filtramos en memoria
-    if sources_filter and len(sources_filter) > 1:
-        allowed = set(s.strip() for s in sources_filter)
-        docs = [d for d in docs if (d.get("source") or "") in allowed]
-
     by_source: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
     for d in docs:
         by_source[d.get("source", "unknown")].append(d)
 
+    # Términos por fuente: un solo transform TF-IDF (IDF del corpus) + agregación por fuente
+    terms_by_source = grouped_top_terms(
+        [_doc_text(d) for d in docs], [d.get("source", "unknown") for d in docs], k=8, model=term_model()
+    )
+
+    # Tono: el del payload (calculado al indexar) y, para el resto, un solo lote del motor
+    missing = [d for d in docs if d.get("sentiment") is None]
+    for d, score in zip(missing, sentiment.score_texts([_doc_text(d) for d in missing]), strict=True):
+        d["sentiment"] = score
+
     res: List[SourcePerspective] = []
     for src, items in by_source.items():
-        texts = [(i.get("title", "") or "") + "\n" + (i.get("content", "") or "") for i in items]
+        texts = [_doc_text(i) for i in items]
         ents = []
         sentiments = []
         dates = []
         for t, i in zip(texts, items):
             ents.extend(extract_entities(t))
-            sentiments.append(_sentiment_score(t))
+            sentiments.append(i["sentiment"])
             # yyyy-mm-dd para histograma simple
             day = (i.get("published_at") or "")[:10]
             dates.append(day if len(day) == 10 else "unknown")
         top_entities = [e for e, _ in Counter([x[0] for x in ents]).most_common(8)]
-        top_terms = tfidf_top_terms(texts, k=8)
+        top_terms = terms_by_source.get(src, [])
         hist = Counter(dates)
         res.append(
             SourcePerspective(
@@ -304,32 +1026,39 @@ def build_graph(
     source: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+    collapse: Optional[str] = None,
 ) -> GraphResponse:
     """
     Grafo de co-ocurrencia de entidades por artículo (nivel documento).
     Para granularidad por oración, se puede extender con segmentación de spaCy.
     """
     docs = get_topn_for_query(
-        q, k=k, title_contains=title_contains, source=source, date_from=date_from, date_to=date_to
+        q, k=k, title_contains=title_contains, source=source, date_from=date_from, date_to=date_to,
+        ef=ef, exact=exact, score_threshold=score_threshold, collapse=collapse,
     )
 
     co = Counter()
     types: Dict[str, str] = {}
-    for d in docs:
-        text = (d.get("title", "") or "") + "\n" + (d.get("content", "") or "")
-        ents = extract_entities(text)
-        # normaliza claves por artículo y evita duplicados dentro del mismo doc
-        uniq: Dict[str, str] = {}
-        for label, t in ents:
-            key = label.strip()
-            if key:
-                uniq[key] = t
-        labels = sorted(uniq.keys())
-        for a_i in range(len(labels)):
-            for b_i in range(a_i + 1, len(labels)):
-                a, b = labels[a_i], labels[b_i]
-                co[(a, b)] += 1
-        types.update(uniq)
+    doc_ents = [
+        extract_entities((d.get("title", "") or "") + "\n" + (d.get("content", "") or "")) for d in docs
+    ]
+    with span("cooccurrence"):
+        for ents in doc_ents:
+            # normaliza claves por artículo y evita duplicados dentro del mismo doc
+            uniq: Dict[str, str] = {}
+            for label, t in ents:
+                key = label.strip()
+                if key:
+                    uniq[key] = t
+            labels = sorted(uniq.keys())
+            for a_i in range(len(labels)):
+                for b_i in range(a_i + 1, len(labels)):
+                    a, b = labels[a_i], labels[b_i]
+                    co[(a, b)] += 1
+            types.update(uniq)
 
     nodes = [GraphNode(id=k_, label=k_, type=types.get(k_, "MISC")) for k_ in sorted(types.keys())]
     edges = [GraphEdge(source=a, target=b, weight=w) for (a, b), w in co.most_common(200)]
@@ -0,0 +1,88 @@
+"""
+Spans/timers livianos por etapa (embed de la consulta, Qdrant, NER, TF-IDF, clustering...).
+
+- span("etapa") / @timed("etapa") miden la duración de un bloque/función.
+- Dentro de una petición (middleware en api.main) las duraciones se acumulan por etapa
+  y al final se exportan a STAGE_LATENCY con labels endpoint/stage, y opcionalmente
+  como cabecera Server-Timing (SERVER_TIMING=1).
+- Fuera de una petición (jobs, benchmarks) cada span se observa directamente
+  con endpoint="none".
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import Histogram
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").strip().lower() in ("1", "true", "yes", "on")
+
+STAGE_LATENCY = Histogram(
+    "stage_latency_seconds",
+    "Latencia por etapa interna (suma por petición)",
+    ["endpoint", "stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+class Trace:
+    """Duraciones acumuladas por etapa dentro de una petición."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def observe(self, endpoint: str) -> None:
+        for stage, seconds in self.stages.items():
+            STAGE_LATENCY.labels(endpoint=endpoint, stage=stage).observe(seconds)
+
+    def server_timing(self) -> str:
+        """Valor de la cabecera Server-Timing (duraciones en ms)."""
+        return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items())
+
+
+_TRACE: ContextVar[Optional[Trace]] = ContextVar("stage_trace", default=None)
+
+
+def start_trace() -> Trace:
+    """Abre un Trace para el contexto actual (lo usa el middleware por petición)."""
+    trace = Trace()
+    _TRACE.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _TRACE.get()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Mide el bloque como 'stage' (acumula en el Trace actual u observa directamente)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        trace = _TRACE.get()
+        if trace is not None:
+            trace.add(stage, elapsed)
+        else:
+            STAGE_LATENCY.labels(endpoint="none", stage=stage).observe(elapsed)
+
+
+def timed(stage: str):
+    """Decorador equivalente a envolver la función en span(stage)."""
+
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
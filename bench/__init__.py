@@ -0,0 +1 @@
+"""Benchmarks reproducibles de los hot paths (ver bench.run)."""
@@ -0,0 +1,86 @@
+"""
+Corpus sintético de noticias (determinista por semilla) para benchmarks.
+
+Cada artículo pertenece a un tema (vocabulario propio + palabras comunes), tiene
+fuente, fecha en una ventana de días y largo variable; una fracción son
+casi-duplicados (misma nota republicada por otra fuente con cambios mínimos).
+"""
+import datetime as dt
+import random
+from typing import Dict, List, Optional
+
+TOPICS: Dict[str, List[str]] = {
+    "economia": ["banco", "central", "tasa", "interés", "inflación", "mercado", "bolsa", "dólar",
+                 "crecimiento", "deuda", "fiscal", "exportaciones", "empleo", "salario", "crisis"],
+    "politica": ["gobierno", "congreso", "elecciones", "ministro", "reforma", "oposición", "ley",
+                 "senado", "votación", "partido", "presidente", "campaña", "coalición", "decreto"],
+    "deportes": ["partido", "gol", "liga", "equipo", "entrenador", "campeonato", "jugador",
+                 "selección", "torneo", "final", "estadio", "fichaje", "victoria", "derrota"],
+    "tecnologia": ["inteligencia", "artificial", "datos", "startup", "software", "red", "nube",
+                  "ciberseguridad", "algoritmo", "chip", "móvil", "plataforma", "innovación"],
+    "salud": ["hospital", "vacuna", "médicos", "pacientes", "virus", "tratamiento", "salud",
+              "campaña", "epidemia", "investigación", "clínica", "prevención", "síntomas"],
+    "clima": ["lluvias", "sequía", "temperatura", "emisiones", "energía", "renovable", "incendio",
+              "tormenta", "glaciares", "agua", "contaminación", "riesgo", "ambiental"],
+}
+COMMON = ["según", "informó", "este", "año", "país", "nacional", "nuevo", "sector", "región",
+          "anunció", "expertos", "datos", "semana", "autoridades", "proyecto", "avance", "caída"]
+ENTITIES = ["Ana Pérez", "Banco Mundial", "FMI", "Bogotá", "Madrid", "Luis Gómez", "ONU",
+            "Ministerio de Hacienda", "Real Madrid", "Google", "OMS", "Buenos Aires", "México"]
+SOURCES = ["eltiempo.com", "elpais.com", "clarin.com", "infobae.com", "bbc.com", "semana.com",
+           "lanacion.com.ar", "elespectador.com"]
+
+
+def _sentence(rng: random.Random, vocab: List[str]) -> str:
+    words = [rng.choice(vocab) if rng.random() < 0.65 else rng.choice(COMMON) for _ in range(rng.randint(8, 18))]
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), rng.choice(ENTITIES))
+    return " ".join(words).capitalize() + "."
+
+
+def make_corpus(
+    n: int,
+    seed: int = 42,
+    min_sentences: int = 4,
+    max_sentences: int = 40,
+    dup_rate: float = 0.1,
+    days: int = 60,
+    start: Optional[dt.datetime] = None,
+) -> List[Dict]:
+    """Genera n docs con el contrato de /index."""
+    rng = random.Random(seed)
+    start = start or dt.datetime(2025, 1, 1, tzinfo=dt.timezone.utc)
+    topics = list(TOPICS)
+    docs: List[Dict] = []
+    for i in range(n):
+        if docs and rng.random() < dup_rate:
+            orig = rng.choice(docs)
+            sentences = orig["content"].split(". ")
+            sentences[-1] = _sentence(rng, COMMON)
+            docs.append({
+                **orig,
+                "url": f"https://{rng.choice(SOURCES)}/nota/{i}",
+                "source": rng.choice(SOURCES),
+                "content": ". ".join(sentences),
+            })
+            continue
+        topic = rng.choice(topics)
+        vocab = TOPICS[topic]
+        content = " ".join(_sentence(rng, vocab) for _ in range(rng.randint(min_sentences, max_sentences)))
+        source = rng.choice(SOURCES)
+        docs.append({
+            "title": " ".join(rng.sample(vocab, 4)).capitalize(),
+            "url": f"https://{source}/nota/{i}",
+            "source": source,
+            "published_at": (start + dt.timedelta(minutes=rng.randrange(days * 24 * 60))).isoformat(),
+            "content": content,
+            "language": "es",
+        })
+    return docs
+
+
+def make_queries(n: int, seed: int = 7) -> List[str]:
+    """Consultas cortas (2-4 términos) de un tema al azar."""
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    return [" ".join(rng.sample(TOPICS[rng.choice(topics)], rng.randint(2, 4))) for _ in range(n)]
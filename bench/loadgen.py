@@ -0,0 +1,144 @@
+"""
+Generador de carga: reproduce un log de consultas contra la API a un RPS objetivo.
+
+Carga en lazo abierto: la petición i se programa en t0 + i/rps sin esperar a las
+anteriores; la latencia se mide desde el instante programado (incluye la espera por
+falta de conexiones libres) para no esconder colas (coordinated omission). También
+se reporta la latencia de servicio pura.
+
+Log de consultas (una por línea):
+    banco central tasas                                       -> GET /search?q=...
+    {"path": "/storyline", "params": {"q": "elecciones", "k": 30}}
+
+Uso:
+    python -m bench.loadgen --url http://localhost:8080 --log queries.txt --rps 50 --duration 60
+    python -m bench.loadgen --url http://localhost:8080 --rps 20 --requests 1000 --out /tmp/load.json
+
+Combínalo con GET /admin/profile/cpu?seconds=30 para perfilar el pod bajo carga.
+"""
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from bench.corpus import make_queries
+from bench.run import summarize
+
+
+def load_log(path: Optional[str], default_path: str = "/search", k: int = 10) -> List[Tuple[str, Dict]]:
+    """(path, params) por línea del log; sin log usa consultas sintéticas."""
+    lines = make_queries(200) if path is None else open(path, encoding="utf-8").read().splitlines()
+    out = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            obj = json.loads(line)
+            out.append((obj.get("path", default_path), obj.get("params") or {"q": obj["q"]}))
+        else:
+            out.append((default_path, {"q": line, "k": k}))
+    return out
+
+
+def run_load(
+    base_url: str,
+    requests: List[Tuple[str, Dict]],
+    rps: float,
+    duration: Optional[float] = None,
+    total: Optional[int] = None,
+    concurrency: int = 32,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = 30.0,
+) -> Dict:
+    import httpx
+
+    n = total if total is not None else int(rps * (duration or 60))
+    latencies: List[float] = []
+    service: List[float] = []
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+
+    client = httpx.Client(
+        base_url=base_url.rstrip("/"),
+        headers=headers or {},
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    )
+
+    def _one(scheduled: float, path: str, params: Dict) -> None:
+        t_start = time.perf_counter()
+        status: Union[int, str]
+        try:
+            status = client.get(path, params=params).status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        end = time.perf_counter()
+        with lock:
+            statuses[status] += 1
+            latencies.append(end - scheduled)
+            service.append(end - t_start)
+
+    t0 = time.perf_counter()
+    with client, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, (path, params) in zip(range(n), itertools.cycle(requests)):
+            scheduled = t0 + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_one, scheduled, path, params)
+    elapsed = time.perf_counter() - t0
+
+    ok = sum(c for s, c in statuses.items() if isinstance(s, int) and s < 400)
+    return {
+        "sent": n,
+        "ok": ok,
+        "errors": n - ok,
+        "statuses": {str(s): c for s, c in statuses.items()},
+        "target_rps": rps,
+        "achieved_rps": round(n / max(1e-9, elapsed), 2),
+        "latency": summarize(latencies) if latencies else {},
+        "service_latency": summarize(service) if service else {},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Reproduce un log de consultas a un RPS objetivo.")
+    parser.add_argument("--url", default="http://localhost:8080", help="URL base de la API")
+    parser.add_argument("--log", default=None, help="Log de consultas (default: sintéticas)")
+    parser.add_argument("--path", default="/search", help="Endpoint para líneas de texto plano")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rps", type=float, default=10.0)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--duration", type=float, default=None, help="Segundos de carga (default 60)")
+    group.add_argument("--requests", type=int, default=None, help="Total de peticiones")
+    parser.add_argument("--concurrency", type=int, default=32, help="Conexiones/peticiones en vuelo")
+    parser.add_argument("--header", action="append", default=[], help="'Nombre: valor' (repetible)")
+    parser.add_argument("--out", default=None, help="Escribe el resumen en este JSON")
+    args = parser.parse_args(argv)
+
+    headers = dict(h.split(":", 1) for h in args.header)
+    headers = {k.strip(): v.strip() for k, v in headers.items()}
+    res = run_load(
+        args.url,
+        load_log(args.log, args.path, args.k),
+        rps=args.rps,
+        duration=args.duration,
+        total=args.requests,
+        concurrency=args.concurrency,
+        headers=headers,
+    )
+    print(json.dumps(res, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2)
+    return 0 if res["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
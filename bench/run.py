@@ -0,0 +1,374 @@
+"""
+Benchmarks de los hot paths: embedding, indexación, búsqueda, builders de análisis e ingesta.
+
+Corre contra Qdrant embebido (":memory:", default), el índice NumPy (--qdrant embedded)
+o el servidor configurado, con el modelo real o embeddings hash deterministas
+(--embedder hash: aísla el costo de Qdrant/análisis del modelo). Reporta p50/p95/p99
+por escenario y docs/s donde aplica, y compara contra un baseline JSON.
+
+Uso:
+    python -m bench.run                                   # todos los escenarios
+    python -m bench.run --scenarios search,storyline --docs 5000 --repeat 50
+    python -m bench.run --embedder hash --out bench/results.json
+    python -m bench.run --save-baseline bench/baseline.json
+    python -m bench.run --baseline bench/baseline.json --tolerance 0.2   # exit 1 si hay regresión
+
+Escenarios: embed, index, search, storyline, perspective, graph, ingest
+"""
+import argparse
+import datetime as dt
+import hashlib
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from bench.corpus import make_corpus, make_queries
+
+log = logging.getLogger(__name__)
+
+SCENARIOS = ("embed", "index", "search", "storyline", "perspective", "graph", "ingest")
+EMBED_BATCH_SIZES = (1, 8, 32, 64)
+SEARCH_KS = (10, 50)
+ANALYSIS_KS = (20, 50)
+
+
+# -----------------------------------
+# Medición
+# -----------------------------------
+def summarize(samples: List[float], docs: Optional[int] = None) -> Dict[str, float]:
+    """p50/p95/p99/mean en ms (+ docs/s si cada muestra procesa 'docs' documentos)."""
+    arr = np.asarray(samples, dtype=np.float64) * 1000.0
+    out = {
+        "n": len(samples),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p95_ms": float(np.percentile(arr, 95)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "mean_ms": float(arr.mean()),
+    }
+    if docs:
+        out["docs_per_sec"] = float(docs * len(samples) / max(1e-9, sum(samples)))
+    return out
+
+
+def measure(fn: Callable[[int], object], repeat: int, warmup: int = 1) -> List[float]:
+    """Tiempos (s) de 'repeat' llamadas fn(i) tras 'warmup' llamadas descartadas."""
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+# -----------------------------------
+# Embeddings hash (sin modelo)
+# -----------------------------------
+def hash_embed(texts: List[str], mode: str = "query") -> np.ndarray:
+    """Bag-of-words hasheado y normalizado: textos con palabras comunes se parecen."""
+    from clients.qdrant_client import VECTOR_SIZE
+
+    out = np.zeros((len(texts), VECTOR_SIZE), dtype=np.float32)
+    for i, t in enumerate(texts):
+        for w in t.lower().split():
+            out[i, int(hashlib.md5(w.encode("utf-8")).hexdigest(), 16) % VECTOR_SIZE] += 1.0
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return out / norms
+
+
+@contextmanager
+def hash_embeddings() -> Iterator[None]:
+    """Reemplaza los embeddings de api.service por hash_embed mientras dura el bloque."""
+    from api import service as S
+
+    saved = {name: getattr(S, name) for name in ("embed_texts", "embed_documents", "embed_batch")}
+    S.embed_texts = hash_embed
+    S.embed_documents = hash_embed
+    S.embed_batch = lambda texts, mode="query": hash_embed(texts, mode).tolist()
+    try:
+        yield
+    finally:
+        for name, fn in saved.items():
+            setattr(S, name, fn)
+
+
+# -----------------------------------
+# Servidor HTTP local para la ingesta (feed RSS + páginas de artículos)
+# -----------------------------------
+def _article_html(doc: Dict) -> str:
+    paragraphs = "".join(f"<p>{escape(s.strip())}.</p>" for s in doc["content"].split(". ") if s.strip())
+    return (
+        f"<html><head><title>{escape(doc['title'])}</title></head><body>"
+        f"<article><h1>{escape(doc['title'])}</h1>{paragraphs}</article></body></html>"
+    )
+
+
+def _feed_xml(docs: List[Dict], base: str) -> str:
+    items = "".join(
+        f"<item><title>{escape(d['title'])}</title><link>{base}/a/{i}</link>"
+        f"<description>{escape(d['content'][:200])}</description>"
+        f"<pubDate>{dt.datetime.fromisoformat(d['published_at']).strftime('%a, %d %b %Y %H:%M:%S +0000')}</pubDate></item>"
+        for i, d in enumerate(docs)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>bench</title>{items}</channel></rss>'
+
+
+@contextmanager
+def fixture_server(docs: List[Dict]) -> Iterator[str]:
+    """Sirve /feed.xml y /a/<i> en localhost; devuelve la URL del feed."""
+    pages: Dict[str, bytes] = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802
+            body = pages.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml" if self.path == "/feed.xml" else "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    pages["/feed.xml"] = _feed_xml(docs, base).encode("utf-8")
+    for i, d in enumerate(docs):
+        pages[f"/a/{i}"] = _article_html(d).encode("utf-8")
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    try:
+        yield f"{base}/feed.xml"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# -----------------------------------
+# Escenarios
+# -----------------------------------
+def _bench_embed(corpus, queries, repeat, embedder) -> Dict[str, Dict]:
+    if embedder == "hash":
+        return {}  # sin modelo no hay nada que medir
+    from embedding.provider import embed_texts
+
+    texts = [d["title"] + "\n" + d["content"] for d in corpus]
+    out = {}
+    for bs in EMBED_BATCH_SIZES:
+        def embed(i: int, bs: int = bs) -> object:
+            return embed_texts([texts[(i * bs + j) % len(texts)] for j in range(bs)], mode="ingest")
+
+        samples = measure(embed, repeat)
+        out[f"embed_texts_bs{bs}"] = summarize(samples, docs=bs)
+    return out
+
+
+def _bench_index(corpus, queries, repeat, embedder) -> Dict[str, Dict]:
+    from api.service import index_many
+
+    bs = 64
+    batches = [corpus[i:i + bs] for i in range(0, len(corpus), bs)]
+    samples = measure(lambda i: index_many(batches[i]), len(batches), warmup=0)
+    return {f"index_many_bs{bs}": summarize(samples, docs=bs)}
+
+
+def _bench_search(corpus, queries, repeat, embedder) -> Dict[str, Dict]:
+    from api.service import search_query
+
+    out = {}
+    for k in SEARCH_KS:
+        def search(i: int, k: int = k) -> object:
+            return search_query(queries[i % len(queries)], k=k)
+
+        samples = measure(search, repeat)
+        out[f"search_k{k}"] = summarize(samples)
+    samples = measure(lambda i: search_query(queries[i % len(queries)], k=10, diversify=True), repeat)
+    out["search_k10_mmr"] = summarize(samples)
+    return out
+
+
+def _bench_builder(name: str):
+    def run(corpus, queries, repeat, embedder) -> Dict[str, Dict]:
+        from api import service as S
+
+        fn = getattr(S, f"build_{name}")
+        out = {}
+        for k in ANALYSIS_KS:
+            def build(i: int, k: int = k) -> object:
+                return fn(queries[i % len(queries)], k=k)
+
+            samples = measure(build, repeat)
+            out[f"{name}_k{k}"] = summarize(samples)
+        return out
+
+    return run
+
+
+def _bench_ingest(corpus, queries, repeat, embedder) -> Dict[str, Dict]:
+    from ingest import pipeline as P
+
+    n = min(50, len(corpus))
+    # Mismas etapas que default_pipeline, pero el fetch puede ir a 127.0.0.1
+    pipe = P.default_pipeline()
+    pipe.stages = [P.FetchStage(allow_private=True) if s.name == "fetch" else s for s in pipe.stages]
+    with fixture_server(corpus[:n]) as feed_url:
+        samples = measure(lambda i: P.ingest_feed(feed_url, limit=n, pipeline=pipe), max(1, repeat // 10), warmup=0)
+    return {f"ingest_feed_{n}": summarize(samples, docs=n)}
+
+
+_RUNNERS = {
+    "embed": _bench_embed,
+    "index": _bench_index,
+    "search": _bench_search,
+    "storyline": _bench_builder("storyline"),
+    "perspective": _bench_builder("perspective"),
+    "graph": _bench_builder("graph"),
+    "ingest": _bench_ingest,
+}
+
+
+def run_benchmarks(
+    scenarios=SCENARIOS,
+    docs: int = 1000,
+    repeat: int = 30,
+    embedder: str = "model",
+    seed: int = 42,
+) -> Dict:
+    """
+    Corre los escenarios pedidos sobre un corpus sintético de 'docs' artículos.
+    Los escenarios de búsqueda/análisis indexan el corpus antes (una vez).
+    """
+    import clients.qdrant_client as qc
+    from api.service import index_many
+
+    corpus = make_corpus(docs, seed=seed)
+    queries = make_queries(max(repeat, 10), seed=seed + 1)
+    results: Dict[str, Dict] = {}
+    indexed = False
+    with hash_embeddings() if embedder == "hash" else _noop():
+        qc.ensure_collection()
+        for name in SCENARIOS:
+            if name not in scenarios:
+                continue
+            if name in ("search", "storyline", "perspective", "graph") and not indexed:
+                for i in range(0, len(corpus), 256):
+                    index_many(corpus[i:i + 256])
+                indexed = True
+            t0 = time.perf_counter()
+            results.update(_RUNNERS[name](corpus, queries, repeat, embedder))
+            indexed = indexed or name == "index"
+            log.info("bench %s: %.1fs", name, time.perf_counter() - t0)
+    return {
+        "meta": {
+            "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "docs": docs,
+            "repeat": repeat,
+            "embedder": embedder,
+            "qdrant": (
+                "embedded" if qc.VECTOR_BACKEND == "embedded"
+                else qc.QDRANT_LOCATION or f"{qc.QDRANT_HOST}:{qc.QDRANT_PORT}"
+            ),
+        },
+        "scenarios": results,
+    }
+
+
+@contextmanager
+def _noop() -> Iterator[None]:
+    yield
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = 0.2) -> List[str]:
+    """Regresiones vs baseline: p95 más de 'tolerance' peor, o docs/s más de 'tolerance' menor."""
+    regressions = []
+    base = baseline.get("scenarios", {})
+    for name, cur in results.get("scenarios", {}).items():
+        ref = base.get(name)
+        if not ref:
+            continue
+        if ref.get("p95_ms") and cur["p95_ms"] > ref["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {ref['p95_ms']:.2f}ms -> {cur['p95_ms']:.2f}ms")
+        if ref.get("docs_per_sec") and cur.get("docs_per_sec", 0) < ref["docs_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: docs/s {ref['docs_per_sec']:.1f} -> {cur.get('docs_per_sec', 0):.1f}")
+    return regressions
+
+
+def _print_table(results: Dict, baseline: Optional[Dict]) -> None:
+    base = (baseline or {}).get("scenarios", {})
+    print(f"{'escenario':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'docs/s':>10}{'Δp95':>9}")
+    for name, r in results["scenarios"].items():
+        dps = f"{r['docs_per_sec']:.1f}" if "docs_per_sec" in r else "-"
+        ref = base.get(name, {}).get("p95_ms")
+        delta = f"{(r['p95_ms'] / ref - 1) * 100:+.0f}%" if ref else "-"
+        print(f"{name:<24}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{dps:>10}{delta:>9}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de búsqueda, análisis e ingesta.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Lista separada por comas")
+    parser.add_argument("--docs", type=int, default=1000, help="Tamaño del corpus sintético")
+    parser.add_argument("--repeat", type=int, default=30, help="Repeticiones por escenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--embedder", choices=("model", "hash"), default="model")
+    parser.add_argument("--qdrant", choices=("memory", "embedded", "server"), default="memory",
+                        help="memory = Qdrant embebido; embedded = índice NumPy; server = QDRANT_HOST/PORT")
+    parser.add_argument("--out", default=None, help="Escribe los resultados en este JSON")
+    parser.add_argument("--baseline", default=None, help="Compara contra este JSON")
+    parser.add_argument("--save-baseline", default=None, help="Guarda los resultados como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Regresión tolerada (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=os.getenv("APP_LOG_LEVEL", "INFO"))
+    # Debe fijarse antes de importar clients.qdrant_client (la config se lee una vez)
+    if args.qdrant == "memory":
+        os.environ["QDRANT_LOCATION"] = ":memory:"
+    elif args.qdrant == "embedded":
+        os.environ["VECTOR_BACKEND"] = "embedded"
+    os.environ.setdefault("QDRANT_COLLECTION", "bench_news")
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    results = run_benchmarks(scenarios, docs=args.docs, repeat=args.repeat, embedder=args.embedder, seed=args.seed)
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    _print_table(results, baseline)
+
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for r in regressions:
+            print(f"[bench] REGRESIÓN {r}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
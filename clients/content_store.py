@@ -0,0 +1,231 @@
+"""
+Almacenamiento del 'content' de los artículos fuera del payload en claro.
+
+CONTENT_STORE:
+- payload    (default, histórico): 'content' completo en el payload de Qdrant
+- compressed: 'content_z' (base64 del texto comprimido, CONTENT_CODEC) en el payload;
+              cada registro guarda su codec, así cambiar CONTENT_CODEC no rompe lo escrito
+- file:       store local append-only por id de punto (CONTENT_STORE_PATH), leído con mmap:
+                  content.bin   registros comprimidos concatenados
+                  index.tsv     "<id>\t<offset>\t<largo>\t<codec>\t<hash>" por línea (la última gana)
+
+CONTENT_CODEC: zlib (default, stdlib) | zstd (opt-in; requiere el paquete 'zstandard').
+
+Fuera del modo 'payload' el payload lleva además 'snippet' (primeros SNIPPET_CHARS) y
+'content_len'. Las búsquedas usan el snippet; sólo get_doc(s)_by_url y los builders de
+análisis descomprimen (unpack). unpack entiende cualquiera de los tres formatos, así que
+cambiar CONTENT_STORE no exige reindexar lo ya escrito.
+
+El store 'file' es local al nodo: la API y la ingesta deben compartir el volumen. Re-indexar
+un artículo con el mismo texto no agrega nada; si el texto cambió agrega un registro nuevo
+(el espacio viejo no se recupera).
+"""
+import base64
+import fcntl
+import hashlib
+import os
+import threading
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+CONTENT_STORE = os.getenv("CONTENT_STORE", "payload").strip().lower()
+# zlib (stdlib) por defecto; zstd es opt-in y requiere el paquete opcional 'zstandard'
+CONTENT_CODEC = os.getenv("CONTENT_CODEC", "zlib").strip().lower()
+CONTENT_ZSTD_LEVEL = int(os.getenv("CONTENT_ZSTD_LEVEL", "6"))
+CONTENT_STORE_PATH = os.getenv("CONTENT_STORE_PATH", "./content_store").strip()
+SNIPPET_CHARS = int(os.getenv("SNIPPET_CHARS", "240"))
+
+# Campos del payload con el contenido empaquetado (pedirlos junto con 'content')
+PACKED_FIELDS = ("content_z", "content_codec", "content_store")
+
+
+# -----------------------------------
+# Codecs
+# -----------------------------------
+def compress(text: str, codec: Optional[str] = None) -> bytes:
+    codec = codec or CONTENT_CODEC
+    data = text.encode("utf-8")
+    if codec == "zstd":
+        return _zstd_compressor(CONTENT_ZSTD_LEVEL).compress(data)
+    if codec == "zlib":
+        return zlib.compress(data, 6)
+    raise ValueError(f"Codec de contenido '{codec}' no soportado. Usa 'zstd' o 'zlib'.")
+
+
+def decompress(blob: bytes, codec: str) -> str:
+    if codec == "zstd":
+        import zstandard  # type: ignore[import-not-found]
+
+        return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+    if codec == "zlib":
+        return zlib.decompress(blob).decode("utf-8")
+    raise ValueError(f"Codec de contenido '{codec}' no soportado. Usa 'zstd' o 'zlib'.")
+
+
+@lru_cache(maxsize=4)
+def _zstd_compressor(level: int):
+    import zstandard  # dependencia opcional (pip install zstandard)
+
+    return zstandard.ZstdCompressor(level=level)
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# -----------------------------------
+# Store en archivo (append-only + mmap)
+# -----------------------------------
+class FileContentStore:
+    """id de punto -> texto comprimido en content.bin; índice en memoria desde index.tsv."""
+
+    def __init__(self, root: str, codec: Optional[str] = None):
+        self.root = root
+        self.codec = codec or CONTENT_CODEC
+        os.makedirs(root, exist_ok=True)
+        self._data_path = os.path.join(root, "content.bin")
+        self._index_path = os.path.join(root, "index.tsv")
+        for p in (self._data_path, self._index_path):
+            open(p, "ab").close()
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[int, int, str, str]] = {}
+        self._index_offset = 0
+        self._mmap: Optional[Any] = None
+        self._mmap_size = 0
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # Lee las líneas nuevas de index.tsv (de este u otros procesos)
+    def _refresh(self) -> None:
+        with open(self._index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            parts = line.decode("utf-8").split("\t")
+            # Líneas de 4 columnas: anteriores al hash de contenido
+            if len(parts) in (4, 5):
+                self._index[parts[0]] = (int(parts[1]), int(parts[2]), parts[3], parts[4] if len(parts) == 5 else "")
+        self._index_offset += end
+
+    def _view(self, end: int):
+        import mmap
+
+        if self._mmap is None or self._mmap_size < end:
+            size = os.path.getsize(self._data_path)
+            if size == 0:
+                return None
+            with open(self._data_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self._mmap_size = size
+        return self._mmap
+
+    def put_many(self, items: List[Tuple[str, str]]) -> None:
+        """
+        Agrega (id, texto) con un solo append; los datos se escriben antes que el índice.
+        Omite los ids cuyo registro vigente ya tiene el mismo texto (hash).
+        """
+        if not items:
+            return
+        hashed = {pid: (text, _content_hash(text)) for pid, text in items}
+        with self._lock, open(self._index_path, "ab") as fidx:
+            fcntl.flock(fidx, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                blobs = [
+                    (pid, compress(text, self.codec), digest)
+                    for pid, (text, digest) in hashed.items()
+                    if pid not in self._index or self._index[pid][3] != digest
+                ]
+                if not blobs:
+                    return
+                with open(self._data_path, "ab") as fd:
+                    offset = fd.tell()
+                    fd.write(b"".join(b for _, b, _ in blobs))
+                    fd.flush()
+                    os.fsync(fd.fileno())
+                lines = []
+                for pid, blob, digest in blobs:
+                    self._index[pid] = (offset, len(blob), self.codec, digest)
+                    lines.append(f"{pid}\t{offset}\t{len(blob)}\t{self.codec}\t{digest}\n")
+                    offset += len(blob)
+                fidx.write("".join(lines).encode("utf-8"))
+                fidx.flush()
+                self._index_offset = os.fstat(fidx.fileno()).st_size
+            finally:
+                fcntl.flock(fidx, fcntl.LOCK_UN)
+
+    def get(self, pid: str) -> Optional[str]:
+        with self._lock:
+            if pid not in self._index:
+                self._refresh()
+            entry = self._index.get(pid)
+            if entry is None:
+                return None
+            offset, length, codec, _ = entry
+            view = self._view(offset + length)
+            if view is None:
+                return None
+            blob = view[offset:offset + length]
+        return decompress(blob, codec)
+
+
+@lru_cache(maxsize=1)
+def file_store() -> FileContentStore:
+    return FileContentStore(CONTENT_STORE_PATH)
+
+
+# -----------------------------------
+# Empaquetado en el payload
+# -----------------------------------
+def is_packed(payload: Dict) -> bool:
+    """True si el contenido del payload está comprimido o en el store externo."""
+    return "content_z" in payload or payload.get("content_store") == "file"
+
+
+def pack_many(items: List[Tuple[str, Dict]], mode: Optional[str] = None) -> None:
+    """
+    Reemplaza in-place 'content' de cada (id, payload) según CONTENT_STORE.
+    En modo 'file' escribe todos los textos del lote con un solo append.
+    """
+    mode = mode or CONTENT_STORE
+    if mode == "payload":
+        return
+    if mode not in ("compressed", "file"):
+        raise ValueError(f"CONTENT_STORE '{mode}' no soportado. Usa 'payload', 'compressed' o 'file'.")
+    todo = [(pid, p) for pid, p in items if isinstance(p.get("content"), str)]
+    if mode == "file":
+        file_store().put_many([(pid, p["content"]) for pid, p in todo])
+    for _, p in todo:
+        content = p.pop("content")
+        p["snippet"] = content[:SNIPPET_CHARS]
+        p["content_len"] = len(content)
+        if mode == "file":
+            p["content_store"] = "file"
+        else:
+            p["content_z"] = base64.b64encode(compress(content)).decode("ascii")
+            p["content_codec"] = CONTENT_CODEC
+
+
+def unpack(pid: Any, payload: Dict) -> Optional[str]:
+    """Contenido completo del artículo (en claro, comprimido o en el store externo)."""
+    if "content" in payload:
+        return payload["content"]
+    if "content_z" in payload:
+        return decompress(base64.b64decode(payload["content_z"]), payload.get("content_codec") or "zstd")
+    if payload.get("content_store") == "file":
+        return file_store().get(str(pid))
+    return None
+
+
+def unpacked_payload(pid: Any, payload: Dict, with_content: bool = True) -> Dict:
+    """Payload público: sin los campos empaquetados y, si se pide, con 'content' en claro."""
+    if not is_packed(payload):
+        return payload
+    out = {k: v for k, v in payload.items() if k not in PACKED_FIELDS}
+    if with_content:
+        out["content"] = unpack(pid, payload)
+    return out
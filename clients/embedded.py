@@ -0,0 +1,725 @@
+"""
+Índice vectorial embebido (NumPy), sin servidor: VECTOR_BACKEND=embedded.
+
+Implementa el subconjunto de la API de QdrantClient que usa el proyecto (colecciones,
+aliases, upsert/delete/retrieve/scroll/count, query_points/query_batch_points con
+vectores, ids o RecommendQuery, query_points_groups), así
+todo clients.qdrant_client funciona igual contra este backend. Pensado para tests,
+edge y despliegues chicos (hasta ~10^5 puntos):
+
+- Búsqueda exacta por coseno: vectores float32 normalizados, producto matricial + argpartition
+- Payloads en memoria con filtros Filter de Qdrant (must/should/must_not, MatchValue,
+  MatchAny, MatchExcept, MatchText por tokens, Range, DatetimeRange, HasId, IsEmpty/IsNull)
+- Persistencia opcional (EMBEDDED_PATH): por colección vectors.f32 (leído con memmap)
+  + points.jsonl (log append-only de upserts/deletes) + meta.json; aliases.json global.
+  Varios procesos (uvicorn --workers, api.serve) pueden compartir el directorio: las
+  escrituras toman flock sobre points.jsonl y cada lectura aplica antes la cola del log
+
+Los knobs específicos de Qdrant (HNSW, cuantización, on_disk, índices de payload) se
+aceptan y se ignoran: el índice es plano y siempre exacto.
+"""
+import datetime as dt
+import fcntl
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client.http import models as qm
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _norm_id(pid: Any) -> Any:
+    """IDs como Qdrant: enteros tal cual, UUIDs en forma canónica."""
+    if isinstance(pid, int):
+        return pid
+    try:
+        return str(uuid.UUID(str(pid)))
+    except ValueError:
+        return str(pid)
+
+
+def _json_default(o: Any) -> Any:
+    if isinstance(o, (dt.datetime, dt.date)):
+        return o.isoformat()
+    if isinstance(o, np.generic):
+        return o.item()
+    return str(o)
+
+
+def _jsonable(payload: Optional[dict]) -> dict:
+    """Payload tal como lo devolvería Qdrant (fechas como ISO string, tipos JSON)."""
+    return json.loads(json.dumps(payload or {}, default=_json_default))
+
+
+def _tokens(text: Any) -> set:
+    return set(_TOKEN_RE.findall(str(text).lower()))
+
+
+def _as_dt(value: Any) -> Optional[dt.datetime]:
+    if isinstance(value, dt.datetime):
+        d = value
+    elif isinstance(value, str):
+        try:
+            d = dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    else:
+        return None
+    return d if d.tzinfo else d.replace(tzinfo=dt.timezone.utc)
+
+
+def _values(payload: dict, key: str) -> List[Any]:
+    """Valores de 'key' (soporta a.b); listas se aplanan como en Qdrant."""
+    cur: Any = payload
+    for part in key.split("."):
+        if not isinstance(cur, dict) or part not in cur:
+            return []
+        cur = cur[part]
+    if cur is None:
+        return []
+    return list(cur) if isinstance(cur, list) else [cur]
+
+
+def _in_range(v: Any, r: Any) -> bool:
+    if isinstance(r, qm.DatetimeRange):
+        v = _as_dt(v)
+        bounds = {k: _as_dt(getattr(r, k)) for k in ("gt", "gte", "lt", "lte")}
+    else:
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            return False
+        bounds = {k: getattr(r, k) for k in ("gt", "gte", "lt", "lte")}
+    if v is None:
+        return False
+    return (
+        (bounds["gt"] is None or v > bounds["gt"])
+        and (bounds["gte"] is None or v >= bounds["gte"])
+        and (bounds["lt"] is None or v < bounds["lt"])
+        and (bounds["lte"] is None or v <= bounds["lte"])
+    )
+
+
+def _match_field(cond: qm.FieldCondition, payload: dict) -> bool:
+    values = _values(payload, cond.key)
+    m = cond.match
+    if m is not None:
+        if isinstance(m, qm.MatchValue):
+            return m.value in values
+        if isinstance(m, qm.MatchAny):
+            return any(v in m.any for v in values)
+        if isinstance(m, qm.MatchExcept):
+            return bool(values) and not any(v in m.except_ for v in values)
+        if isinstance(m, qm.MatchText):
+            want = _tokens(m.text)
+            return any(want <= _tokens(v) for v in values)
+        raise ValueError(
+            f"Backend embebido: match '{type(m).__name__}' no soportado en '{cond.key}' "
+            "(usa MatchValue, MatchAny, MatchExcept o MatchText)"
+        )
+    if cond.range is not None:
+        return any(_in_range(v, cond.range) for v in values)
+    if cond.values_count is not None:
+        return _in_range(len(values), cond.values_count)
+    raise ValueError(
+        f"Backend embebido: condición sobre '{cond.key}' no soportada (usa match, range o values_count)"
+    )
+
+
+def _match_condition(cond: Any, pid: Any, payload: dict) -> bool:
+    if isinstance(cond, qm.Filter):
+        return matches(cond, pid, payload)
+    if isinstance(cond, qm.FieldCondition):
+        return _match_field(cond, payload)
+    if isinstance(cond, qm.HasIdCondition):
+        return pid in {_norm_id(x) for x in cond.has_id}
+    if isinstance(cond, qm.IsEmptyCondition):
+        return not _values(payload, cond.is_empty.key)
+    if isinstance(cond, qm.IsNullCondition):
+        return cond.is_null.key in payload and payload[cond.is_null.key] is None
+    raise ValueError(
+        f"Backend embebido: condición '{type(cond).__name__}' no soportada "
+        "(usa Filter, FieldCondition, HasIdCondition, IsEmptyCondition o IsNullCondition)"
+    )
+
+
+def _as_list(conds: Any) -> List[Any]:
+    if conds is None:
+        return []
+    return list(conds) if isinstance(conds, list) else [conds]
+
+
+def matches(flt: Optional[qm.Filter], pid: Any, payload: dict) -> bool:
+    """Evalúa un Filter de Qdrant sobre un punto."""
+    if flt is None:
+        return True
+    if not all(_match_condition(c, pid, payload) for c in _as_list(flt.must)):
+        return False
+    if any(_match_condition(c, pid, payload) for c in _as_list(flt.must_not)):
+        return False
+    should = _as_list(flt.should)
+    return not should or any(_match_condition(c, pid, payload) for c in should)
+
+
+# -----------------------------------
+# Colección
+# -----------------------------------
+class _Collection:
+    """Matriz (n, dim) normalizada + ids/payloads por fila; filas muertas tras update/delete."""
+
+    def __init__(self, name: str, dim: int, path: Optional[str] = None):
+        self.name = name
+        self.dim = int(dim)
+        self.path = path
+        self.rows: Dict[Any, int] = {}
+        self.ids: List[Any] = []
+        self.payloads: List[Optional[dict]] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.indexes: Dict[str, Any] = {}
+        self._mat = np.zeros((0, self.dim), dtype=np.float32)
+        self._mmap: Optional[np.memmap] = None
+        self._log_offset = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+            meta = os.path.join(path, "meta.json")
+            if not os.path.exists(meta):
+                tmp = f"{meta}.tmp.{os.getpid()}"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"name": name, "dim": self.dim}, f)
+                os.replace(tmp, meta)
+            for p in ("vectors.f32", "points.jsonl"):
+                open(os.path.join(path, p), "ab").close()
+            self.refresh()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    # --- persistencia ---
+    def _file(self, name: str) -> str:
+        if not self.path:
+            raise RuntimeError(f"La colección '{self.name}' no tiene persistencia (EMBEDDED_PATH)")
+        return os.path.join(self.path, name)
+
+    def refresh(self) -> None:
+        """Aplica las líneas nuevas de points.jsonl (de este u otros procesos)."""
+        if not self.path:
+            return
+        path = self._file("points.jsonl")
+        try:
+            if os.path.getsize(path) == self._log_offset:
+                return
+            with open(path, "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return  # colección borrada por otro proceso
+        end = data.rfind(b"\n") + 1  # una última línea a medias se lee en la próxima
+        for line in data[:end].splitlines():
+            rec = json.loads(line)
+            pid = rec["id"]
+            self._kill(pid)
+            if rec["op"] == "delete":
+                continue
+            row = int(rec["row"])
+            while len(self.ids) <= row:
+                self.ids.append(None)
+                self.payloads.append(None)
+            self.ids[row] = pid
+            self.payloads[row] = rec["payload"]
+            self.rows[pid] = row
+        self._log_offset += end
+        self.alive = np.zeros(len(self.ids), dtype=bool)
+        self.alive[list(self.rows.values())] = True
+
+    @contextmanager
+    def _writing(self) -> Iterator[Optional[Any]]:
+        """
+        Con persistencia: flock exclusivo sobre points.jsonl y el log al día, así varios
+        procesos con el mismo EMBEDDED_PATH no se reparten las mismas filas. Cede el
+        archivo del log abierto para agregar (None en memoria).
+        """
+        if not self.path:
+            yield None
+            return
+        with open(self._file("points.jsonl"), "ab") as log:
+            fcntl.flock(log, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                yield log
+                log.flush()
+                self._log_offset = os.fstat(log.fileno()).st_size
+            finally:
+                fcntl.flock(log, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _log(log: Any, records: Iterable[dict]) -> None:
+        log.write("".join(json.dumps(r, default=_json_default) + "\n" for r in records).encode("utf-8"))
+
+    def matrix(self) -> np.ndarray:
+        n = len(self.ids)
+        if not self.path:
+            return self._mat[:n]
+        if n == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        if self._mmap is None or self._mmap.shape[0] < n:
+            self._mmap = np.memmap(
+                os.path.join(self.path, "vectors.f32"), dtype=np.float32, mode="r", shape=(n, self.dim)
+            )
+        return self._mmap[:n]
+
+    # --- escritura ---
+    def _kill(self, pid: Any) -> None:
+        row = self.rows.pop(pid, None)
+        if row is not None:
+            self.payloads[row] = None
+            self.ids[row] = None
+            if row < len(self.alive):
+                self.alive[row] = False
+
+    def upsert(self, points: List[qm.PointStruct]) -> None:
+        if not points:
+            return
+        with self._writing() as log:
+            self._upsert(points, log)
+
+    def _upsert(self, points: List[qm.PointStruct], log: Optional[Any]) -> None:
+        vecs = np.asarray([p.vector for p in points], dtype=np.float32).reshape(len(points), self.dim)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vecs = vecs / norms
+        start = len(self.ids)
+        if self.path:
+            # Filas escritas sin entrada en el log (crash entre ambas) quedan huérfanas
+            vpath, row_bytes = self._file("vectors.f32"), self.dim * 4
+            size = os.path.getsize(vpath)
+            start = max(start, size // row_bytes)
+            if size % row_bytes:
+                os.truncate(vpath, start * row_bytes)  # fila a medias de un crash
+            self.ids.extend([None] * (start - len(self.ids)))
+            self.payloads.extend([None] * (start - len(self.payloads)))
+            self.alive = np.concatenate([self.alive, np.zeros(start - len(self.alive), dtype=bool)])
+        records = []
+        for i, p in enumerate(points):
+            pid = _norm_id(p.id)
+            self._kill(pid)
+            payload = _jsonable(p.payload)
+            self.ids.append(pid)
+            self.payloads.append(payload)
+            self.rows[pid] = start + i
+            records.append({"op": "upsert", "id": pid, "row": start + i, "payload": payload})
+        # Un id repetido dentro del lote deja viva sólo su última fila
+        fresh = np.asarray([self.ids[start + i] is not None for i in range(len(points))], dtype=bool)
+        self.alive = np.concatenate([self.alive, fresh])
+        if log is not None:
+            # Vectores antes que el log: un crash nunca deja filas sin vector
+            with open(self._file("vectors.f32"), "ab") as f:
+                f.write(np.ascontiguousarray(vecs).tobytes())
+            self._log(log, records)
+        else:
+            if len(self.ids) > self._mat.shape[0]:
+                grown = np.zeros((max(len(self.ids), 2 * self._mat.shape[0], 64), self.dim), dtype=np.float32)
+                grown[:start] = self._mat[:start]
+                self._mat = grown
+            self._mat[start:len(self.ids)] = vecs
+
+    def delete(self, pids: List[Any]) -> None:
+        with self._writing() as log:
+            pids = [p for p in pids if p in self.rows]
+            for pid in pids:
+                self._kill(pid)
+            if log is not None and pids:
+                self._log(log, ({"op": "delete", "id": pid} for pid in pids))
+
+    # --- lectura ---
+    def select(self, flt: Optional[qm.Filter]) -> np.ndarray:
+        """Filas vivas que cumplen el filtro."""
+        rows = np.flatnonzero(self.alive)
+        if flt is None:
+            return rows
+        return np.asarray(
+            [r for r in rows if matches(flt, self.ids[r], self.payloads[r] or {})], dtype=np.int64
+        )
+
+    def record(self, row: int, with_payload: Any, with_vectors: bool, score: Optional[float] = None):
+        payload = self.payloads[row] if with_payload else None
+        if payload is not None and isinstance(with_payload, list):
+            payload = {k: v for k, v in payload.items() if k in with_payload}
+        elif payload is not None:
+            payload = dict(payload)
+        vector = self.matrix()[row].tolist() if with_vectors else None
+        if score is None:
+            return qm.Record(id=self.ids[row], payload=payload, vector=vector)
+        return qm.ScoredPoint(id=self.ids[row], version=0, score=score, payload=payload, vector=vector)
+
+    def vector(self, example: Any) -> np.ndarray:
+        """Vector normalizado de un ejemplo: id de punto guardado o vector crudo."""
+        if isinstance(example, (list, tuple, np.ndarray)):
+            v = np.asarray(example, dtype=np.float32).reshape(-1)
+            return v / (np.linalg.norm(v) or 1.0)
+        row = self.rows.get(_norm_id(example))
+        if row is None:
+            raise ValueError(f"No point with id {example} found")
+        return np.asarray(self.matrix()[row], dtype=np.float32)
+
+    def recommend_scorer(self, rec: qm.RecommendInput) -> Tuple[Any, List[Any]]:
+        """(vector de consulta o función de score, ids a excluir) para RecommendQuery."""
+        pos = np.asarray([self.vector(x) for x in rec.positive or []], dtype=np.float32).reshape(-1, self.dim)
+        neg = np.asarray([self.vector(x) for x in rec.negative or []], dtype=np.float32).reshape(-1, self.dim)
+        exclude = [_norm_id(x) for x in list(rec.positive or []) + list(rec.negative or [])
+                   if not isinstance(x, (list, tuple, np.ndarray))]
+        strategy = rec.strategy or qm.RecommendStrategy.AVERAGE_VECTOR
+        if strategy == qm.RecommendStrategy.AVERAGE_VECTOR:
+            avg = pos.mean(axis=0) if len(pos) else np.zeros(self.dim, dtype=np.float32)
+            # Igual que Qdrant: avg_pos + (avg_pos - avg_neg)
+            return (2 * avg - neg.mean(axis=0) if len(neg) else avg), exclude
+        if strategy == qm.RecommendStrategy.BEST_SCORE:
+            def best_score(m: np.ndarray) -> np.ndarray:
+                sp = (m @ pos.T).max(axis=1) if len(pos) else np.full(len(m), -np.inf, dtype=np.float32)
+                if not len(neg):
+                    return sp
+                sn = (m @ neg.T).max(axis=1)
+                return np.where(sp > sn, sp, -(sn * sn))
+            return best_score, exclude
+
+        def sum_scores(m: np.ndarray) -> np.ndarray:
+            return (m @ pos.T).sum(axis=1) - ((m @ neg.T).sum(axis=1) if len(neg) else 0.0)
+        return sum_scores, exclude
+
+    def search(
+        self,
+        query: Any,
+        limit: int,
+        flt: Optional[qm.Filter] = None,
+        score_threshold: Optional[float] = None,
+        offset: int = 0,
+        with_payload: Any = True,
+        with_vectors: bool = False,
+        exclude: Optional[List[Any]] = None,
+    ) -> List[qm.ScoredPoint]:
+        rows = self.select(flt)
+        if exclude:
+            skip = {self.rows[pid] for pid in exclude if pid in self.rows}
+            rows = np.asarray([r for r in rows if int(r) not in skip], dtype=np.int64)
+        if rows.size == 0 or limit <= 0:
+            return []
+        if callable(query):
+            scores = query(self.matrix()[rows])
+        else:
+            q = np.asarray(query, dtype=np.float32).reshape(-1)
+            q = q / (np.linalg.norm(q) or 1.0)
+            scores = self.matrix()[rows] @ q
+        if score_threshold is not None:
+            keep = scores >= score_threshold
+            rows, scores = rows[keep], scores[keep]
+        want = min(len(rows), offset + limit)
+        if want <= 0:
+            return []
+        top = np.argpartition(-scores, want - 1)[:want] if want < len(rows) else np.arange(len(rows))
+        top = top[np.argsort(-scores[top], kind="stable")][offset:]
+        return [self.record(int(rows[i]), with_payload, with_vectors, float(scores[i])) for i in top]
+
+
+# -----------------------------------
+# Cliente (subconjunto de QdrantClient)
+# -----------------------------------
+class EmbeddedClient:
+    """Duck-typing de QdrantClient sobre colecciones _Collection (thread-safe)."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or None
+        self._lock = threading.RLock()
+        self._collections: Dict[str, _Collection] = {}
+        self._aliases: Dict[str, str] = {}
+        self._aliases_stamp: Optional[Tuple[int, int]] = None
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            self._scan()
+
+    # Con persistencia otros procesos pueden crear/borrar colecciones y mover aliases
+    def _scan(self) -> None:
+        """Relee del disco el catálogo de colecciones y los aliases."""
+        if not self.path:
+            return
+        for name in sorted(os.listdir(self.path)):
+            meta = os.path.join(self.path, name, "meta.json")
+            if name not in self._collections and os.path.isfile(meta):
+                with open(meta, encoding="utf-8") as f:
+                    dim = json.load(f)["dim"]
+                self._collections[name] = _Collection(name, dim, os.path.join(self.path, name))
+        for name, col in list(self._collections.items()):
+            if col.path and not os.path.isdir(col.path):
+                del self._collections[name]
+        self._aliases_stamp = None
+        self._sync_aliases()
+
+    def _sync_aliases(self) -> None:
+        if not self.path:
+            return
+        path = os.path.join(self.path, "aliases.json")
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp != self._aliases_stamp:
+            with open(path, encoding="utf-8") as f:
+                self._aliases = json.load(f)
+            self._aliases_stamp = stamp
+
+    def _col(self, name: str) -> _Collection:
+        self._sync_aliases()
+        col = self._collections.get(self._aliases.get(name, name))
+        if col is None and self.path:
+            self._scan()
+            col = self._collections.get(self._aliases.get(name, name))
+        if col is None:
+            raise ValueError(f"Collection {name} not found")
+        col.refresh()
+        return col
+
+    def _save_aliases(self) -> None:
+        if self.path:
+            path = os.path.join(self.path, "aliases.json")
+            tmp = f"{path}.tmp.{os.getpid()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._aliases, f)
+            os.replace(tmp, path)
+            st = os.stat(path)
+            self._aliases_stamp = (st.st_mtime_ns, st.st_size)
+
+    # --- colecciones y aliases ---
+    def get_collections(self) -> qm.CollectionsResponse:
+        with self._lock:
+            self._scan()
+            return qm.CollectionsResponse(
+                collections=[qm.CollectionDescription(name=n) for n in self._collections]
+            )
+
+    def collection_exists(self, collection_name: str) -> bool:
+        with self._lock:
+            self._scan()
+            return self._aliases.get(collection_name, collection_name) in self._collections
+
+    def create_collection(self, collection_name: str, vectors_config: qm.VectorParams, **kwargs) -> bool:
+        with self._lock:
+            self._scan()
+            if collection_name in self._collections or collection_name in self._aliases:
+                raise ValueError(f"Collection {collection_name} already exists")
+            path = os.path.join(self.path, collection_name) if self.path else None
+            self._collections[collection_name] = _Collection(collection_name, vectors_config.size, path)
+            return True
+
+    def delete_collection(self, collection_name: str, **kwargs) -> bool:
+        with self._lock:
+            self._scan()
+            col = self._collections.pop(collection_name, None)
+            if col is None:
+                return False
+            self._aliases = {a: c for a, c in self._aliases.items() if c != collection_name}
+            self._save_aliases()
+            if col.path:
+                shutil.rmtree(col.path, ignore_errors=True)
+            return True
+
+    def get_collection(self, collection_name: str):
+        with self._lock:
+            col = self._col(collection_name)
+            return SimpleNamespace(
+                status="green",
+                points_count=len(col),
+                indexed_vectors_count=len(col),
+                payload_schema=dict(col.indexes),
+                dim=col.dim,
+            )
+
+    def update_collection(self, collection_name: str, **kwargs) -> bool:
+        # HNSW/cuantización/on_disk no aplican a un índice plano
+        self._col(collection_name)
+        return True
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema=None, **kwargs):
+        with self._lock:
+            self._col(collection_name).indexes[field_name] = field_schema
+        return qm.UpdateResult(operation_id=0, status=qm.UpdateStatus.COMPLETED)
+
+    def get_aliases(self) -> qm.CollectionsAliasesResponse:
+        with self._lock:
+            self._sync_aliases()
+            return qm.CollectionsAliasesResponse(
+                aliases=[qm.AliasDescription(alias_name=a, collection_name=c) for a, c in self._aliases.items()]
+            )
+
+    def update_collection_aliases(self, change_aliases_operations: List[Any], **kwargs) -> bool:
+        with self._lock:
+            self._scan()
+            aliases = dict(self._aliases)
+            for op in change_aliases_operations:
+                if isinstance(op, qm.CreateAliasOperation):
+                    if op.create_alias.collection_name not in self._collections:
+                        raise ValueError(f"Collection {op.create_alias.collection_name} not found")
+                    if op.create_alias.alias_name in self._collections:
+                        raise ValueError(f"Alias {op.create_alias.alias_name} coincide con una colección")
+                    aliases[op.create_alias.alias_name] = op.create_alias.collection_name
+                elif isinstance(op, qm.DeleteAliasOperation):
+                    aliases.pop(op.delete_alias.alias_name, None)
+                elif isinstance(op, qm.RenameAliasOperation):
+                    aliases[op.rename_alias.new_alias_name] = aliases.pop(op.rename_alias.old_alias_name)
+            self._aliases = aliases
+            self._save_aliases()
+            return True
+
+    def create_snapshot(self, collection_name: str, **kwargs) -> Optional[qm.SnapshotDescription]:
+        """Copia los archivos de la colección a <EMBEDDED_PATH>/snapshots/ (None en memoria)."""
+        with self._lock:
+            col = self._col(collection_name)
+            if not col.path:
+                return None
+            name = f"{col.name}-{dt.datetime.now(dt.timezone.utc).strftime('%Y%m%dT%H%M%S')}"
+            dest = os.path.join(os.path.dirname(col.path), "snapshots", name)
+            shutil.copytree(col.path, dest)
+            size = sum(os.path.getsize(os.path.join(dest, f)) for f in os.listdir(dest))
+            return qm.SnapshotDescription(name=name, creation_time=None, size=size)
+
+    # --- puntos ---
+    def upsert(self, collection_name: str, points: List[qm.PointStruct], **kwargs) -> qm.UpdateResult:
+        with self._lock:
+            self._col(collection_name).upsert(list(points))
+        return qm.UpdateResult(operation_id=0, status=qm.UpdateStatus.COMPLETED)
+
+    def delete(self, collection_name: str, points_selector: Any, **kwargs) -> qm.UpdateResult:
+        with self._lock:
+            col = self._col(collection_name)
+            if isinstance(points_selector, qm.FilterSelector):
+                pids = [col.ids[r] for r in col.select(points_selector.filter)]
+            elif isinstance(points_selector, qm.Filter):
+                pids = [col.ids[r] for r in col.select(points_selector)]
+            elif isinstance(points_selector, qm.PointIdsList):
+                pids = [_norm_id(p) for p in points_selector.points]
+            else:
+                pids = [_norm_id(p) for p in points_selector]
+            col.delete(pids)
+        return qm.UpdateResult(operation_id=0, status=qm.UpdateStatus.COMPLETED)
+
+    def retrieve(
+        self, collection_name: str, ids: List[Any], with_payload: Any = True, with_vectors: bool = False, **kwargs
+    ) -> List[qm.Record]:
+        with self._lock:
+            col = self._col(collection_name)
+            out = []
+            for pid in ids:
+                row = col.rows.get(_norm_id(pid))
+                if row is not None:
+                    out.append(col.record(row, with_payload, with_vectors))
+            return out
+
+    def scroll(
+        self,
+        collection_name: str,
+        scroll_filter: Optional[qm.Filter] = None,
+        limit: int = 10,
+        offset: Any = None,
+        with_payload: Any = True,
+        with_vectors: bool = False,
+        **kwargs,
+    ) -> Tuple[List[qm.Record], Any]:
+        """Recorre en orden de inserción; 'offset' es el id del primer punto de la página."""
+        with self._lock:
+            col = self._col(collection_name)
+            rows = col.select(scroll_filter)
+            if offset is not None:
+                start = col.rows.get(_norm_id(offset))
+                rows = rows[rows >= start] if start is not None else rows[:0]
+            page = rows[:limit]
+            nxt = col.ids[int(rows[limit])] if len(rows) > limit else None
+            return [col.record(int(r), with_payload, with_vectors) for r in page], nxt
+
+    def count(self, collection_name: str, count_filter: Optional[qm.Filter] = None, **kwargs) -> qm.CountResult:
+        with self._lock:
+            return qm.CountResult(count=int(self._col(collection_name).select(count_filter).size))
+
+    def query_points(
+        self,
+        collection_name: str,
+        query: Any = None,
+        query_filter: Optional[qm.Filter] = None,
+        limit: int = 10,
+        offset: Optional[int] = None,
+        with_payload: Any = True,
+        with_vectors: bool = False,
+        score_threshold: Optional[float] = None,
+        search_params: Optional[qm.SearchParams] = None,
+        **kwargs,
+    ) -> qm.QueryResponse:
+        if isinstance(query, qm.NearestQuery):
+            query = query.nearest
+        with self._lock:
+            col = self._col(collection_name)
+            exclude: List[Any] = []
+            if isinstance(query, qm.RecommendQuery):
+                query, exclude = col.recommend_scorer(query.recommend)
+            elif isinstance(query, (str, int)):
+                query = col.vector(query)
+            points = col.search(
+                query, limit, query_filter, score_threshold, offset or 0, with_payload, with_vectors, exclude
+            )
+        return qm.QueryResponse(points=points)
+
+    def query_points_groups(
+        self,
+        collection_name: str,
+        group_by: str,
+        query: Any = None,
+        query_filter: Optional[qm.Filter] = None,
+        limit: int = 10,
+        group_size: int = 3,
+        with_payload: Any = True,
+        with_vectors: bool = False,
+        score_threshold: Optional[float] = None,
+        search_params: Optional[qm.SearchParams] = None,
+        **kwargs,
+    ) -> qm.GroupsResult:
+        """Hasta 'limit' grupos por valor de payload[group_by], 'group_size' hits cada uno."""
+        if isinstance(query, qm.NearestQuery):
+            query = query.nearest
+        groups: Dict[Any, List[qm.ScoredPoint]] = {}
+        with self._lock:
+            col = self._col(collection_name)
+            # Recorre el ranking completo hasta llenar los grupos (búsqueda exacta)
+            for h in col.search(query, len(col.ids), query_filter, score_threshold, 0, True, False):
+                value = (h.payload or {}).get(group_by)
+                for v in value if isinstance(value, list) else [value]:
+                    if not isinstance(v, (str, int)) or isinstance(v, bool):
+                        continue
+                    if v not in groups:
+                        if len(groups) >= limit:
+                            continue
+                        groups[v] = []
+                    if len(groups[v]) < group_size:
+                        groups[v].append(col.record(col.rows[_norm_id(h.id)], with_payload, with_vectors, h.score))
+                if len(groups) >= limit and all(len(g) >= group_size for g in groups.values()):
+                    break
+        return qm.GroupsResult(groups=[qm.PointGroup(id=k, hits=v) for k, v in groups.items()])
+
+    def query_batch_points(self, collection_name: str, requests: List[qm.QueryRequest], **kwargs):
+        return [
+            self.query_points(
+                collection_name,
+                query=r.query,
+                query_filter=r.filter,
+                limit=r.limit or 10,
+                offset=r.offset,
+                with_payload=r.with_payload if r.with_payload is not None else False,
+                with_vectors=bool(r.with_vector),
+                score_threshold=r.score_threshold,
+            )
+            for r in requests
+        ]
+
+    def close(self) -> None:
+        pass
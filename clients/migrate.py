@@ -0,0 +1,42 @@
+# clients/migrate.py
+"""
+Aplica el perfil de colección (HNSW / cuantización / on_disk) a una colección existente.
+
+Uso:
+    python -m clients.migrate                     # perfil de QDRANT_PROFILE + overrides env
+    python -m clients.migrate --profile compact   # fuerza un preset
+    python -m clients.migrate --dry-run           # sólo muestra lo que se aplicaría
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+import clients.qdrant_client as qc
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Migra la colección Qdrant al perfil configurado.")
+    parser.add_argument("--collection", default=qc.COLLECTION, help="Colección (o alias) destino")
+    parser.add_argument(
+        "--profile",
+        default=None,
+        choices=sorted(qc.COLLECTION_PROFILES),
+        help="Preset de perfil (por defecto QDRANT_PROFILE)",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="No aplica cambios")
+    args = parser.parse_args(argv)
+
+    profile = qc.collection_profile(args.profile)
+    print(json.dumps({"collection": args.collection, "profile": profile}, indent=2))
+    if args.dry_run:
+        return 0
+
+    qc.apply_collection_profile(args.collection, profile)
+    info = qc.get_client().get_collection(args.collection)
+    print(f"[migrate] perfil '{profile['name']}' aplicado; status={info.status}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
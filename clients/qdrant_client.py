@@ -1,6 +1,12 @@
 # clients/qdrant_client.py
+import datetime as dt
 import os
-from typing import List, Optional
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 from uuid import uuid4
 
 from qdrant_client import QdrantClient
@@ -13,10 +19,186 @@ from qdrant_client.http.models import TextIndexParams, PayloadSchemaType
 QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
 QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
 COLLECTION = os.getenv("QDRANT_COLLECTION", "news")
+# Modo embebido (sin servidor): ":memory:" o ruta en disco. Útil para benchmarks/local.
+QDRANT_LOCATION = os.getenv("QDRANT_LOCATION", "").strip()
+# Backend vectorial: "qdrant" (servidor o QDRANT_LOCATION) | "embedded" (índice NumPy en proceso,
+# ver clients/embedded.py); EMBEDDED_PATH persiste el índice embebido (vacío = sólo memoria)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").strip().lower()
+EMBEDDED_PATH = os.getenv("EMBEDDED_PATH", "").strip()
 
 # Debe coincidir con el modelo por defecto en embedding/provider.py
 # (paraphrase-multilingual-MiniLM-L12-v2 => 384 dims)
-VECTOR_SIZE = 384
+VECTOR_SIZE = int(os.getenv("VECTOR_SIZE", "384"))
+
+
+def _env_bool(name: str, default: Optional[bool] = None) -> Optional[bool]:
+    """Lee un booleano de entorno ("1/true/yes/on"); None/default si no está definido."""
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    """Lee un entero de entorno; default si no está definido o es vacío."""
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    return int(raw)
+
+
+def _env_float(name: str, default: Optional[float] = None) -> Optional[float]:
+    """Lee un float de entorno; default si no está definido o es vacío."""
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    return float(raw)
+
+
+# -----------------------------------------------------------------------------
+# Particiones por tiempo
+# -----------------------------------------------------------------------------
+# PARTITION_BY=month: cada artículo va a la colección de su mes de 'published_at'
+# ("news_m202501"); el alias COLLECTION apunta al mes en curso. Las lecturas abren en
+# paralelo sólo las colecciones-mes que solapan date_from/date_to y mezclan por score;
+# la retención borra meses completos (delete_collection, sin borrados por filtro).
+# Vacío = una sola colección COLLECTION (comportamiento histórico).
+PARTITION_BY = os.getenv("PARTITION_BY", "").strip().lower()
+PARTITION_RETENTION_MONTHS = _env_int("PARTITION_RETENTION_MONTHS", 0)  # 0 = sin retención
+PARTITION_CACHE_SECONDS = float(os.getenv("PARTITION_CACHE_SECONDS", "30"))
+PARTITION_FANOUT_WORKERS = int(os.getenv("PARTITION_FANOUT_WORKERS", "8"))
+
+
+# -----------------------------------------------------------------------------
+# Perfiles de colección (HNSW / cuantización / almacenamiento en disco)
+# -----------------------------------------------------------------------------
+# - default: comportamiento histórico (float32 en RAM, HNSW por defecto del servidor)
+# - compact: int8 en RAM + vectores originales y payload en disco (rescoring)
+# - disk:    como compact, pero también el grafo HNSW en disco (máximo ahorro de RAM)
+COLLECTION_PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "hnsw_m": None,
+        "hnsw_ef_construct": None,
+        "hnsw_on_disk": None,
+        "search_ef": None,
+        "quantization": "none",
+        "quantization_always_ram": None,
+        "quantization_rescore": None,
+        "quantization_oversampling": None,
+        "on_disk_vectors": None,
+        "on_disk_payload": None,
+        "indexing_threshold": 20000,
+    },
+    "compact": {
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 100,
+        "hnsw_on_disk": False,
+        "search_ef": 128,
+        "quantization": "int8",
+        "quantization_always_ram": True,
+        "quantization_rescore": True,
+        "quantization_oversampling": 2.0,
+        "on_disk_vectors": True,
+        "on_disk_payload": True,
+        "indexing_threshold": 20000,
+    },
+    "disk": {
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 100,
+        "hnsw_on_disk": True,
+        "search_ef": 128,
+        "quantization": "int8",
+        "quantization_always_ram": True,
+        "quantization_rescore": True,
+        "quantization_oversampling": 3.0,
+        "on_disk_vectors": True,
+        "on_disk_payload": True,
+        "indexing_threshold": 20000,
+    },
+}
+
+QDRANT_PROFILE = os.getenv("QDRANT_PROFILE", "default").strip().lower()
+
+
+def collection_profile(name: Optional[str] = None) -> dict:
+    """
+    Resuelve el perfil de colección: preset (QDRANT_PROFILE) + overrides por env.
+    Variables: QDRANT_HNSW_M, QDRANT_HNSW_EF_CONSTRUCT, QDRANT_HNSW_ON_DISK,
+    QDRANT_SEARCH_EF, QDRANT_QUANTIZATION (none|int8|binary),
+    QDRANT_QUANTIZATION_ALWAYS_RAM, QDRANT_QUANTIZATION_RESCORE,
+    QDRANT_QUANTIZATION_OVERSAMPLING, QDRANT_ON_DISK_VECTORS,
+    QDRANT_ON_DISK_PAYLOAD, QDRANT_INDEXING_THRESHOLD.
+    """
+    key = (name or QDRANT_PROFILE).strip().lower()
+    if key not in COLLECTION_PROFILES:
+        raise ValueError(
+            f"Perfil de colección '{key}' no soportado. Usa uno de: {', '.join(COLLECTION_PROFILES)}."
+        )
+    p = dict(COLLECTION_PROFILES[key])
+    p["name"] = key
+    p["hnsw_m"] = _env_int("QDRANT_HNSW_M", p["hnsw_m"])
+    p["hnsw_ef_construct"] = _env_int("QDRANT_HNSW_EF_CONSTRUCT", p["hnsw_ef_construct"])
+    p["hnsw_on_disk"] = _env_bool("QDRANT_HNSW_ON_DISK", p["hnsw_on_disk"])
+    p["search_ef"] = _env_int("QDRANT_SEARCH_EF", p["search_ef"])
+    p["quantization"] = (os.getenv("QDRANT_QUANTIZATION") or p["quantization"]).strip().lower()
+    p["quantization_always_ram"] = _env_bool(
+        "QDRANT_QUANTIZATION_ALWAYS_RAM", p["quantization_always_ram"]
+    )
+    p["quantization_rescore"] = _env_bool("QDRANT_QUANTIZATION_RESCORE", p["quantization_rescore"])
+    p["quantization_oversampling"] = _env_float(
+        "QDRANT_QUANTIZATION_OVERSAMPLING", p["quantization_oversampling"]
+    )
+    p["on_disk_vectors"] = _env_bool("QDRANT_ON_DISK_VECTORS", p["on_disk_vectors"])
+    p["on_disk_payload"] = _env_bool("QDRANT_ON_DISK_PAYLOAD", p["on_disk_payload"])
+    p["indexing_threshold"] = _env_int("QDRANT_INDEXING_THRESHOLD", p["indexing_threshold"])
+    if p["quantization"] not in ("none", "int8", "binary"):
+        raise ValueError(
+            f"QDRANT_QUANTIZATION='{p['quantization']}' no soportado. Usa none, int8 o binary."
+        )
+    return p
+
+
+def hnsw_config(profile: Optional[dict] = None) -> Optional[qm.HnswConfigDiff]:
+    """HnswConfigDiff del perfil (None si todo queda al default del servidor)."""
+    p = profile or collection_profile()
+    if p["hnsw_m"] is None and p["hnsw_ef_construct"] is None and p["hnsw_on_disk"] is None:
+        return None
+    return qm.HnswConfigDiff(m=p["hnsw_m"], ef_construct=p["hnsw_ef_construct"], on_disk=p["hnsw_on_disk"])
+
+
+def quantization_config(profile: Optional[dict] = None):
+    """Config de cuantización del perfil: ScalarQuantization (int8), BinaryQuantization o None."""
+    p = profile or collection_profile()
+    if p["quantization"] == "int8":
+        return qm.ScalarQuantization(
+            scalar=qm.ScalarQuantizationConfig(
+                type=qm.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=p["quantization_always_ram"],
+            )
+        )
+    if p["quantization"] == "binary":
+        return qm.BinaryQuantization(
+            binary=qm.BinaryQuantizationConfig(always_ram=p["quantization_always_ram"])
+        )
+    return None
+
+
+def default_search_params(profile: Optional[dict] = None) -> Optional[qm.SearchParams]:
+    """
+    SearchParams por defecto del perfil: ef de búsqueda y rescoring/oversampling
+    sobre los vectores originales cuando hay cuantización.
+    """
+    p = profile or collection_profile()
+    quant = None
+    if p["quantization"] != "none":
+        quant = qm.QuantizationSearchParams(
+            rescore=p["quantization_rescore"],
+            oversampling=p["quantization_oversampling"],
+        )
+    if p["search_ef"] is None and quant is None:
+        return None
+    return qm.SearchParams(hnsw_ef=p["search_ef"], quantization=quant)
 
 
 def get_client() -> QdrantClient:
@@ -24,7 +206,13 @@ def get_client() -> QdrantClient:
     Crea el cliente Qdrant.
     - https=False para localhost/cluster interno (cámbialo si usas TLS).
     - prefer_grpc=False: HTTP por simplicidad; activa gRPC si lo necesitas.
+    - Con QDRANT_LOCATION usa Qdrant embebido (una sola instancia por proceso).
+    - Con VECTOR_BACKEND=embedded usa el índice NumPy en proceso (misma API).
     """
+    if VECTOR_BACKEND == "embedded":
+        return _embedded_client(EMBEDDED_PATH)
+    if QDRANT_LOCATION:
+        return _local_client(QDRANT_LOCATION)
     return QdrantClient(
         host=QDRANT_HOST,
         port=QDRANT_PORT,
@@ -34,16 +222,34 @@ def get_client() -> QdrantClient:
     )
 
 
-def _ensure_payload_indices(c: QdrantClient) -> None:
+@lru_cache(maxsize=1)
+def _local_client(location: str) -> QdrantClient:
+    if location == ":memory:":
+        return QdrantClient(location=location)
+    return QdrantClient(path=location)
+
+
+@lru_cache(maxsize=1)
+def _embedded_client(path: str):
+    from clients.embedded import EmbeddedClient
+
+    return EmbeddedClient(path or None)
+
+
+def _ensure_payload_indices(c: QdrantClient, collection: str) -> None:
     """
     Crea índices de payload (idempotente):
     - Full-text sobre 'title'
     - Keyword sobre 'source'
+    - Keyword 'url' (lookup de documentos legacy)
+    - Keyword 'canonical_id' (casi-duplicados)
+    - Keyword 'parent_id' + entero 'chunk_index' (pasajes de artículos largos)
+    - Float 'indexed_at' (puesta al día de ingest.reindex)
     """
     # Índice full-text en 'title'
     try:
         c.create_payload_index(
-            collection_name=COLLECTION,
+            collection_name=collection,
             field_name="title",
             field_schema=TextIndexParams(
                 tokenizer="latin",   # usa "multilingual" si mezclas es/en/pt a fondo
@@ -59,13 +265,58 @@ def _ensure_payload_indices(c: QdrantClient) -> None:
     # Índice keyword en 'source' (útil para filtros exactos por fuente)
     try:
         c.create_payload_index(
-            collection_name=COLLECTION,
+            collection_name=collection,
             field_name="source",
             field_schema=PayloadSchemaType.KEYWORD,
         )
     except Exception:
         pass
 
+    # Índice keyword en 'url' (fallback de /doc para puntos sin ID derivado de la URL)
+    try:
+        c.create_payload_index(
+            collection_name=collection,
+            field_name="url",
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
+    except Exception:
+        pass
+
+    # Índice keyword en 'canonical_id' (agrupación de casi-duplicados)
+    try:
+        c.create_payload_index(
+            collection_name=collection,
+            field_name="canonical_id",
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
+    except Exception:
+        pass
+
+    # Índices para pasajes (chunking): artículo padre y posición del pasaje
+    try:
+        c.create_payload_index(
+            collection_name=collection,
+            field_name="parent_id",
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
+        c.create_payload_index(
+            collection_name=collection,
+            field_name="chunk_index",
+            field_schema=PayloadSchemaType.INTEGER,
+        )
+    except Exception:
+        pass
+
+    # Momento de escritura (epoch): lo escrito durante un reindex se copia antes del cambio
+    try:
+        c.create_payload_index(
+            collection_name=collection,
+            field_name="indexed_at",
+            field_schema=PayloadSchemaType.FLOAT,
+        )
+    except Exception:
+        pass
+
 
 def ensure_collection() -> None:
     """
@@ -73,21 +324,251 @@ def ensure_collection() -> None:
     Es idempotente.
     """
     c = get_client()
+    if partitioned():
+        ensure_partition(partition_name())
+        apply_retention()
+        return
     try:
         cols = c.get_collections().collections or []
         names = [x.name for x in cols]
     except Exception:
         names = []
+    # COLLECTION puede ser un alias (p. ej. tras un reindex): no crear una colección homónima
+    names.extend(list_aliases(c))
 
     if COLLECTION not in names:
-        c.create_collection(
-            collection_name=COLLECTION,
-            vectors_config=qm.VectorParams(size=VECTOR_SIZE, distance=qm.Distance.COSINE),
-            optimizers_config=qm.OptimizersConfigDiff(indexing_threshold=20000),
-        )
+        create_collection(c, COLLECTION)
 
     # Crear índices (sean nuevos o ya existentes)
-    _ensure_payload_indices(c)
+    _ensure_payload_indices(c, COLLECTION)
+
+
+def list_aliases(c: Optional[QdrantClient] = None) -> dict:
+    """Mapa alias -> colección (vacío si el servidor no responde)."""
+    c = c or get_client()
+    try:
+        return {a.alias_name: a.collection_name for a in c.get_aliases().aliases}
+    except Exception:
+        return {}
+
+
+def resolve_collection(name: str = COLLECTION) -> str:
+    """Nombre real de la colección detrás de 'name' (que puede ser alias o colección)."""
+    return list_aliases().get(name, name)
+
+
+def switch_alias(alias: str, target: str) -> None:
+    """
+    Apunta 'alias' a la colección 'target' de forma atómica (una sola operación de aliases).
+    """
+    c = get_client()
+    ops: list = []
+    if alias in list_aliases(c):
+        ops.append(qm.DeleteAliasOperation(delete_alias=qm.DeleteAlias(alias_name=alias)))
+    ops.append(
+        qm.CreateAliasOperation(create_alias=qm.CreateAlias(collection_name=target, alias_name=alias))
+    )
+    c.update_collection_aliases(change_aliases_operations=ops)
+
+
+# -----------------------------------------------------------------------------
+# Colecciones por mes (PARTITION_BY=month)
+# -----------------------------------------------------------------------------
+_PARTITIONS: Dict[str, Any] = {"names": None, "at": 0.0}
+_PARTITIONS_LOCK = threading.Lock()
+
+
+def partitioned() -> bool:
+    return PARTITION_BY == "month"
+
+
+def _month(value: Any) -> Optional[Tuple[int, int]]:
+    """(año, mes) de un datetime/fecha ISO; None si no se puede interpretar."""
+    if isinstance(value, (dt.datetime, dt.date)):
+        return value.year, value.month
+    if isinstance(value, str) and value.strip():
+        try:
+            d = dt.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return d.year, d.month
+    return None
+
+
+def _current_month() -> Tuple[int, int]:
+    now = dt.datetime.now(dt.timezone.utc)
+    return now.year, now.month
+
+
+def _partition_month(name: str) -> Optional[Tuple[int, int]]:
+    m = re.fullmatch(re.escape(COLLECTION) + r"_m(\d{4})(\d{2})", name)
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+def _partition_key(name: str) -> Tuple[int, int]:
+    """Mes de una colección-mes para ordenar/comparar ((0, 0) si no es partición)."""
+    return _partition_month(name) or (0, 0)
+
+
+def partition_name(published_at: Any = None) -> str:
+    """Colección-mes de una fecha de publicación (sin fecha: el mes en curso)."""
+    y, m = _month(published_at) or _current_month()
+    return f"{COLLECTION}_m{y:04d}{m:02d}"
+
+
+def list_partitions(refresh: bool = False) -> List[str]:
+    """Colecciones-mes existentes, de la más reciente a la más antigua (cache corto)."""
+    now = time.monotonic()
+    with _PARTITIONS_LOCK:
+        names, at = _PARTITIONS["names"], _PARTITIONS["at"]
+        if not refresh and names is not None and now - at < PARTITION_CACHE_SECONDS:
+            return list(names)
+    cols = get_client().get_collections().collections or []
+    names = sorted((x.name for x in cols if _partition_month(x.name)), key=_partition_key, reverse=True)
+    with _PARTITIONS_LOCK:
+        _PARTITIONS.update(names=names, at=now)
+    return list(names)
+
+
+def partitions_for_range(date_from: Any = None, date_to: Any = None) -> List[str]:
+    """Colecciones-mes que solapan [date_from, date_to] (extremos opcionales)."""
+    lo, hi = _month(date_from), _month(date_to)
+    return [
+        n for n in list_partitions()
+        if not (lo and _partition_key(n) < lo) and not (hi and _partition_key(n) > hi)
+    ]
+
+
+def ensure_partition(name: str) -> None:
+    """
+    Crea la colección-mes si falta (perfil + índices de payload). Si es la del mes en
+    curso, mueve el alias COLLECTION a ella (escrituras sin fecha, herramientas legacy).
+    """
+    if name in list_partitions():
+        return
+    c = get_client()
+    try:
+        create_collection(c, name)
+    except Exception:
+        # Otra réplica pudo crearla a la vez
+        if name not in list_partitions(refresh=True):
+            raise
+    _ensure_payload_indices(c, name)
+    if name == partition_name() and list_aliases(c).get(COLLECTION) != name:
+        switch_alias(COLLECTION, name)
+    list_partitions(refresh=True)
+
+
+def apply_retention(months: Optional[int] = None, now: Optional[dt.datetime] = None) -> List[str]:
+    """
+    Borra las colecciones-mes anteriores a los últimos 'months' meses (incluido el actual).
+    Devuelve los nombres borrados. months=0 o sin particiones: no hace nada.
+    """
+    months = PARTITION_RETENTION_MONTHS if months is None else months
+    if not partitioned() or not months:
+        return []
+    y, m = _month(now) or _current_month()
+    idx = y * 12 + (m - 1) - (months - 1)
+    cutoff = (idx // 12, idx % 12 + 1)
+    c = get_client()
+    dropped = [n for n in list_partitions(refresh=True) if _partition_key(n) < cutoff]
+    for name in dropped:
+        c.delete_collection(collection_name=name)
+    if dropped:
+        list_partitions(refresh=True)
+    return dropped
+
+
+def _read_collections(date_from: Any = None, date_to: Any = None) -> List[str]:
+    """Colecciones a consultar: COLLECTION, o las colecciones-mes del rango."""
+    return partitions_for_range(date_from, date_to) if partitioned() else [COLLECTION]
+
+
+@lru_cache(maxsize=1)
+def _fanout_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=PARTITION_FANOUT_WORKERS, thread_name_prefix="qdrant-fanout")
+
+
+def _fanout(fn: Callable[[str], Any], names: List[str]) -> List[Any]:
+    """fn(colección) sobre varias colecciones en paralelo; resultados en el mismo orden."""
+    if len(names) <= 1:
+        return [fn(n) for n in names]
+    return list(_fanout_pool().map(fn, names))
+
+
+def _merge(results: List[List[Any]], limit: int) -> List[Any]:
+    """
+    Mezcla hits de varias colecciones por score (coseno: comparables entre sí).
+    Un mismo id en dos colecciones-mes (p. ej. re-indexado con otra fecha) cuenta una
+    vez, con su mejor score.
+    """
+    if len(results) == 1:
+        return results[0][:limit]
+    seen: Set[str] = set()
+    out: List[Any] = []
+    for h in sorted((h for r in results for h in r), key=lambda h: h.score, reverse=True):
+        if str(h.id) in seen:
+            continue
+        seen.add(str(h.id))
+        out.append(h)
+        if len(out) >= limit:
+            break
+    return out
+
+
+def create_collection(c: QdrantClient, name: str, profile: Optional[dict] = None) -> None:
+    """Crea la colección 'name' con la configuración del perfil (HNSW, cuantización, on_disk)."""
+    p = profile or collection_profile()
+    c.create_collection(
+        collection_name=name,
+        vectors_config=qm.VectorParams(
+            size=VECTOR_SIZE,
+            distance=qm.Distance.COSINE,
+            on_disk=p["on_disk_vectors"],
+        ),
+        on_disk_payload=p["on_disk_payload"],
+        hnsw_config=hnsw_config(p),
+        quantization_config=quantization_config(p),
+        optimizers_config=qm.OptimizersConfigDiff(indexing_threshold=p["indexing_threshold"]),
+    )
+
+
+def apply_collection_profile(name: Optional[str] = None, profile: Optional[dict] = None) -> dict:
+    """
+    Aplica el perfil a una colección existente (migración in-place vía update_collection).
+    Qdrant reconstruye índices/cuantización en segundo plano; la colección sigue sirviendo.
+    Si el perfil no usa cuantización, la deshabilita explícitamente.
+    Devuelve el perfil aplicado.
+    """
+    p = profile or collection_profile()
+    c = get_client()
+    quant = quantization_config(p)
+    c.update_collection(
+        collection_name=name or COLLECTION,
+        vectors_config={"": qm.VectorParamsDiff(on_disk=p["on_disk_vectors"])},
+        hnsw_config=hnsw_config(p),
+        quantization_config=quant if quant is not None else qm.Disabled.DISABLED,
+        optimizers_config=qm.OptimizersConfigDiff(indexing_threshold=p["indexing_threshold"]),
+        collection_params=qm.CollectionParamsDiff(on_disk_payload=p["on_disk_payload"]),
+    )
+    return p
+
+
+def _partition_of(ids: List[str]) -> Dict[str, str]:
+    """Colección-mes donde ya está cada id (la más antigua si hay varias); ids nuevos no salen."""
+    names = list_partitions()
+    if not ids or not names:
+        return {}
+    c = get_client()
+    found = _fanout(
+        lambda name: c.retrieve(collection_name=name, ids=list(ids), with_payload=False, with_vectors=False),
+        names,
+    )
+    home: Dict[str, str] = {}
+    for name, records in zip(names, found, strict=True):
+        for r in records:
+            home[str(r.id)] = name
+    return home
 
 
 def upsert_article(vec_id: Optional[str], vector: List[float], payload: dict) -> None:
@@ -95,31 +576,305 @@ def upsert_article(vec_id: Optional[str], vector: List[float], payload: dict) ->
     Inserta/actualiza un punto. Si no pasas 'vec_id', genera un UUID.
     Para idempotencia por URL/título, genera el ID determinístico aguas arriba.
     """
-    c = get_client()
     pid = vec_id or str(uuid4())
-    point = qm.PointStruct(id=pid, vector=vector, payload=payload)
-    c.upsert(collection_name=COLLECTION, points=[point])
+    upsert_articles([qm.PointStruct(id=pid, vector=vector, payload=payload)])
+
+
+def upsert_articles(points: List[qm.PointStruct], collection: Optional[str] = None) -> None:
+    """
+    Inserta/actualiza varios puntos en una sola llamada (ingesta por lotes).
+    Con particiones, una llamada por colección-mes según payload.published_at (se asume
+    estable: re-indexar con otra fecha deja la versión vieja en su mes hasta la retención).
+    Los puntos sin fecha se quedan en la colección-mes donde ya estén; si son nuevos, van
+    al mes en curso.
+    """
+    if not points:
+        return
+    c = get_client()
+    if collection or not partitioned():
+        c.upsert(collection_name=collection or COLLECTION, points=points)
+        return
+    undated = [str(p.id) for p in points if _month((p.payload or {}).get("published_at")) is None]
+    home = _partition_of(undated)
+    by_month: Dict[str, List[qm.PointStruct]] = {}
+    for p in points:
+        published_at = (p.payload or {}).get("published_at")
+        if _month(published_at) is None:
+            name = home.get(str(p.id)) or partition_name()
+        else:
+            name = partition_name(published_at)
+        by_month.setdefault(name, []).append(p)
+    for name, group in by_month.items():
+        ensure_partition(name)
+        c.upsert(collection_name=name, points=group)
+
+
+def delete_extra_passages(parent_ids: List[str]) -> None:
+    """
+    Borra los pasajes (chunk_index > 0) de los artículos indicados.
+    Se llama antes de re-indexar para no dejar pasajes huérfanos si el artículo se acorta.
+    """
+    if not parent_ids:
+        return
+    c = get_client()
+    selector = qm.FilterSelector(
+        filter=qm.Filter(
+            must=[
+                qm.FieldCondition(key="parent_id", match=qm.MatchAny(any=list(parent_ids))),
+                qm.FieldCondition(key="chunk_index", range=qm.Range(gt=0)),
+            ]
+        )
+    )
+    for name in _read_collections():
+        c.delete(collection_name=name, points_selector=selector)
+
+
+def retrieve(ids: List[str], with_payload=True, with_vectors: bool = False):
+    """
+    Recupera puntos por ID (lookup directo, sin búsqueda ni scroll filtrado).
+    Con particiones consulta todas las colecciones-mes en paralelo.
+    """
+    if not ids:
+        return []
+    c = get_client()
+    found = _fanout(
+        lambda name: c.retrieve(
+            collection_name=name,
+            ids=list(ids),
+            with_payload=with_payload,
+            with_vectors=with_vectors,
+        ),
+        _read_collections(),
+    )
+    return [r for records in found for r in records]
+
+
+def scroll_points(
+    scroll_filter: Optional[qm.Filter] = None,
+    with_payload: Any = True,
+    with_vectors: bool = False,
+    page_size: int = 256,
+) -> Iterator[Any]:
+    """
+    Recorre los puntos que cumplen el filtro (todas las colecciones-mes, de la más
+    reciente a la más antigua), paginando con scroll. Cortar la iteración corta la lectura.
+    """
+    c = get_client()
+    for name in _read_collections():
+        offset = None
+        while True:
+            records, offset = c.scroll(
+                collection_name=name,
+                scroll_filter=scroll_filter,
+                limit=page_size,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=with_vectors,
+            )
+            yield from records
+            if offset is None:
+                break
+
+
+def search_params(
+    hnsw_ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+) -> Optional[qm.SearchParams]:
+    """
+    SearchParams por petición: parte de los del perfil y sobrescribe 'hnsw_ef'/'exact'
+    sólo si se indican (None = usar el valor del perfil / servidor).
+    """
+    base = default_search_params()
+    if hnsw_ef is None and exact is None:
+        return base
+    params = base.model_copy() if base is not None else qm.SearchParams()
+    if hnsw_ef is not None:
+        params.hnsw_ef = hnsw_ef
+    if exact is not None:
+        params.exact = exact
+    return params
 
 
 def search(
     vector: List[float],
     top_k: int = 10,
     query_filter: Optional[qm.Filter] = None,
+    hnsw_ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+    with_vectors: bool = False,
+    date_from: Any = None,
+    date_to: Any = None,
 ):
     """
     Búsqueda vectorial (cosine) con filtro opcional para híbrido (full-text/keyword).
-    Usa la API moderna 'query_points'.
+    Usa la API moderna 'query_points' con los SearchParams del perfil de colección.
+    - hnsw_ef / exact: compromiso recall/latencia por petición
+    - score_threshold: descarta hits con score menor (cola poco relevante)
+    - with_vectors: devuelve los vectores (re-ranking en cliente, p. ej. MMR)
+    - date_from / date_to: con particiones, sólo se consultan los meses del rango
     """
     c = get_client()
-    res = c.query_points(
-        collection_name=COLLECTION,
-        query=vector,
-        limit=top_k,
-        with_payload=True,
-        with_vectors=False,
-        query_filter=query_filter,
-    )
-    return res.points
+    params = search_params(hnsw_ef=hnsw_ef, exact=exact)
+    hits = _fanout(
+        lambda name: c.query_points(
+            collection_name=name,
+            query=vector,
+            limit=top_k,
+            with_payload=True,
+            with_vectors=with_vectors,
+            query_filter=query_filter,
+            search_params=params,
+            score_threshold=score_threshold,
+        ).points,
+        _read_collections(date_from, date_to),
+    )
+    return _merge(hits, top_k)
+
+
+def search_groups(
+    vector: List[float],
+    group_by: str,
+    group_size: int = 10,
+    limit: int = 10,
+    query_filter: Optional[qm.Filter] = None,
+    hnsw_ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+    date_from: Any = None,
+    date_to: Any = None,
+):
+    """
+    Búsqueda agrupada (query_points_groups): hasta 'limit' grupos por valor de
+    payload[group_by] (p. ej. 'source'), con los 'group_size' mejores hits de cada uno.
+    Evita que un valor dominante acapare el top-k. Devuelve [(valor, hits)] por score.
+    """
+    c = get_client()
+    params = search_params(hnsw_ef=hnsw_ef, exact=exact)
+    results = _fanout(
+        lambda name: c.query_points_groups(
+            collection_name=name,
+            query=vector,
+            group_by=group_by,
+            group_size=group_size,
+            limit=limit,
+            with_payload=True,
+            query_filter=query_filter,
+            search_params=params,
+            score_threshold=score_threshold,
+        ).groups,
+        _read_collections(date_from, date_to),
+    )
+    if len(results) == 1:
+        return [(g.id, g.hits) for g in results[0]]
+    # Varias colecciones-mes: une los grupos homónimos y re-ordena por mejor hit
+    merged: Dict[Any, List[Any]] = {}
+    for groups in results:
+        for g in groups:
+            merged.setdefault(g.id, []).append(g.hits)
+    out = [(gid, _merge(hits, group_size)) for gid, hits in merged.items()]
+    out.sort(key=lambda g: g[1][0].score if g[1] else float("-inf"), reverse=True)
+    return out[:limit]
+
+
+def recommend(
+    positive: List[str],
+    negative: Optional[List[str]] = None,
+    top_k: int = 10,
+    query_filter: Optional[qm.Filter] = None,
+    hnsw_ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+    with_vectors: bool = False,
+    strategy: Optional[str] = None,
+):
+    """
+    "Más como esto": búsqueda con los vectores ya guardados de los puntos 'positive'
+    (y alejándose de 'negative'), sin pasar por el modelo de embeddings.
+    strategy: average_vector (default de Qdrant) | best_score | sum_scores.
+    Los puntos de ejemplo no aparecen en los resultados.
+    Con particiones los ejemplos pueden vivir en otro mes: se resuelven sus vectores y
+    se recomienda por vector en todas las colecciones-mes (excluyéndolos por id).
+    """
+    c = get_client()
+    # ids de los ejemplos o, con particiones, sus vectores
+    pos: List[Any] = list(positive)
+    neg: List[Any] = list(negative or [])
+    if partitioned():
+        vectors = {str(r.id): r.vector for r in retrieve(pos + neg, with_payload=False, with_vectors=True)}
+        must_not = query_filter.must_not if query_filter else None
+        query_filter = qm.Filter(
+            must=query_filter.must if query_filter else None,
+            should=query_filter.should if query_filter else None,
+            must_not=(must_not if isinstance(must_not, list) else [must_not] if must_not else [])
+            + [qm.HasIdCondition(has_id=pos + neg)],
+        )
+        pos = [vectors[str(i)] for i in pos if str(i) in vectors]
+        neg = [vectors[str(i)] for i in neg if str(i) in vectors]
+    query = qm.RecommendQuery(
+        recommend=qm.RecommendInput(
+            positive=pos,
+            negative=neg,
+            strategy=qm.RecommendStrategy(strategy) if strategy else None,
+        )
+    )
+    params = search_params(hnsw_ef=hnsw_ef, exact=exact)
+    hits = _fanout(
+        lambda name: c.query_points(
+            collection_name=name,
+            query=query,
+            limit=top_k,
+            with_payload=True,
+            with_vectors=with_vectors,
+            query_filter=query_filter,
+            search_params=params,
+            score_threshold=score_threshold,
+        ).points,
+        _read_collections(),
+    )
+    return _merge(hits, top_k)
+
+
+def search_batch(
+    vectors: List[List[float]],
+    top_k: Union[int, List[int]] = 10,
+    query_filters: Optional[List[Optional[qm.Filter]]] = None,
+    hnsw_ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+    score_threshold: Optional[float] = None,
+    with_payload=True,
+    with_vectors: Union[bool, List[bool]] = False,
+):
+    """
+    Varias búsquedas vectoriales en una sola llamada (query_batch_points).
+    'query_filters', y opcionalmente 'top_k'/'with_vectors' como listas, van alineados
+    con 'vectors'. Devuelve una lista de listas de hits en el mismo orden.
+    """
+    if not vectors:
+        return []
+    n = len(vectors)
+    filters = query_filters or [None] * n
+    limits = top_k if isinstance(top_k, list) else [top_k] * n
+    vectors_flags = with_vectors if isinstance(with_vectors, list) else [with_vectors] * n
+    params = search_params(hnsw_ef=hnsw_ef, exact=exact)
+    requests = [
+        qm.QueryRequest(
+            query=list(v),
+            filter=f,
+            params=params,
+            limit=lim,
+            score_threshold=score_threshold,
+            with_payload=with_payload,
+            with_vector=wv,
+        )
+        for v, f, lim, wv in zip(vectors, filters, limits, vectors_flags, strict=True)
+    ]
+    c = get_client()
+    per_collection = _fanout(
+        lambda name: c.query_batch_points(collection_name=name, requests=requests),
+        _read_collections(),
+    )
+    return [_merge([res[i].points for res in per_collection], limits[i]) for i in range(n)]
 
 
 # --- Helpers de filtros (útiles desde api/service.py) -------------------------
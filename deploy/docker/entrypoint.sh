@@ -20,6 +20,7 @@ PY
 : "${QDRANT_HOST:=news-demo-qdrant}"
 : "${QDRANT_PORT:=6333}"
 : "${UVICORN_WORKERS:=2}"
+: "${UVICORN_PRELOAD:=0}"
 : "${PORT:=8000}"
 
 echo "[entrypoint] Starting News Semantic API"
@@ -34,5 +35,10 @@ for i in $(seq 1 30); do
   sleep 1
 done
 
+# UVICORN_PRELOAD=1: maestro pre-fork que carga los modelos una vez y los comparte
+# (copy-on-write) entre los workers, ver api/serve.py
+if [ "${UVICORN_PRELOAD}" = "1" ]; then
+  exec python -m api.serve --host 0.0.0.0 --port "${PORT}" --workers "${UVICORN_WORKERS}"
+fi
 exec python -m uvicorn api.main:app --host 0.0.0.0 --port "${PORT}" --workers "${UVICORN_WORKERS}"
 
@@ -0,0 +1,133 @@
+"""
+Caché persistente de embeddings en disco, por modelo y hash de contenido.
+
+Layout (un directorio por modelo):
+    <EMBED_CACHE_DIR>/<modelo>/vectors.f32   matriz float32 append-only (n, d), leída con memmap
+    <EMBED_CACHE_DIR>/<modelo>/index.tsv     "<hash>\t<fila>" por línea (append-only)
+    <EMBED_CACHE_DIR>/<modelo>/meta.json     {"model": ..., "dim": ...}
+
+Las escrituras se serializan con flock sobre index.tsv, así varios procesos
+(workers de uvicorn, jobs de reindex) pueden compartir el mismo directorio.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def content_hash(text: str) -> str:
+    """Hash estable del texto exacto que se embebe."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """Almacén (hash de contenido -> vector) respaldado por un memmap float32."""
+
+    def __init__(self, root: str, model_name: str, dim: int):
+        self.model_name = model_name
+        self.dim = int(dim)
+        self.dir = os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name))
+        os.makedirs(self.dir, exist_ok=True)
+        self._vectors_path = os.path.join(self.dir, "vectors.f32")
+        self._index_path = os.path.join(self.dir, "index.tsv")
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._index_offset = 0
+        self._mmap: Optional[np.memmap] = None
+
+        meta_path = os.path.join(self.dir, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if int(meta.get("dim", self.dim)) != self.dim:
+                raise ValueError(
+                    f"Caché de embeddings en {self.dir} tiene dim={meta.get('dim')}, se esperaba {self.dim}"
+                )
+        else:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": model_name, "dim": self.dim}, f)
+        for p in (self._vectors_path, self._index_path):
+            open(p, "ab").close()
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # Lee las entradas nuevas de index.tsv (escritas por este u otros procesos)
+    def _refresh(self) -> None:
+        with open(self._index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        # Sólo líneas completas: una escritura concurrente puede dejar la última a medias
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            key, _, row = line.decode("ascii").partition("\t")
+            if key and row:
+                self._index[key] = int(row)
+        self._index_offset += end
+        self._mmap = None
+
+    def _matrix(self) -> Optional[np.memmap]:
+        rows = os.path.getsize(self._vectors_path) // (self.dim * 4)
+        if rows == 0:
+            return None
+        if self._mmap is None or self._mmap.shape[0] < rows:
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._mmap
+
+    def get_many(self, keys: List[str]) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        """
+        Busca los hashes 'keys'. Devuelve ({posición: vector}, [posiciones sin caché]).
+        """
+        with self._lock:
+            if any(k not in self._index for k in keys):
+                self._refresh()
+            found: Dict[int, np.ndarray] = {}
+            missing: List[int] = []
+            mat = self._matrix()
+            for i, k in enumerate(keys):
+                row = self._index.get(k)
+                if row is None or mat is None or row >= mat.shape[0]:
+                    missing.append(i)
+                else:
+                    found[i] = np.array(mat[row], dtype=np.float32)
+            return found, missing
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        """Agrega vectores nuevos (ignora hashes ya presentes)."""
+        if not keys:
+            return
+        arr = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(keys), self.dim)
+        with self._lock, open(self._index_path, "ab") as fidx:
+            fcntl.flock(fidx, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                todo = []
+                seen = set()
+                for i, k in enumerate(keys):
+                    if k not in self._index and k not in seen:
+                        todo.append(i)
+                        seen.add(k)
+                if not todo:
+                    return
+                with open(self._vectors_path, "ab") as fv:
+                    start = fv.tell() // (self.dim * 4)
+                    fv.write(arr[todo].tobytes())
+                    fv.flush()
+                    os.fsync(fv.fileno())
+                # El índice se escribe después de los vectores: un crash nunca deja
+                # entradas apuntando a filas inexistentes
+                lines = "".join(f"{keys[i]}\t{start + n}\n" for n, i in enumerate(todo))
+                fidx.write(lines.encode("ascii"))
+                fidx.flush()
+                for n, i in enumerate(todo):
+                    self._index[keys[i]] = start + n
+                self._index_offset = os.fstat(fidx.fileno()).st_size
+                self._mmap = None
+            finally:
+                fcntl.flock(fidx, fcntl.LOCK_UN)
@@ -0,0 +1,32 @@
+from typing import List
+
+
+# Aproximación barata de longitud en tokens (palabras); suficiente para ordenar/partir
+def approx_tokens(text: str) -> int:
+    """Longitud aproximada en tokens (conteo de palabras por espacios)."""
+    return len((text or "").split())
+
+
+def length_sorted_order(texts: List[str]) -> List[int]:
+    """
+    Índices de 'texts' ordenados por longitud aproximada.
+    Embeber en este orden agrupa textos de largo similar en cada batch (menos padding).
+    """
+    return sorted(range(len(texts)), key=lambda i: approx_tokens(texts[i]))
+
+
+def chunk_text(text: str, max_tokens: int, overlap: int = 0) -> List[str]:
+    """
+    Parte 'text' en pasajes de hasta 'max_tokens' palabras con 'overlap' palabras
+    compartidas entre pasajes consecutivos. Devuelve [text] si cabe en un pasaje.
+    """
+    words = (text or "").split()
+    if max_tokens <= 0 or len(words) <= max_tokens:
+        return [" ".join(words)] if words else []
+    step = max(1, max_tokens - max(0, overlap))
+    chunks: List[str] = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + max_tokens]))
+        if start + max_tokens >= len(words):
+            break
+    return chunks
@@ -1,8 +1,12 @@
 import os
+import queue
+from contextlib import contextmanager
 from functools import lru_cache
-from typing import List
+from typing import Any, Callable, Dict, Iterator, List, Optional
 import numpy as np
 
+from embedding.chunking import length_sorted_order
+
 # Carga .env si existe, pero SIN sobrescribir variables ya definidas (p. ej., en CI)
 try:
     from dotenv import load_dotenv
@@ -27,6 +31,69 @@ MODEL_NAME = os.getenv(
 )
 
 
+
+# ------------------------------
+# Tuning de sesión: query-time vs ingest-time
+# ------------------------------
+# Cada modo tiene su batch_size, hilos del runtime (intra-op), tamaño del pool de
+# instancias del modelo y 'parallel' (data-parallel multiproceso de fastembed, útil
+# sólo en jobs bulk). Variables: EMBED_{QUERY,INGEST}_{BATCH_SIZE,THREADS,POOL_SIZE,PARALLEL}
+# con fallback a EMBED_{BATCH_SIZE,THREADS}. EMBED_INTER_OP_THREADS aplica al backend
+# sentence-transformers (fastembed usa 'threads' para intra e inter-op).
+def _env_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    return int(raw)
+
+
+EMBED_MODES = ("query", "ingest")
+EMBED_INTER_OP_THREADS = _env_int("EMBED_INTER_OP_THREADS")
+
+
+@lru_cache(maxsize=None)
+def _settings(mode: str) -> Dict[str, Optional[int]]:
+    """Configuración efectiva para 'query' o 'ingest' (cacheada; se lee del entorno una vez)."""
+    if mode not in EMBED_MODES:
+        raise ValueError(f"Modo de embedding '{mode}' no soportado. Usa 'query' o 'ingest'.")
+    prefix = f"EMBED_{mode.upper()}_"
+    return {
+        "batch_size": _env_int(prefix + "BATCH_SIZE", _env_int("EMBED_BATCH_SIZE", 32)),
+        "threads": _env_int(prefix + "THREADS", _env_int("EMBED_THREADS")),
+        "pool_size": _env_int(prefix + "POOL_SIZE", 1),
+        "parallel": _env_int(prefix + "PARALLEL"),
+    }
+
+
+class _EmbedderPool:
+    """
+    Pool de instancias del modelo para llamadas concurrentes.
+    Con size<=1 comparte una única instancia sin bloqueo (comportamiento histórico);
+    con size>1 cada llamada toma una instancia libre y la devuelve al terminar.
+    """
+
+    def __init__(self, primary: Any, factory: Callable[[], Any], size: int):
+        self.primary = primary
+        self.size = max(1, size)
+        self._free: Optional[queue.Queue] = None
+        if self.size > 1:
+            self._free = queue.Queue()
+            self._free.put(primary)
+            for _ in range(self.size - 1):
+                self._free.put(factory())
+
+    @contextmanager
+    def acquire(self) -> Iterator[Any]:
+        if self._free is None:
+            yield self.primary
+            return
+        inst = self._free.get()
+        try:
+            yield inst
+        finally:
+            self._free.put(inst)
+
+
 # Por cada vector, divide por su norma. Para medir similitud coseno de forma estable
 def _l2_normalize(mat: np.ndarray) -> np.ndarray:
     """Normaliza por fila (evita división por cero)."""
@@ -40,13 +107,29 @@ def _l2_normalize(mat: np.ndarray) -> np.ndarray:
 # ------------------------------
 # Backends
 # ------------------------------
+# TextEmbedding (fastembed) o SentenceTransformer: ambas ramas comparten las firmas
+EmbeddingModel = Any
+
 if BACKEND == "fastembed":
     from fastembed import TextEmbedding
 
-    @lru_cache(maxsize=1)
-    def _embedder() -> TextEmbedding:
-        # Crea y cachea una sola instancia del modelo
-        return TextEmbedding(model_name=MODEL_NAME)
+    def _new_model(threads: Optional[int]) -> EmbeddingModel:
+        return TextEmbedding(model_name=MODEL_NAME, threads=threads)
+
+    @lru_cache(maxsize=None)
+    def _model(threads: Optional[int]) -> TextEmbedding:
+        # Una instancia compartida por configuración de hilos (query e ingest la reutilizan si coinciden)
+        return _new_model(threads)
+
+    @lru_cache(maxsize=None)
+    def _pool(mode: str) -> _EmbedderPool:
+        s = _settings(mode)
+        threads = s["threads"]
+        return _EmbedderPool(_model(threads), lambda: _new_model(threads), s["pool_size"] or 1)
+
+    def _embedder() -> EmbeddingModel:
+        # Instancia principal (query-time)
+        return _pool("query").primary
 
     @lru_cache(maxsize=1)
     def _embedding_dim() -> int:
@@ -59,22 +142,50 @@ if BACKEND == "fastembed":
             arr = np.array(list(_embedder().embed(["__dim_probe__"])), dtype=np.float32)
             return int(arr.shape[1]) if arr.ndim == 2 else 0
 
-    def embed_texts(texts: List[str]) -> np.ndarray:
-        """Devuelve matriz (n, d) float32 L2-normalizada. Seguro con lista vacía."""
+    def embed_texts(texts: List[str], mode: str = "query") -> np.ndarray:
+        """
+        Devuelve matriz (n, d) float32 L2-normalizada. Seguro con lista vacía.
+        'mode' elige la configuración de sesión: 'query' (peticiones) o 'ingest' (indexación).
+        """
         if not texts:
             return np.empty((0, _embedding_dim()), dtype=np.float32)
-        vecs = list(_embedder().embed(texts, batch_size=32))
+        s = _settings(mode)
+        with _pool(mode).acquire() as m:
+            vecs = list(m.embed(texts, batch_size=s["batch_size"], parallel=s["parallel"]))
         arr = np.array(vecs, dtype=np.float32)
         return _l2_normalize(arr)
 
 elif BACKEND == "sentence-transformers":
     from sentence_transformers import SentenceTransformer
 
-    @lru_cache(maxsize=1)
-    def _embedder() -> SentenceTransformer:
-        # Crea y cachea una sola instancia del modelo
+    def _new_model(threads: Optional[int]) -> EmbeddingModel:
+        # torch usa hilos globales por proceso: se aplican al crear el modelo
+        import torch  # type: ignore[import-not-found]
+
+        if threads:
+            torch.set_num_threads(threads)
+        if EMBED_INTER_OP_THREADS:
+            try:
+                torch.set_num_interop_threads(EMBED_INTER_OP_THREADS)
+            except RuntimeError:
+                # sólo puede fijarse una vez por proceso
+                pass
         return SentenceTransformer(MODEL_NAME)
 
+    @lru_cache(maxsize=None)
+    def _model(threads: Optional[int]) -> SentenceTransformer:
+        return _new_model(threads)
+
+    @lru_cache(maxsize=None)
+    def _pool(mode: str) -> _EmbedderPool:
+        s = _settings(mode)
+        threads = s["threads"]
+        return _EmbedderPool(_model(threads), lambda: _new_model(threads), s["pool_size"] or 1)
+
+    def _embedder() -> EmbeddingModel:
+        # Instancia principal (query-time)
+        return _pool("query").primary
+
     @lru_cache(maxsize=1)
     def _embedding_dim() -> int:
         try:
@@ -85,11 +196,19 @@ elif BACKEND == "sentence-transformers":
             arr = np.asarray(arr)
             return int(arr.shape[1]) if arr.ndim == 2 else 0
 
-    def embed_texts(texts: List[str]) -> np.ndarray:
-        """Devuelve matriz (n, d) float32 L2-normalizada. Seguro con lista vacía."""
+    def embed_texts(texts: List[str], mode: str = "query") -> np.ndarray:
+        """
+        Devuelve matriz (n, d) float32 L2-normalizada. Seguro con lista vacía.
+        'mode' elige la configuración de sesión: 'query' (peticiones) o 'ingest' (indexación).
+        ('parallel' no aplica a este backend.)
+        """
         if not texts:
             return np.empty((0, _embedding_dim()), dtype=np.float32)
-        vecs = _embedder().encode(texts, batch_size=32, show_progress_bar=False, normalize_embeddings=False)
+        s = _settings(mode)
+        with _pool(mode).acquire() as m:
+            vecs = m.encode(
+                texts, batch_size=s["batch_size"], show_progress_bar=False, normalize_embeddings=False
+            )
         arr = np.array(vecs, dtype=np.float32)
         return _l2_normalize(arr)
 
@@ -103,33 +222,86 @@ else:
 # API conveniente (single/batch)
 # ------------------------------
 # devuelve un vector (lista de floats) normalizado
-def embed(text: str) -> List[float]:
+def embed(text: str, mode: str = "query") -> List[float]:
     """
     Embedding para un solo texto. Devuelve lista[float] L2-normalizada.
     """
     # embed_texts siempre devuelve (n,d); aquí n=1
-    arr = embed_texts([text])
+    arr = embed_texts([text], mode=mode)
     if arr.shape[0] == 0:
         return []
     return arr[0].tolist()
 
 # devuelve una lista de vectores normalizados.
-def embed_batch(texts: List[str]) -> List[List[float]]:
+def embed_batch(texts: List[str], mode: str = "query") -> List[List[float]]:
     """
     Embedding por lotes. Devuelve lista de listas (n, d) L2-normalizada.
     Maneja lista vacía devolviendo [].
     """
     if not texts:
         return []
-    arr = embed_texts(texts)
+    arr = embed_texts(texts, mode=mode)
     return arr.tolist()
 
+# ------------------------------
+# Caché persistente de embeddings (EMBED_CACHE_DIR)
+# ------------------------------
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "").strip()
+
+
+@lru_cache(maxsize=1)
+def _embed_cache():
+    """EmbeddingCache del modelo actual, o None si EMBED_CACHE_DIR no está definido."""
+    if not EMBED_CACHE_DIR:
+        return None
+    from embedding.cache import EmbeddingCache
+
+    return EmbeddingCache(EMBED_CACHE_DIR, MODEL_NAME, _embedding_dim())
+
+
+def _embed_sorted(texts: List[str], mode: str) -> np.ndarray:
+    """Embebe ordenando por longitud (menos padding) y restaura el orden original."""
+    order = length_sorted_order(texts)
+    arr = embed_texts([texts[i] for i in order], mode=mode)
+    out = np.empty_like(arr)
+    out[order] = arr
+    return out
+
+
+# documentos (ingesta): consulta la caché y embebe sólo lo que falta, por longitud
+def embed_documents(texts: List[str], mode: str = "ingest") -> np.ndarray:
+    """
+    Embedding de documentos en lote con batching por longitud.
+    Si hay caché en disco, reutiliza vectores por (modelo, hash de contenido).
+    Devuelve matriz (n, d) float32 L2-normalizada en el MISMO orden que 'texts'.
+    """
+    if not texts:
+        return embed_texts([], mode=mode)
+    cache = _embed_cache()
+    if cache is None:
+        return _embed_sorted(texts, mode)
+
+    from embedding.cache import content_hash
+
+    keys = [content_hash(t) for t in texts]
+    found, missing = cache.get_many(keys)
+    out = np.empty((len(texts), cache.dim), dtype=np.float32)
+    for i, v in found.items():
+        out[i] = v
+    if missing:
+        fresh = _embed_sorted([texts[i] for i in missing], mode)
+        out[missing] = fresh
+        cache.put_many([keys[i] for i in missing], fresh)
+    return out
+
 # Ayuda a IDEs/linters a saber qué es la API oficial
 __all__ = [
     "embed_texts",  # np.ndarray (n,d) float32 normalizado
     "embed",        # List[float]
     "embed_batch",  # List[List[float]]
+    "embed_documents",  # np.ndarray (n,d), batching por longitud
     "_embedding_dim",
     "BACKEND",
     "MODEL_NAME",
+    "EMBED_MODES",
 ]
@@ -0,0 +1,381 @@
+"""
+Motor único de ingesta: etapas enchufables sobre lotes de documentos.
+
+    parse (feed -> docs) -> dedup -> fetch -> extract -> enrich -> embed -> near_dup -> upsert
+
+Cada etapa recibe y devuelve una lista de docs (dict con el contrato de /index más
+campos privados "_*" que no llegan al payload). Las etapas declaran su fase:
+
+- "prepare": sobre todos los ítems de un feed (dedup)
+- "item":    por artículo, dominadas por I/O (fetch, extract, enrich)
+- "sink":    por lotes hacia el backend (embed, near_dup, upsert)
+
+ingest_feed() corre todo en el mismo hilo (fetch concurrente dentro de la etapa);
+ingest.worker reparte las fases en hilos con colas acotadas. Pipeline.stats() expone
+tiempos y conteos por etapa.
+"""
+from __future__ import annotations
+
+import abc
+import datetime as dt
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+INGEST_FETCH_CONCURRENCY = int(os.getenv("INGEST_FETCH_CONCURRENCY", "8"))
+INGEST_FETCH_TIMEOUT = int(os.getenv("INGEST_FETCH_TIMEOUT", "10"))
+INGEST_SINK_BATCH = int(os.getenv("INGEST_SINK_BATCH", "32"))
+
+
+# -----------------------------------
+# Parse: feed -> docs candidatos
+# -----------------------------------
+def _best_published(entry) -> Optional[dt.datetime]:
+    """
+    Toma la mejor fecha disponible del feed y la normaliza a datetime con tz UTC.
+    """
+    for attr in ("published_parsed", "updated_parsed", "created_parsed"):
+        parsed = getattr(entry, attr, None)
+        if parsed:
+            # tuple estilo time.struct_time → (Y, m, d, H, M, S, ...)
+            return dt.datetime(*parsed[:6], tzinfo=dt.timezone.utc)
+    return None
+
+
+def _host(feed_url: str) -> str:
+    return feed_url.split("/")[2] if "://" in feed_url else feed_url
+
+
+def parse_entries(parsed: Any, feed_url: str, limit: int = 20, lang: Optional[str] = None) -> List[Dict]:
+    """
+    Convierte las entradas de un feed (feedparser) en docs candidatos.
+    - source = host del feed; published_at en UTC; content inicial = summary (fallback)
+    """
+    host = _host(feed_url)
+    docs: List[Dict] = []
+    for entry in parsed.entries[:limit]:
+        url = getattr(entry, "link", None) or getattr(entry, "id", None)
+        title = getattr(entry, "title", None)
+        if not url or not title:
+            continue
+        summary = getattr(entry, "summary", "") or getattr(entry, "description", "") or ""
+        docs.append(
+            {
+                "title": title,
+                "url": url,
+                "source": host,
+                "published_at": _best_published(entry),
+                "content": "",
+                "language": lang or "es",
+                "_summary": summary,
+            }
+        )
+    return docs
+
+
+# -----------------------------------
+# Etapas
+# -----------------------------------
+class Stage(abc.ABC):
+    """Etapa del pipeline: List[doc] -> List[doc]. Los docs descartados no se devuelven."""
+
+    name = "stage"
+    phase = "item"
+
+    @abc.abstractmethod
+    def __call__(self, docs: List[Dict]) -> List[Dict]:
+        raise NotImplementedError
+
+
+class DedupStage(Stage):
+    """Evita repetidos por URL dentro del lote (hash estable)."""
+
+    name = "dedup"
+    phase = "prepare"
+
+    def __call__(self, docs: List[Dict]) -> List[Dict]:
+        seen: set = set()
+        out: List[Dict] = []
+        for d in docs:
+            h = hashlib.sha1(str(d["url"]).encode("utf-8")).hexdigest()
+            if h in seen:
+                continue
+            seen.add(h)
+            out.append(d)
+        return out
+
+
+class FetchStage(Stage):
+    """
+    Descarga el HTML de cada artículo (concurrente); fallos dejan '_html' vacío.
+    allow_private=True desactiva la protección SSRF de trafilatura (servidores locales de prueba).
+    """
+
+    name = "fetch"
+
+    def __init__(
+        self,
+        concurrency: int = INGEST_FETCH_CONCURRENCY,
+        timeout: int = INGEST_FETCH_TIMEOUT,
+        allow_private: bool = False,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.allow_private = allow_private
+        self._config: Any = None  # trafilatura ConfigParser, se arma en el primer fetch
+
+    def _fetch_one(self, url: str) -> Optional[str]:
+        import trafilatura
+        from trafilatura.settings import use_config
+
+        if self._config is None:
+            cfg = use_config()
+            cfg.set("DEFAULT", "DOWNLOAD_TIMEOUT", str(self.timeout))
+            if self.allow_private:
+                cfg.set("DEFAULT", "SSRF_PROTECTION", "off")
+            self._config = cfg
+        try:
+            return trafilatura.fetch_url(url, no_ssl=True, config=self._config)
+        except Exception as e:
+            # No detenemos la ingesta por un artículo malo
+            log.debug("Fallo descargando %s: %s", url, e)
+            return None
+
+    def __call__(self, docs: List[Dict]) -> List[Dict]:
+        if len(docs) <= 1 or self.concurrency == 1:
+            htmls = [self._fetch_one(d["url"]) for d in docs]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(docs))) as ex:
+                htmls = list(ex.map(self._fetch_one, [d["url"] for d in docs]))
+        for d, html in zip(docs, htmls, strict=True):
+            d["_html"] = html
+        return docs
+
+
+def extract_text(html: Optional[str]) -> Optional[str]:
+    """Texto limpio del HTML con trafilatura (None si no hay cuerpo)."""
+    if not html:
+        return None
+    import trafilatura
+
+    try:
+        text = trafilatura.extract(
+            html,
+            include_comments=False,
+            include_tables=False,
+            include_images=False,
+            favor_precision=True,
+        )
+    except Exception as e:
+        log.debug("Fallo extrayendo HTML: %s", e)
+        return None
+    return text if text and text.strip() else None
+
+
+class ExtractStage(Stage):
+    """
+    Extrae el cuerpo del HTML; si no hay, usa el summary del feed.
+    Descarta el artículo si tampoco hay summary.
+    """
+
+    name = "extract"
+
+    def __call__(self, docs: List[Dict]) -> List[Dict]:
+        out: List[Dict] = []
+        for d in docs:
+            text = extract_text(d.pop("_html", None)) or d.get("content") or d.get("_summary") or ""
+            if not text.strip():
+                continue
+            d["content"] = text
+            out.append(d)
+        return out
+
+
+class EnrichStage(Stage):
+    """Normalización mínima: espacios en contenido/título y campos por defecto."""
+
+    name = "enrich"
+
+    def __call__(self, docs: List[Dict]) -> List[Dict]:
+        for d in docs:
+            d["content"] = " ".join(str(d.get("content") or "").split())
+            d["title"] = " ".join(str(d.get("title") or "").split())
+            d.setdefault("language", "es")
+        return docs
+
+
+def _public(doc: Dict) -> Dict:
+    """Doc sin campos privados del pipeline (lo que llega al payload)."""
+    return {k: v for k, v in doc.items() if not k.startswith("_")}
+
+
+class EmbedStage(Stage):
+    """Embebe el lote (batching por longitud, caché) y adjunta los puntos en '_points'."""
+
+    name = "embed"
+    phase = "sink"
+
+    def __call__(self, docs: List[Dict]) -> List[Dict]:
+        from api.service import build_point_groups
+
+        for d, points in zip(docs, build_point_groups([_public(d) for d in docs]), strict=True):
+            d["_points"] = points
+        return docs
+
+
+class NearDuplicateStage(Stage):
+    """Enlaza casi-duplicados a su original ('canonical_id'); en modo 'drop' los descarta."""
+
+    name = "near_dup"
+    phase = "sink"
+
+    def __call__(self, docs: List[Dict]) -> List[Dict]:
+        from api.service import mark_near_duplicates
+
+        keep = mark_near_duplicates([d["_points"] for d in docs])
+        return [d for d, k in zip(docs, keep, strict=True) if k]
+
+
+class UpsertStage(Stage):
+    """
+    Escribe los puntos del lote en un solo upsert (service.write_point_groups: pasajes
+    sobrantes, alertas y modelo de términos, igual que /index).
+    """
+
+    name = "upsert"
+    phase = "sink"
+
+    def __call__(self, docs: List[Dict]) -> List[Dict]:
+        from api.service import write_point_groups
+
+        groups = [d.pop("_points", []) for d in docs]
+        write_point_groups([_public(d) for d in docs], groups)
+        return docs
+
+
+# -----------------------------------
+# Pipeline
+# -----------------------------------
+class Pipeline:
+    """Secuencia de etapas con tiempos/conteos por etapa (thread-safe)."""
+
+    def __init__(self, stages: Iterable[Stage], sink_batch: int = INGEST_SINK_BATCH):
+        self.stages = list(stages)
+        self.sink_batch = max(1, sink_batch)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {
+            s.name: {"calls": 0, "seconds": 0.0, "docs_in": 0, "docs_out": 0} for s in self.stages
+        }
+
+    def _run_stage(self, stage: Stage, docs: List[Dict]) -> List[Dict]:
+        t0 = time.perf_counter()
+        out = stage(docs)
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            st = self._stats[stage.name]
+            st["calls"] += 1
+            st["seconds"] += elapsed
+            st["docs_in"] += len(docs)
+            st["docs_out"] += len(out)
+        return out
+
+    def run(self, docs: List[Dict], phase: Optional[str] = None) -> List[Dict]:
+        """
+        Corre las etapas (todas o sólo las de 'phase') sobre 'docs'.
+        En la corrida completa las etapas "sink" van por lotes de 'sink_batch' (run_sink):
+        un lote que falla se descarta sin perder los ya escritos.
+        """
+        for stage in self.stages:
+            if phase is not None and stage.phase != phase:
+                continue
+            if phase is None and stage.phase == "sink":
+                continue
+            if not docs:
+                break
+            docs = self._run_stage(stage, docs)
+        if phase is None and docs:
+            docs, _ = self.run_sink(docs)
+        return docs
+
+    def run_sink(self, docs: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Etapas "sink" lote a lote. Devuelve (escritos, fallidos); los descartados por una
+        etapa (near_dup en modo 'drop') no están en ninguna de las dos listas.
+        """
+        stages = [s for s in self.stages if s.phase == "sink"]
+        written: List[Dict] = []
+        failed: List[Dict] = []
+        for i in range(0, len(docs), self.sink_batch):
+            batch = docs[i:i + self.sink_batch]
+            out = batch
+            try:
+                for stage in stages:
+                    if not out:
+                        break
+                    out = self._run_stage(stage, out)
+            except Exception as e:
+                log.warning("Fallo indexando lote de %d docs: %s", len(batch), e)
+                failed.extend(batch)
+                continue
+            written.extend(out)
+        return written, failed
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._stats.items()}
+
+
+def default_pipeline(
+    fetch_concurrency: int = INGEST_FETCH_CONCURRENCY,
+    sink_batch: int = INGEST_SINK_BATCH,
+) -> Pipeline:
+    return Pipeline(
+        [
+            DedupStage(),
+            FetchStage(concurrency=fetch_concurrency),
+            ExtractStage(),
+            EnrichStage(),
+            EmbedStage(),
+            NearDuplicateStage(),
+            UpsertStage(),
+        ],
+        sink_batch=sink_batch,
+    )
+
+
+def ingest_feed(
+    feed_url: str,
+    limit: int = 20,
+    lang: Optional[str] = None,
+    pipeline: Optional[Pipeline] = None,
+    parse_fn=None,
+) -> int:
+    """
+    Descarga un feed RSS/Atom, limpia y **indexa** sus ítems con el pipeline.
+    Devuelve la cantidad total efectivamente indexada (N).
+    """
+    if parse_fn is None:
+        import feedparser  # type: ignore[import-untyped]
+
+        parse_fn = feedparser.parse
+    pipeline = pipeline or default_pipeline()
+    docs = parse_entries(parse_fn(feed_url), feed_url, limit=limit, lang=lang)
+    t0 = time.perf_counter()
+    try:
+        # Los lotes que fallan al escribir se descartan dentro de run (run_sink)
+        indexed = pipeline.run(docs)
+    except Exception as e:
+        # En producción: log estructurado + request_id/trace_id
+        log.warning("No se pudo indexar el feed %s: %s", feed_url, e)
+        return 0
+    log.info(
+        "Feed %s: %d/%d indexados en %.2fs %s",
+        feed_url, len(indexed), len(docs), time.perf_counter() - t0, pipeline.stats(),
+    )
+    return len(indexed)
@@ -0,0 +1,280 @@
+"""
+Reindexa la colección en una colección nueva y cambia las lecturas vía alias, sin downtime.
+
+Flujo:
+  1. Crea la colección destino con el perfil actual (VECTOR_SIZE, HNSW, cuantización...)
+  2. Recorre la origen con scroll en páginas grandes (sólo artículos, no pasajes)
+  3. Re-embebe por lotes (embed_documents, modo ingest; --parallel para multiproceso)
+     o copia los vectores tal cual con --keep-vectors (cambios sólo de índice)
+  4. Escribe en la destino solapando el upsert de una página con el embedding de la siguiente
+  5. Puesta al día: re-copia lo indexado en la origen durante la copia ('indexed_at')
+  6. Apunta el alias (QDRANT_COLLECTION) a la destino en una sola operación atómica y
+     copia lo que aún se haya escrito en la origen por el alias viejo
+
+Uso:
+    python -m ingest.reindex --target news_v2
+    python -m ingest.reindex --target news_v2 --keep-vectors --profile compact
+    python -m ingest.reindex --target news_v2 --snapshot --drop-source
+
+Si QDRANT_COLLECTION es hoy una colección (no un alias) el alias no puede crearse con el
+mismo nombre mientras exista: para la ingesta y usa --drop-source. Sin alias no hay ronda
+de puesta al día tras el cambio (la origen ya no existe), así que lo escrito entre la
+última ronda y el alias se perdería; si la última ronda aún encuentra escrituras, no
+borra nada y aborta. Sin --drop-source aborta antes de crear la destino.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from clients import content_store
+
+log = logging.getLogger(__name__)
+
+
+def _is_article(payload: Dict) -> bool:
+    """Los pasajes extra (chunk_index > 0) se regeneran desde el artículo."""
+    return int(payload.get("chunk_index") or 0) == 0
+
+
+def _article_doc(payload: Dict, pid: Any = None) -> Dict:
+    """Payload del artículo sin los campos internos de chunking, con 'content' en claro."""
+    internal: Tuple[str, ...] = ("parent_id", "chunk_index", "chunk_count")
+    if content_store.is_packed(payload):
+        payload = content_store.unpacked_payload(pid, payload)
+        internal += ("snippet", "content_len")
+    return {k: v for k, v in payload.items() if k not in internal}
+
+
+# Margen para relojes desfasados entre los escritores y este proceso (indexed_at)
+_CLOCK_SKEW = 60.0
+_CATCHUP_ROUNDS = 3
+
+
+def _newer_in_source(c: Any, target: str, records: List[Any]) -> List[Any]:
+    """Registros ausentes en 'target' o con 'indexed_at' más reciente que su copia."""
+    if not records:
+        return []
+    have = {
+        str(r.id): (r.payload or {}).get("indexed_at")
+        for r in c.retrieve(collection_name=target, ids=[r.id for r in records], with_payload=["indexed_at"])
+    }
+    out = []
+    for r in records:
+        key = str(r.id)
+        if key not in have or (have[key] or 0.0) < ((r.payload or {}).get("indexed_at") or 0.0):
+            out.append(r)
+    return out
+
+
+def _stale_passages(records: List[Any], keep_vectors: bool) -> Any:
+    """
+    Filtro de los pasajes en destino que sobran al re-copiar estos artículos: al re-embeber
+    se regeneran todos junto a su cabeza; con vectores copiados (los pasajes pueden venir
+    en otra página) sólo los que exceden el 'chunk_count' nuevo.
+    """
+    from qdrant_client.http import models as qm
+
+    heads = [r for r in records if "chunk_index" in (r.payload or {}) and _is_article(r.payload or {})]
+    if not heads:
+        return None
+    if not keep_vectors:
+        return qm.Filter(must=[
+            qm.FieldCondition(key="parent_id", match=qm.MatchAny(any=[str(r.id) for r in heads])),
+            qm.FieldCondition(key="chunk_index", range=qm.Range(gt=0)),
+        ])
+    return qm.Filter(should=[
+        qm.Filter(must=[
+            qm.FieldCondition(key="parent_id", match=qm.MatchValue(value=str(r.id))),
+            qm.FieldCondition(key="chunk_index", range=qm.Range(gte=max(1, int(r.payload.get("chunk_count") or 1)))),
+        ])
+        for r in heads
+    ])
+
+
+def _copy_pages(
+    c: Any,
+    source: str,
+    target: str,
+    page_size: int,
+    keep_vectors: bool,
+    scroll_filter: Any = None,
+    newer_only: bool = False,
+) -> int:
+    """
+    Copia (o re-embebe) los puntos de 'source' que cumplen 'scroll_filter' en 'target',
+    solapando el upsert de una página con el embedding de la siguiente. Con 'newer_only'
+    sólo los que faltan o cambiaron (puesta al día) y limpia sus pasajes viejos.
+    """
+    from qdrant_client.http import models as qm
+
+    import clients.qdrant_client as qc
+    from api.service import build_points
+
+    total = 0
+    t0 = time.perf_counter()
+    offset = None
+    pending: Optional[Future] = None
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        while True:
+            records, offset = c.scroll(
+                collection_name=source,
+                scroll_filter=scroll_filter,
+                limit=page_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=keep_vectors,
+            )
+            if newer_only:
+                records = _newer_in_source(c, target, records)
+                stale = _stale_passages(records, keep_vectors)
+                if stale is not None:
+                    c.delete(collection_name=target, points_selector=qm.FilterSelector(filter=stale))
+            if keep_vectors:
+                points = [
+                    qm.PointStruct(id=r.id, vector=r.vector, payload=r.payload or {}) for r in records
+                ]
+                n = sum(1 for r in records if _is_article(r.payload or {}))
+            else:
+                docs = [_article_doc(r.payload or {}, r.id) for r in records if _is_article(r.payload or {})]
+                points, _ = build_points(docs) if docs else ([], [])
+                content_store.pack_many([(str(p.id), p.payload) for p in points if p.payload is not None])
+                n = len(docs)
+
+            # Escribe la página anterior mientras se embebe la siguiente
+            if pending is not None:
+                pending.result()
+            pending = writer.submit(qc.upsert_articles, points, target) if points else None
+            total += n
+            log.info("reindex: %d artículos (%.1f docs/s)", total, total / max(1e-9, time.perf_counter() - t0))
+            if offset is None:
+                break
+        if pending is not None:
+            pending.result()
+    return total
+
+
+def _written_since(ts: float) -> Any:
+    from qdrant_client.http import models as qm
+
+    return qm.Filter(must=[qm.FieldCondition(key="indexed_at", range=qm.Range(gte=ts - _CLOCK_SKEW))])
+
+
+def reindex(
+    target: str,
+    source: Optional[str] = None,
+    alias: Optional[str] = None,
+    page_size: int = 512,
+    keep_vectors: bool = False,
+    profile: Optional[dict] = None,
+    snapshot: bool = False,
+    drop_source: bool = False,
+    switch: bool = True,
+) -> int:
+    """
+    Copia/re-embebe 'source' en 'target' y cambia el alias. Devuelve artículos reindexados.
+
+    Lo que se indexa durante la copia sigue yendo a 'source' (vía alias): antes del cambio
+    se copian en rondas los puntos con 'indexed_at' posterior al inicio de la ronda previa,
+    y tras el cambio una última ronda recoge las escrituras que resolvieron el alias viejo.
+    Una ronda sólo copia lo ausente o más nuevo en 'target' (ver _newer_in_source).
+    """
+    import clients.qdrant_client as qc
+
+    alias = alias or qc.COLLECTION
+    source = source or qc.resolve_collection(alias)
+    if source == target:
+        raise ValueError(f"La colección destino '{target}' coincide con la origen")
+
+    if switch and source == alias and not drop_source:
+        raise ValueError(
+            f"'{alias}' es una colección, no un alias: no se puede crear el alias con su nombre. "
+            "Para la ingesta y usa --drop-source, o lee vía otro alias (--alias)"
+        )
+
+    c = qc.get_client()
+    qc.create_collection(c, target, profile)
+    qc._ensure_payload_indices(c, target)
+
+    if snapshot:
+        snap = c.create_snapshot(collection_name=source)
+        log.info("Snapshot de '%s': %s", source, getattr(snap, "name", snap))
+
+    since = time.time()
+    total = _copy_pages(c, source, target, page_size, keep_vectors)
+    if not switch:
+        return total
+
+    # Puesta al día: hasta que una ronda no encuentre nada (o _CATCHUP_ROUNDS)
+    n = 0
+    for _ in range(_CATCHUP_ROUNDS):
+        started = time.time()
+        n = _copy_pages(c, source, target, page_size, keep_vectors, _written_since(since), newer_only=True)
+        total += n
+        since = started
+        if not n:
+            break
+
+    if drop_source and source == alias:
+        # Tras borrarla no hay ronda posterior: sólo es seguro con la ingesta parada
+        if n:
+            raise RuntimeError(
+                f"Siguen llegando escrituras a '{source}': para la ingesta antes de --drop-source "
+                f"('{target}' queda creada sin alias)"
+            )
+        c.delete_collection(collection_name=source)
+    qc.switch_alias(alias, target)
+    log.info("Alias '%s' -> '%s'", alias, target)
+    if source != alias:
+        total += _copy_pages(c, source, target, page_size, keep_vectors, _written_since(since), newer_only=True)
+        if drop_source:
+            c.delete_collection(collection_name=source)
+    return total
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Reindexa la colección y cambia el alias.")
+    parser.add_argument("--target", required=True, help="Colección destino (nueva)")
+    parser.add_argument("--source", default=None, help="Colección origen (default: la del alias)")
+    parser.add_argument("--alias", default=None, help="Alias de lectura (default: QDRANT_COLLECTION)")
+    parser.add_argument("--page-size", type=int, default=512, help="Tamaño de página del scroll")
+    parser.add_argument("--keep-vectors", action="store_true", help="Copia vectores sin re-embeber")
+    parser.add_argument("--parallel", type=int, default=None, help="Procesos de embedding (0 = todos los cores)")
+    parser.add_argument("--profile", default=None, help="Perfil de colección para la destino")
+    parser.add_argument("--snapshot", action="store_true", help="Snapshot de la origen antes de copiar")
+    parser.add_argument(
+        "--drop-source",
+        action="store_true",
+        help="Borra la origen tras el cambio. Si la origen es QDRANT_COLLECTION (colección, no alias) "
+        "se borra antes de crear el alias: para antes la ingesta o se pierde lo escrito en medio",
+    )
+    parser.add_argument("--no-switch", action="store_true", help="No cambia el alias")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=os.getenv("APP_LOG_LEVEL", "INFO"))
+    # Debe fijarse antes de importar embedding.provider (la config de sesión se lee una vez)
+    if args.parallel is not None:
+        os.environ["EMBED_INGEST_PARALLEL"] = str(args.parallel)
+
+    import clients.qdrant_client as qc
+
+    total = reindex(
+        target=args.target,
+        source=args.source,
+        alias=args.alias,
+        page_size=args.page_size,
+        keep_vectors=args.keep_vectors,
+        profile=qc.collection_profile(args.profile),
+        snapshot=args.snapshot,
+        drop_source=args.drop_source,
+        switch=not args.no_switch,
+    )
+    print(f"[reindex] {total} artículos -> '{args.target}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
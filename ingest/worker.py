@@ -0,0 +1,405 @@
+"""
+Worker de ingesta multi-feed con cola acotada.
+
+Reparte las fases de ingest.pipeline en hilos conectados por colas acotadas
+(backpressure: si Qdrant o el embedder van lentos, las colas se llenan y las etapas
+anteriores se bloquean):
+
+    feeds --> [parse + prepare] --> items --> [item: fetch/extract/enrich x N] --> docs --> [sink: embed+upsert por lotes]
+
+- POST /ingest/feed sólo encola un IngestJob y devuelve su id (GET /ingest/jobs/{id}).
+- Como proceso standalone lee un registro de feeds (JSON) y programa cada feed con su
+  intervalo y jitter:
+
+    python -m ingest.worker --registry feeds.json
+    python -m ingest.worker --registry feeds.json --once   # una pasada y sale
+
+Registro (FEED_REGISTRY):
+    [{"url": "https://.../rss", "interval": 900, "limit": 20, "lang": "es"}, ...]
+
+Estado de los jobs: en memoria del proceso que los ejecuta y, para que cualquier worker
+de la API pueda responder GET /ingest/jobs/{id}, en un JSON por job en INGEST_JOBS_DIR
+(default: directorio temporal del sistema, compartido por los workers de un mismo pod).
+Con varias réplicas, INGEST_JOBS_DIR debe ser un volumen compartido.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from ingest.pipeline import Pipeline, default_pipeline, parse_entries
+
+log = logging.getLogger(__name__)
+
+FEED_REGISTRY = os.getenv("FEED_REGISTRY", "feeds.json")
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "256"))
+INGEST_FETCH_WORKERS = int(os.getenv("INGEST_FETCH_WORKERS", "4"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "32"))
+INGEST_BATCH_WAIT = float(os.getenv("INGEST_BATCH_WAIT", "2.0"))
+INGEST_DEFAULT_INTERVAL = int(os.getenv("INGEST_DEFAULT_INTERVAL", "900"))
+INGEST_JITTER = float(os.getenv("INGEST_JITTER", "0.1"))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "1000"))
+INGEST_JOBS_DIR = os.getenv("INGEST_JOBS_DIR", os.path.join(tempfile.gettempdir(), "news-ingest-jobs")).strip()
+INGEST_JOB_TTL = int(os.getenv("INGEST_JOB_TTL", str(7 * 24 * 3600)))
+
+_STOP = object()
+
+
+@dataclass
+class FeedSpec:
+    url: str
+    interval: int = INGEST_DEFAULT_INTERVAL
+    limit: int = 20
+    lang: Optional[str] = None
+
+
+def load_registry(path: str = FEED_REGISTRY) -> List[FeedSpec]:
+    """Lee el registro de feeds (lista JSON de objetos o de URLs)."""
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    feeds: List[FeedSpec] = []
+    for item in raw:
+        if isinstance(item, str):
+            feeds.append(FeedSpec(url=item))
+        else:
+            feeds.append(FeedSpec(**item))
+    return feeds
+
+
+@dataclass
+class IngestJob:
+    feed: str
+    limit: int = 20
+    lang: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued | running | done | failed
+    created_at: dt.datetime = field(default_factory=lambda: dt.datetime.now(dt.timezone.utc))
+    started_at: Optional[dt.datetime] = None
+    finished_at: Optional[dt.datetime] = None
+    discovered: int = 0
+    indexed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    error: Optional[str] = None
+    _pending: int = 0
+    _parsed: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+
+class IngestWorker:
+    """
+    Pipeline de ingesta en hilos con colas acotadas. 'parse_fn' y 'pipeline' son
+    inyectables (tests / otras fuentes o etapas).
+    """
+
+    def __init__(
+        self,
+        queue_size: int = INGEST_QUEUE_SIZE,
+        fetch_workers: int = INGEST_FETCH_WORKERS,
+        batch_size: int = INGEST_BATCH_SIZE,
+        batch_wait: float = INGEST_BATCH_WAIT,
+        parse_fn: Optional[Callable[[str], Any]] = None,
+        pipeline: Optional[Pipeline] = None,
+        on_indexed: Optional[Callable[[int], None]] = None,
+        jobs_dir: str = INGEST_JOBS_DIR,
+    ):
+        if parse_fn is None:
+            import feedparser  # type: ignore[import-untyped]
+
+            parse_fn = feedparser.parse
+        self._parse = parse_fn
+        # Concurrencia de fetch = hilos de la fase "item"; cada hilo descarga de a uno
+        self.pipeline = pipeline or default_pipeline(fetch_concurrency=1, sink_batch=batch_size)
+        self._on_indexed = on_indexed
+        self.fetch_workers = max(1, fetch_workers)
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self._feeds: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._items: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._docs: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self.jobs_dir = jobs_dir
+        if jobs_dir:
+            os.makedirs(jobs_dir, exist_ok=True)
+            self._prune_job_files()
+
+    # ---- ciclo de vida -----------------------------------------------------
+    def start(self) -> "IngestWorker":
+        if self._threads:
+            return self
+        targets = [self._feed_loop] + [self._extract_loop] * self.fetch_workers + [self._sink_loop]
+        for i, target in enumerate(targets):
+            t = threading.Thread(target=target, name=f"ingest-{target.__name__}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Drena las colas y detiene los hilos (en orden de etapa)."""
+        self._feeds.put(_STOP)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    # ---- API pública -------------------------------------------------------
+    def submit(self, feed_url: str, limit: int = 20, lang: Optional[str] = None) -> IngestJob:
+        """Encola un feed. Lanza queue.Full si la cola de feeds está llena (backpressure)."""
+        job = IngestJob(feed=feed_url, limit=limit, lang=lang)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > INGEST_JOB_HISTORY:
+                self._remove_job_file(self._jobs.popitem(last=False)[0])
+        try:
+            self._feeds.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise
+        self._persist(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado del job: en memoria si lo ejecuta este proceso, si no desde INGEST_JOBS_DIR."""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        path = self._job_path(job_id)
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def active_feeds(self) -> set:
+        with self._lock:
+            return {j.feed for j in self._jobs.values() if j.status in ("queued", "running")}
+
+    def depth(self) -> Dict[str, int]:
+        return {"feeds": self._feeds.qsize(), "items": self._items.qsize(), "docs": self._docs.qsize()}
+
+    # ---- contabilidad de jobs ----------------------------------------------
+    def _job_path(self, job_id: str) -> Optional[str]:
+        # Los ids son hex (uuid4): cualquier otra cosa no es un archivo de job
+        if not self.jobs_dir or not job_id.isalnum():
+            return None
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _persist(self, job: IngestJob) -> None:
+        path = self._job_path(job.id)
+        if path is None:
+            return
+        with self._lock:
+            data = json.dumps(job.to_dict(), default=str)
+        try:
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            log.debug("No se pudo guardar el estado del job %s: %s", job.id, e)
+
+    def _remove_job_file(self, job_id: str) -> None:
+        path = self._job_path(job_id)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    def _prune_job_files(self) -> None:
+        cutoff = time.time() - INGEST_JOB_TTL
+        for name in os.listdir(self.jobs_dir):
+            path = os.path.join(self.jobs_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _settle(self, job: IngestJob, indexed: int = 0, skipped: int = 0, failed: int = 0) -> None:
+        with self._lock:
+            job.indexed += indexed
+            job.skipped += skipped
+            job.failed += failed
+            job._pending -= indexed + skipped + failed
+            if job._parsed and job._pending <= 0 and job.status == "running":
+                job.status = "done"
+                job.finished_at = dt.datetime.now(dt.timezone.utc)
+        self._persist(job)
+
+    # ---- etapas ------------------------------------------------------------
+    def _feed_loop(self) -> None:
+        while True:
+            job = self._feeds.get()
+            if job is _STOP:
+                for _ in range(self.fetch_workers):
+                    self._items.put(_STOP)
+                return
+            job.status = "running"
+            job.started_at = dt.datetime.now(dt.timezone.utc)
+            self._persist(job)
+            try:
+                self._fetch(job)
+            except Exception as e:
+                log.warning("Fallo leyendo feed %s: %s", job.feed, e)
+                with self._lock:
+                    job.error = str(e)
+                    job.status = "failed"
+                    job.finished_at = dt.datetime.now(dt.timezone.utc)
+                self._persist(job)
+
+    def _fetch(self, job: IngestJob) -> None:
+        docs = parse_entries(self._parse(job.feed), job.feed, limit=job.limit, lang=job.lang)
+        docs = self.pipeline.run(docs, phase="prepare")
+        with self._lock:
+            job.discovered += len(docs)
+            job._pending += len(docs)
+        for doc in docs:
+            self._items.put((job, doc))  # bloquea si la fase "item" va atrasada
+        with self._lock:
+            job._parsed = True
+        self._settle(job)
+
+    def _extract_loop(self) -> None:
+        while True:
+            msg = self._items.get()
+            if msg is _STOP:
+                self._docs.put(_STOP)
+                return
+            job, doc = msg
+            try:
+                out = self.pipeline.run([doc], phase="item")
+            except Exception as e:
+                log.debug("Fallo procesando %s: %s", doc.get("url"), e)
+                out = []
+            if not out:
+                self._settle(job, skipped=1)
+                continue
+            self._docs.put((job, out[0]))  # bloquea si embed/upsert va atrasado
+
+    def _sink_loop(self) -> None:
+        stops = 0
+        while stops < self.fetch_workers:
+            batch: List[tuple] = []
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    msg = self._docs.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if msg is _STOP:
+                    stops += 1
+                    if stops >= self.fetch_workers:
+                        break
+                    continue
+                batch.append(msg)
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: List[tuple]) -> None:
+        """
+        Etapas sink sobre el lote (run_sink): cuenta como indexados sólo los escritos,
+        como fallidos los de lotes con error y como omitidos los descartados por una
+        etapa (near_dup en modo 'drop'). Las etapas devuelven los mismos dicts.
+        """
+        written, failed = self.pipeline.run_sink([d for _, d in batch])
+        ok, bad = {id(d) for d in written}, {id(d) for d in failed}
+        counts: Dict[str, list] = {}
+        for job, d in batch:
+            c = counts.setdefault(job.id, [job, 0, 0, 0])
+            c[1 if id(d) in ok else 3 if id(d) in bad else 2] += 1
+        for job, indexed, skipped, n_failed in counts.values():
+            self._settle(job, indexed=indexed, skipped=skipped, failed=n_failed)
+        if written and self._on_indexed:
+            self._on_indexed(len(written))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Tiempos/conteos por etapa del pipeline."""
+        return self.pipeline.stats()
+
+
+class FeedScheduler:
+    """Programa cada feed con su intervalo ± jitter; no re-encola un feed con job activo."""
+
+    def __init__(self, worker: IngestWorker, feeds: List[FeedSpec], jitter: float = INGEST_JITTER):
+        self.worker = worker
+        self.feeds = feeds
+        self.jitter = jitter
+        now = time.monotonic()
+        # Arranque escalonado para no consultar todos los feeds a la vez
+        self._next = {f.url: now + random.uniform(0, f.interval * jitter) for f in feeds}
+        self._stop = threading.Event()
+
+    def _delay(self, f: FeedSpec) -> float:
+        return f.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def run_once(self) -> List[IngestJob]:
+        """Encola todos los feeds ahora (una pasada)."""
+        return [self.worker.submit(f.url, limit=f.limit, lang=f.lang) for f in self.feeds]
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            now = time.monotonic()
+            active = self.worker.active_feeds()
+            for f in self.feeds:
+                if self._next[f.url] > now:
+                    continue
+                if f.url in active:
+                    self._next[f.url] = now + self._delay(f) / 4
+                    continue
+                try:
+                    self.worker.submit(f.url, limit=f.limit, lang=f.lang)
+                    self._next[f.url] = now + self._delay(f)
+                except queue.Full:
+                    self._next[f.url] = now + 5.0
+            wake = min(self._next.values(), default=now + 60)
+            self._stop.wait(max(0.5, wake - time.monotonic()))
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Worker de ingesta programada multi-feed.")
+    parser.add_argument("--registry", default=FEED_REGISTRY, help="Ruta al registro JSON de feeds")
+    parser.add_argument("--once", action="store_true", help="Una pasada por todos los feeds y salir")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv("APP_LOG_LEVEL", "INFO"))
+
+    feeds = load_registry(args.registry)
+    worker = IngestWorker().start()
+    scheduler = FeedScheduler(worker, feeds)
+    log.info("Worker de ingesta: %d feeds", len(feeds))
+    if args.once:
+        jobs = scheduler.run_once()
+        worker.stop(timeout=3600)
+        for j in jobs:
+            print(json.dumps(j.to_dict(), default=str))
+        return 0
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        worker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
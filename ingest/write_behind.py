@@ -0,0 +1,409 @@
+"""
+Buffer write-behind para POST /index (un artículo por llamada).
+
+Con INDEX_WRITE_BEHIND=1 el endpoint no embebe ni escribe: anota el documento en un
+journal local (append + fsync) y lo deja en un buffer en memoria; un hilo lo vacía por
+tamaño (INDEX_WB_BATCH_SIZE) o por tiempo (INDEX_WB_MAX_WAIT) con un solo index_many
+(embedding por lotes + un upsert). El productor recibe 202 apenas el journal es durable.
+
+- Coalescencia: el buffer está indexado por URL; re-enviar una URL pendiente reemplaza
+  la versión anterior (se escribe sólo la última).
+- Journal (INDEX_WB_JOURNAL, vacío = sin durabilidad): segmentos JSONL "seg-<seq>.jsonl"
+  + 'checkpoint' con el último seq escrito en Qdrant. Al arrancar se re-encola todo lo
+  posterior al checkpoint; los segmentos ya confirmados se borran. Un crash entre el
+  upsert y el checkpoint re-indexa el lote: es idempotente (IDs deterministas por URL).
+- Multi-worker (uvicorn --workers / api.serve): cada proceso toma un slot libre del
+  directorio ("slot-N", con flock); un worker relanzado hereda y reproduce el del caído.
+  Al arrancar además adopta los slots huérfanos (sin flock) con pendientes, p. ej. si
+  bajó la cantidad de workers: copia sus registros a su propio journal y los confirma.
+- Si el upsert falla, el lote vuelve al frente del buffer y se reintenta con backoff;
+  con el buffer lleno (INDEX_WB_MAX_PENDING) submit lanza queue.Full (503).
+
+Métricas: index_buffer_pending, index_buffer_lag_seconds (edad del más viejo sin
+escribir), index_buffer_flush_seconds, index_buffer_flush_docs, index_buffer_flush_errors_total.
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+log = logging.getLogger(__name__)
+
+INDEX_WRITE_BEHIND = os.getenv("INDEX_WRITE_BEHIND", "0").strip().lower() in ("1", "true", "yes", "on")
+INDEX_WB_BATCH_SIZE = int(os.getenv("INDEX_WB_BATCH_SIZE", "64"))
+INDEX_WB_MAX_WAIT = float(os.getenv("INDEX_WB_MAX_WAIT", "1.0"))
+INDEX_WB_MAX_PENDING = int(os.getenv("INDEX_WB_MAX_PENDING", "10000"))
+INDEX_WB_JOURNAL = os.getenv("INDEX_WB_JOURNAL", "./index_journal").strip()
+INDEX_WB_FSYNC = os.getenv("INDEX_WB_FSYNC", "1").strip().lower() in ("1", "true", "yes", "on")
+INDEX_WB_SEGMENT_BYTES = int(os.getenv("INDEX_WB_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+INDEX_WB_MAX_BACKOFF = float(os.getenv("INDEX_WB_MAX_BACKOFF", "30"))
+
+BUFFER_PENDING = Gauge("index_buffer_pending", "Documentos aceptados por /index aún no escritos")
+BUFFER_LAG = Gauge("index_buffer_lag_seconds", "Edad del documento pendiente más antiguo")
+BUFFER_FLUSH_SECONDS = Histogram("index_buffer_flush_seconds", "Duración de cada vaciado del buffer")
+BUFFER_FLUSH_DOCS = Histogram(
+    "index_buffer_flush_docs", "Documentos por vaciado del buffer", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+BUFFER_FLUSH_ERRORS = Counter("index_buffer_flush_errors_total", "Vaciados del buffer fallidos")
+
+_SLOTS = 64
+
+
+# -----------------------------------
+# Journal (segmentos JSONL + checkpoint)
+# -----------------------------------
+class Journal:
+    """Log append-only de documentos aceptados; 'commit(seq)' marca lo ya escrito en Qdrant."""
+
+    def __init__(self, root: str, fsync: bool = INDEX_WB_FSYNC, segment_bytes: int = INDEX_WB_SEGMENT_BYTES):
+        self.root, self.fsync, self.segment_bytes = root, fsync, segment_bytes
+        os.makedirs(root, exist_ok=True)
+        self._ckpt_path = os.path.join(root, "checkpoint")
+        self.committed = 0
+        if os.path.exists(self._ckpt_path):
+            with open(self._ckpt_path, encoding="utf-8") as f:
+                self.committed = int(f.read().strip() or 0)
+        self.last_seq = self.committed
+        self._segment: Optional[Any] = None
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        out = []
+        for name in os.listdir(self.root):
+            if name.startswith("seg-") and name.endswith(".jsonl"):
+                out.append((int(name[4:-6]), os.path.join(self.root, name)))
+        return sorted(out)
+
+    def recover(self) -> List[Tuple[int, float, Dict]]:
+        """(seq, aceptado, doc) posteriores al checkpoint, en orden (descarta una línea final truncada)."""
+        out: List[Tuple[int, float, Dict]] = []
+        for _, path in self._segments():
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.last_seq = max(self.last_seq, rec["seq"])
+                    if rec["seq"] > self.committed:
+                        out.append((rec["seq"], rec.get("ts", 0.0), rec["doc"]))
+        return out
+
+    def append(self, doc: Dict, ts: Optional[float] = None) -> int:
+        """Escribe el documento (fsync si INDEX_WB_FSYNC) y devuelve su seq. No es thread-safe."""
+        seq = self.last_seq + 1
+        ts = time.time() if ts is None else ts
+        if self._segment is None or self._segment.tell() >= self.segment_bytes:
+            if self._segment is not None:
+                self._segment.close()
+            self._segment = open(os.path.join(self.root, f"seg-{seq:020d}.jsonl"), "ab")
+        self._segment.write(json.dumps({"seq": seq, "ts": ts, "doc": doc}, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+        self._segment.flush()
+        if self.fsync:
+            os.fsync(self._segment.fileno())
+        self.last_seq = seq
+        return seq
+
+    def commit(self, seq: int) -> None:
+        """Persiste el checkpoint y borra los segmentos cerrados ya confirmados."""
+        if seq <= self.committed:
+            return
+        tmp = f"{self._ckpt_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(seq))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._ckpt_path)
+        self.committed = seq
+        current = self._segment.name if self._segment is not None else None
+        segments = self._segments()
+        for (_, path), nxt in zip(segments, [*segments[1:], (None, None)], strict=True):
+            last = (nxt[0] - 1) if nxt[0] is not None else self.last_seq
+            if path != current and last <= seq:
+                os.remove(path)
+
+    def close(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+
+def _try_lock(path: str) -> Optional[Any]:
+    """flock exclusivo no bloqueante sobre 'path/LOCK' (None si otro proceso lo tiene)."""
+    lock = open(os.path.join(path, "LOCK"), "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def claim_slot(root: str, slots: int = _SLOTS) -> Tuple[str, Any]:
+    """Primer 'root/slot-N' libre (flock exclusivo mientras viva el proceso)."""
+    os.makedirs(root, exist_ok=True)
+    for i in range(slots):
+        path = os.path.join(root, f"slot-{i}")
+        os.makedirs(path, exist_ok=True)
+        lock = _try_lock(path)
+        if lock is not None:
+            return path, lock
+    raise RuntimeError(f"Sin slots libres de journal en {root}")
+
+
+def orphan_slots(root: str, own: str) -> List[Tuple[str, Any]]:
+    """Slots de 'root' sin dueño vivo (distintos de 'own'), con su flock ya tomado."""
+    out = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not name.startswith("slot-") or path == own or not os.path.isdir(path):
+            continue
+        lock = _try_lock(path)
+        if lock is not None:
+            out.append((path, lock))
+    return out
+
+
+# -----------------------------------
+# Buffer write-behind
+# -----------------------------------
+class WriteBehindBuffer:
+    """
+    Acepta documentos de a uno y los escribe por lotes en un hilo. 'flush_fn' recibe la
+    lista de documentos (default: api.service.index_many) y es inyectable en tests.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Optional[Callable[[List[Dict]], Any]] = None,
+        journal_dir: str = INDEX_WB_JOURNAL,
+        batch_size: int = INDEX_WB_BATCH_SIZE,
+        max_wait: float = INDEX_WB_MAX_WAIT,
+        max_pending: int = INDEX_WB_MAX_PENDING,
+        on_indexed: Optional[Callable[[int], None]] = None,
+    ):
+        if flush_fn is None:
+            from api.service import index_many
+
+            flush_fn = index_many
+        self._flush_fn = flush_fn
+        self._on_indexed = on_indexed
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self.max_pending = max(1, max_pending)
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[str, Tuple[int, Dict, float]]" = OrderedDict()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._seq = 0
+        self._flushed = 0
+        self._failures = 0
+        self._last_flush: Optional[float] = None
+        self._inflight = False
+        self._force = False
+
+        self.journal: Optional[Journal] = None
+        self._slot_lock = None
+        if journal_dir:
+            path, self._slot_lock = claim_slot(journal_dir)
+            self.journal = Journal(path)
+            recovered = self.journal.recover()
+            for seq, _, doc in recovered:
+                self._put(seq, doc)
+            self._seq = self.journal.last_seq
+            if recovered:
+                log.info("Journal %s: %d documentos pendientes re-encolados", path, len(self._pending))
+            accepted = {str(doc["url"]): ts for _, ts, doc in recovered if doc.get("url")}
+            self._adopt_orphans(self.journal, journal_dir, path, accepted)
+        self._update_gauges()
+
+    # ---- ciclo de vida -----------------------------------------------------
+    def start(self) -> "WriteBehindBuffer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="index-write-behind", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Vacía lo pendiente (hasta 'timeout') y detiene el hilo; el resto queda en el journal."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self.journal is not None:
+            self.journal.close()
+        if self._slot_lock is not None:
+            self._slot_lock.close()  # libera el flock del slot
+            self._slot_lock = None
+
+    # ---- API pública -------------------------------------------------------
+    def submit(self, doc: Dict) -> int:
+        """
+        Acepta un documento (durable en el journal al volver) y devuelve su seq.
+        Lanza queue.Full si hay INDEX_WB_MAX_PENDING documentos sin escribir.
+        """
+        with self._cond:
+            if len(self._pending) >= self.max_pending and str(doc.get("url", "")) not in self._pending:
+                raise queue.Full
+            if self.journal is not None:
+                seq = self.journal.append(doc)
+            else:
+                seq = self._seq + 1
+            self._seq = seq
+            self._put(seq, doc)
+            # El primero arma el temporizador del hilo; el lote lleno lo despierta ya
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        self._update_gauges()
+        return seq
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Espera a que el buffer quede vacío (True) o venza 'timeout' (False)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._force = True
+            self._cond.notify_all()
+            while self._pending or self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, 0.05))
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            lag = self._lag()
+            return {
+                "pending": len(self._pending),
+                "lag_seconds": lag,
+                "last_seq": self._seq,
+                "committed_seq": self.journal.committed if self.journal is not None else None,
+                "flushed": self._flushed,
+                "flush_failures": self._failures,
+                "seconds_since_flush": (time.monotonic() - self._last_flush) if self._last_flush else None,
+                "journal": self.journal.root if self.journal is not None else None,
+            }
+
+    # ---- internos ----------------------------------------------------------
+    def _adopt_orphans(self, journal: Journal, root: str, own: str, accepted: Dict[str, float]) -> None:
+        """
+        Re-encola lo pendiente en slots sin dueño (workers que ya no existen), por hora de
+        aceptación: una URL queda con su versión más nueva entre todos los slots ('accepted'
+        = URL -> hora de lo ya pendiente). Primero lo anota en el journal propio y recién
+        después confirma los huérfanos: un crash en el medio sólo re-indexa (idempotente).
+        """
+        slots = orphan_slots(root, own)
+        try:
+            orphans = [Journal(path, fsync=journal.fsync) for path, _ in slots]
+            records = sorted(
+                ((ts, seq, doc) for j in orphans for seq, ts, doc in j.recover()), key=lambda r: r[0]
+            )
+            for ts, _, doc in records:
+                url = str(doc.get("url") or "")
+                if url and accepted.get(url, -1.0) > ts:
+                    continue
+                if url:
+                    accepted[url] = ts
+                self._seq = journal.append(doc, ts=ts)
+                self._put(self._seq, doc)
+            for j in orphans:
+                j.commit(j.last_seq)
+            if records:
+                log.info("Journals huérfanos en %s: %d documentos adoptados", root, len(records))
+        finally:
+            for _, lock in slots:
+                lock.close()
+
+    def _put(self, seq: int, doc: Dict) -> None:
+        key = str(doc.get("url") or f"#{seq}")
+        self._pending.pop(key, None)
+        self._pending[key] = (seq, doc, time.monotonic())
+
+    def _lag(self) -> float:
+        if not self._pending:
+            return 0.0
+        return time.monotonic() - next(iter(self._pending.values()))[2]
+
+    def _update_gauges(self) -> None:
+        with self._cond:
+            BUFFER_PENDING.set(len(self._pending))
+            BUFFER_LAG.set(self._lag())
+
+    def _take(self) -> Optional[List[Tuple[str, Tuple[int, Dict, float]]]]:
+        """Espera a que toque vaciar (tamaño, tiempo o stop) y saca el lote más viejo."""
+        with self._cond:
+            while True:
+                if not self._pending:
+                    self._force = False
+                elif (
+                    len(self._pending) >= self.batch_size or self._lag() >= self.max_wait
+                    or self._force or self._stop.is_set()
+                ):
+                    break
+                if self._stop.is_set():
+                    return None
+                self._cond.wait(max(0.01, self.max_wait - self._lag()) if self._pending else None)
+            batch: List[Tuple[str, Tuple[int, Dict, float]]] = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.popitem(last=False))
+            self._inflight = True
+            return batch
+
+    def _requeue(self, batch: List[Tuple[str, Tuple[int, Dict, float]]]) -> None:
+        """Devuelve el lote fallido al frente, salvo las URLs re-enviadas mientras tanto."""
+        with self._cond:
+            for key, item in reversed(batch):
+                if key not in self._pending:
+                    self._pending[key] = item
+                    self._pending.move_to_end(key, last=False)
+
+    def _loop(self) -> None:
+        backoff = 0.0
+        while True:
+            batch = self._take()
+            if batch is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                self._flush_fn([doc for _, (_, doc, _) in batch])
+                ok = True
+            except Exception as e:
+                log.warning("Fallo escribiendo lote de %d docs del buffer: %s", len(batch), e)
+                ok = False
+            BUFFER_FLUSH_SECONDS.observe(time.perf_counter() - t0)
+            if ok:
+                BUFFER_FLUSH_DOCS.observe(len(batch))
+                with self._cond:
+                    # Todo lo anterior al pendiente más viejo ya está escrito (o reemplazado)
+                    oldest = next(iter(self._pending.values()))[0] if self._pending else self._seq + 1
+                    if self.journal is not None:
+                        self.journal.commit(oldest - 1)
+                    self._flushed += len(batch)
+                    self._last_flush = time.monotonic()
+                    self._inflight = False
+                    self._cond.notify_all()
+                if self._on_indexed:
+                    self._on_indexed(len(batch))
+                backoff = 0.0
+            else:
+                BUFFER_FLUSH_ERRORS.inc()
+                self._requeue(batch)
+                with self._cond:
+                    self._failures += 1
+                    self._inflight = False
+                    self._cond.notify_all()
+                backoff = min(INDEX_WB_MAX_BACKOFF, max(0.5, backoff * 2))
+                if self._stop.wait(backoff):
+                    self._update_gauges()
+                    return
+            self._update_gauges()
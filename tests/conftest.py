@@ -7,3 +7,42 @@ os.environ["MODEL_NAME"] = "sentence-transformers/paraphrase-multilingual-MiniLM
 # Qdrant cuando corren los tests en CI (service container localhost)
 os.environ.setdefault("QDRANT_HOST", "localhost")
 os.environ.setdefault("QDRANT_PORT", "6333")
+# Sin modelo TF-IDF compartido entre corridas (cada test ajusta el suyo)
+os.environ.setdefault("TFIDF_MODEL_PATH", "")
+
+import hashlib
+
+import numpy as np
+import pytest
+
+
+def hash_embed(texts, mode="query"):
+    """Embedding determinista bag-of-words (sin modelo): textos con palabras comunes se parecen."""
+    from clients.qdrant_client import VECTOR_SIZE
+
+    out = np.zeros((len(texts), VECTOR_SIZE), dtype=np.float32)
+    for i, t in enumerate(texts):
+        for w in t.lower().split():
+            h = int(hashlib.md5(w.encode("utf-8")).hexdigest(), 16)
+            out[i, h % VECTOR_SIZE] += 1.0
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return out / norms
+
+
+# Backend en proceso + embeddings deterministas: tests herméticos de service.
+# Corre contra Qdrant embebido (":memory:") y contra el índice NumPy (clients.embedded).
+@pytest.fixture(params=["qdrant", "embedded"])
+def memory_qdrant(request, monkeypatch):
+    from qdrant_client import QdrantClient
+
+    import clients.qdrant_client as qc
+    from api import service as S
+    from clients.embedded import EmbeddedClient
+
+    client = QdrantClient(":memory:") if request.param == "qdrant" else EmbeddedClient()
+    monkeypatch.setattr(qc, "get_client", lambda: client)
+    monkeypatch.setattr(S, "embed_texts", hash_embed)
+    monkeypatch.setattr(S, "embed_documents", hash_embed)
+    qc.ensure_collection()
+    return client
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from conftest import hash_embed
+from fastapi.testclient import TestClient
+
+from api import alerts as A
+from api import main as M
+from api import service as S
+
+DOCS = [
+    {"title": "Tasas", "url": "https://a.com/1", "source": "a", "content": "banco central sube tasas"},
+    {"title": "Liga", "url": "https://b.com/1", "source": "b", "content": "final de la liga"},
+]
+
+
+@pytest.fixture
+def alert_registry(tmp_path, monkeypatch):
+    reg = A.AlertRegistry(embed=hash_embed, path=str(tmp_path / "alerts.json"))
+    hub = A.AlertHub()
+    monkeypatch.setattr(A, "registry", lambda: reg)
+    monkeypatch.setattr(A, "hub", lambda: hub)
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    return reg
+
+
+def test_alerts_push_on_index(memory_qdrant, alert_registry, monkeypatch):
+    posted = []
+    monkeypatch.setattr(A, "_post_webhook", lambda url, body: posted.append((url, body)))
+    client = TestClient(M.app)
+    r = client.post("/alerts", json={"q": "banco central tasas", "threshold": 0.5, "webhook": "https://hooks.example/x"})
+    assert r.status_code == 201
+    alert = r.json()
+    client.post("/alerts", json={"q": "final de la liga", "threshold": 0.5, "source": "otra"})
+    assert len(client.get("/alerts").json()) == 2
+
+    sub = A.hub().subscribe()
+    S.index_many(DOCS)
+    m = sub.get_nowait()
+    assert (m["query_id"], m["url"]) == (alert["id"], "https://a.com/1")
+    # La de la liga no coincide por fuente
+    assert sub.empty()
+    A.hub()._pool.shutdown(wait=True)
+    assert posted[0][0] == "https://hooks.example/x" and posted[0][1]["matches"][0]["url"] == "https://a.com/1"
+
+    # Re-indexar el mismo artículo no vuelve a alertar
+    S.index_many(DOCS[:1])
+    assert sub.empty()
+
+    # Persistencia: el registro se recarga desde ALERTS_REGISTRY
+    assert [x.q for x in A.AlertRegistry(embed=hash_embed, path=alert_registry.path).list()] == [
+        "banco central tasas", "final de la liga",
+    ]
+    assert client.delete(f"/alerts/{alert['id']}").status_code == 204
+    assert client.delete(f"/alerts/{alert['id']}").status_code == 404
+
+
+def test_match_is_one_matmul_over_passages(alert_registry):
+    from qdrant_client.http import models as qm
+
+    alert_registry.add(A.StandingQuery(q="liga gol", threshold=0.6))
+    vec = hash_embed(["liga gol", "banco central"])
+    points = [
+        qm.PointStruct(id="00000000-0000-0000-0000-000000000001", vector=vec[1].tolist(),
+                       payload={"url": "https://x/1", "title": "T", "chunk_index": 0, "parent_id": "00000000-0000-0000-0000-000000000001"}),
+        qm.PointStruct(id="00000000-0000-0000-0000-000000000002", vector=vec[0].tolist(),
+                       payload={"url": "https://x/1", "chunk_index": 1, "parent_id": "00000000-0000-0000-0000-000000000001"}),
+    ]
+    matches = alert_registry.match(points)
+    assert len(matches) == 1 and matches[0]["title"] == "T" and matches[0]["score"] > 0.99
+
+
+def test_sse_events_format(alert_registry):
+    sub = A.hub().subscribe()
+    sub.put({"query_id": "x", "q": "q", "url": "https://a/1"})
+    sub.put({"query_id": "y", "q": "q", "url": "https://a/2"})
+    sub.put(None)
+    events = list(M._sse_events(sub, query_id="x", heartbeat=0.01))
+    assert events == ['event: alert\ndata: ' + json.dumps({"query_id": "x", "q": "q", "url": "https://a/1"}) + "\n\n"]
+    assert sub not in A.hub()._subscribers
+
+
+# Dos workers con el mismo ALERTS_REGISTRY: ninguno pisa las altas del otro y ambos las evalúan
+def test_registry_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "alerts.json")
+    w1 = A.AlertRegistry(embed=hash_embed, path=path)
+    w2 = A.AlertRegistry(embed=hash_embed, path=path)
+    a = w1.add(A.StandingQuery(q="banco central", threshold=0.5))
+    b = w2.add(A.StandingQuery(q="final de la liga", threshold=0.5))
+    assert [x.id for x in w1.list()] == [a.id, b.id] == [x.id for x in w2.list()]
+
+    from qdrant_client.http import models as qm
+    point = qm.PointStruct(id=1, vector=hash_embed(["final de la liga"])[0].tolist(),
+                           payload={"url": "https://x/1", "title": "Liga"})
+    assert [m["query_id"] for m in w1.match([point])] == [b.id]
+
+    assert w1.remove(b.id) and not w2.remove(b.id)
+    assert [x.id for x in w2.list()] == [a.id]
@@ -0,0 +1,25 @@
+import clients.qdrant_client as qc
+from bench.corpus import make_corpus, make_queries
+from bench.run import compare, run_benchmarks, summarize
+
+
+def test_corpus_is_deterministic():
+    a, b = make_corpus(20, seed=1), make_corpus(20, seed=1)
+    assert a == b
+    assert len({d["url"] for d in a}) == 20
+    assert len(make_queries(5)) == 5
+
+
+def test_summarize_and_compare():
+    s = summarize([0.01] * 9 + [0.1], docs=10)
+    assert s["p50_ms"] == 10.0 and s["p99_ms"] > s["p95_ms"] > s["p50_ms"]
+    base = {"scenarios": {"x": {"p95_ms": 10.0, "docs_per_sec": 100.0}}}
+    assert compare({"scenarios": {"x": {"p95_ms": 11.0, "docs_per_sec": 95.0}}}, base) == []
+    assert len(compare({"scenarios": {"x": {"p95_ms": 20.0, "docs_per_sec": 50.0}}}, base)) == 2
+
+
+def test_run_benchmarks_small(memory_qdrant):
+    res = run_benchmarks(["search", "storyline"], docs=40, repeat=2, embedder="hash")
+    assert {"search_k10", "search_k50", "storyline_k20"} <= set(res["scenarios"])
+    assert res["scenarios"]["search_k10"]["n"] == 2
+    assert memory_qdrant.count(collection_name=qc.COLLECTION).count > 0
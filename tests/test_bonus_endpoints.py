@@ -22,7 +22,7 @@ def test_perspective_basic(monkeypatch):
         {"title":"Positivo avance","url":"http://a/1","source":"foo","content":"beneficio mejora avance","published_at":"2024-01-02T00:00:00"},
         {"title":"Riesgo y caída","url":"http://a/2","source":"bar","content":"crisis caída riesgo","published_at":"2024-01-03T00:00:00"},
     ]
-    monkeypatch.setattr(S, "get_topn_for_query", lambda q, k=20, **f: fake_docs)
+    monkeypatch.setattr(S, "_topn_by_source", lambda q, **f: fake_docs)
     res = build_perspective("tema", k=2)
     assert res.query == "tema"
     assert {s.source for s in res.sources} == {"foo","bar"}
@@ -0,0 +1,38 @@
+from api import service as S
+from embedding.chunking import chunk_text, length_sorted_order
+
+
+def test_chunk_text_overlap():
+    words = " ".join(f"w{i}" for i in range(10))
+    chunks = chunk_text(words, max_tokens=4, overlap=1)
+    assert chunks[0] == "w0 w1 w2 w3"
+    assert chunks[1].startswith("w3")
+    assert chunks[-1].endswith("w9")
+    assert chunk_text("corto", max_tokens=4) == ["corto"]
+
+
+def test_length_sorted_order():
+    assert length_sorted_order(["a b c", "a", "a b"]) == [1, 2, 0]
+
+
+# Artículo largo -> varios pasajes; la búsqueda devuelve el artículo una sola vez con su contenido
+def test_chunked_index_and_collapse(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(S, "CHUNK_MAX_TOKENS", 5)
+    monkeypatch.setattr(S, "CHUNK_OVERLAP", 0)
+    content = "inflación precios mercado " + " ".join(f"relleno{i}" for i in range(12)) + " elecciones congreso"
+    S.index_one({"title": "Economía", "url": "https://x/largo", "source": "s", "content": content})
+    S.index_one({"title": "Deportes", "url": "https://x/corto", "source": "s", "content": "fútbol gol"})
+
+    points, _ = memory_qdrant.scroll("news", limit=100, with_payload=True)
+    assert len(points) == 5  # 4 pasajes + 1 artículo corto
+
+    res = S.search_query("elecciones congreso", k=2)
+    urls = [r["url"] for r in res]
+    assert urls[0] == "https://x/largo"
+    assert len(set(urls)) == len(urls)
+    assert res[0]["content"] == content
+
+    # Re-indexar más corto elimina pasajes huérfanos
+    S.index_one({"title": "Economía", "url": "https://x/largo", "source": "s", "content": "breve"})
+    points, _ = memory_qdrant.scroll("news", limit=100, with_payload=True)
+    assert len(points) == 2
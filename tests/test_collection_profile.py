@@ -0,0 +1,38 @@
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qm
+
+import clients.qdrant_client as qc
+
+
+# Perfil por defecto = comportamiento histórico (sin cuantización ni SearchParams)
+def test_default_profile_is_backward_compatible(monkeypatch):
+    monkeypatch.delenv("QDRANT_QUANTIZATION", raising=False)
+    p = qc.collection_profile("default")
+    assert p["quantization"] == "none"
+    assert p["indexing_threshold"] == 20000
+    assert qc.quantization_config(p) is None
+    assert qc.default_search_params(p) is None
+
+
+# Los overrides por env se aplican sobre el preset
+def test_env_overrides_profile(monkeypatch):
+    monkeypatch.setenv("QDRANT_HNSW_M", "32")
+    monkeypatch.setenv("QDRANT_SEARCH_EF", "64")
+    monkeypatch.setenv("QDRANT_QUANTIZATION_OVERSAMPLING", "1.5")
+    p = qc.collection_profile("compact")
+    assert qc.hnsw_config(p).m == 32
+    sp = qc.default_search_params(p)
+    assert sp.hnsw_ef == 64
+    assert sp.quantization.rescore is True
+    assert sp.quantization.oversampling == 1.5
+    q = qc.quantization_config(p)
+    assert isinstance(q, qm.ScalarQuantization)
+    assert q.scalar.type == qm.ScalarType.INT8
+
+
+def test_create_collection_with_profile():
+    c = QdrantClient(":memory:")
+    qc.create_collection(c, "news_profile", qc.collection_profile("compact"))
+    params = c.get_collection("news_profile").config.params
+    assert params.vectors.size == qc.VECTOR_SIZE
+    assert params.vectors.on_disk is True
@@ -0,0 +1,123 @@
+import importlib.util
+
+import pytest
+from fastapi.testclient import TestClient
+
+import clients.qdrant_client as qc
+from api import main as M
+from api import service as S
+from clients import content_store as CS
+
+_DOCS = [
+    {"title": "Tasas", "url": "https://a.com/1", "source": "a", "content": "banco central sube tasas " * 40},
+    {"title": "Liga", "url": "https://b.com/1", "source": "b", "content": "final de la liga de fútbol"},
+]
+
+
+def test_file_store_roundtrip_and_reopen(tmp_path):
+    store = CS.FileContentStore(str(tmp_path), codec="zlib")
+    store.put_many([("1", "hola"), ("2", "ñandú " * 100)])
+    store.put_many([("1", "hola de nuevo")])  # la última escritura gana
+    assert store.get("1") == "hola de nuevo" and store.get("2") == "ñandú " * 100
+    assert store.get("3") is None
+
+    # Otra instancia (otro proceso) relee el índice del disco
+    other = CS.FileContentStore(str(tmp_path), codec="zlib")
+    assert len(other) == 2 and other.get("1") == "hola de nuevo"
+    store.put_many([("3", "nuevo")])
+    assert other.get("3") == "nuevo"
+
+
+def test_file_store_skips_unchanged_content(tmp_path):
+    store = CS.FileContentStore(str(tmp_path), codec="zlib")
+    data = tmp_path / "content.bin"
+    store.put_many([("1", "hola"), ("2", "chau")])
+    size = data.stat().st_size
+    store.put_many([("1", "hola"), ("2", "chau")])
+    assert data.stat().st_size == size
+    store.put_many([("1", "hola de nuevo"), ("2", "chau")])
+    assert data.stat().st_size > size and store.get("1") == "hola de nuevo" and store.get("2") == "chau"
+
+    # Índices viejos de 4 columnas (sin hash) siguen leyéndose; su id se reescribe una vez
+    legacy = tmp_path / "legacy"
+    legacy.mkdir()
+    (legacy / "content.bin").write_bytes(CS.compress("viejo", "zlib"))
+    (legacy / "index.tsv").write_text(f"9\t0\t{len(CS.compress('viejo', 'zlib'))}\tzlib\n")
+    old = CS.FileContentStore(str(legacy), codec="zlib")
+    assert old.get("9") == "viejo"
+    old.put_many([("9", "viejo")])
+    size = (legacy / "content.bin").stat().st_size
+    old.put_many([("9", "viejo")])
+    assert (legacy / "content.bin").stat().st_size == size
+
+
+def test_file_mode_packs_only_written_docs(memory_qdrant, monkeypatch, tmp_path):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "drop")
+    monkeypatch.setattr(CS, "CONTENT_STORE", "file")
+    monkeypatch.setattr(CS, "CONTENT_CODEC", "zlib")
+    monkeypatch.setattr(CS, "CONTENT_STORE_PATH", str(tmp_path))
+    CS.file_store.cache_clear()
+    try:
+        data = tmp_path / "content.bin"
+        assert S.index_many([dict(_DOCS[0])]) == 1
+        size = data.stat().st_size
+        # Re-ingesta del mismo texto y casi-duplicado descartado: nada nuevo en content.bin
+        assert S.index_many([dict(_DOCS[0])]) == 1
+        assert S.index_many([{**_DOCS[0], "url": "https://copia.com/1"}]) == 0
+        assert data.stat().st_size == size
+        assert len(CS.file_store()) == 1
+    finally:
+        CS.file_store.cache_clear()
+
+
+@pytest.mark.skipif(importlib.util.find_spec("zstandard") is None, reason="zstandard no instalado")
+def test_zstd_codec():
+    blob = CS.compress("texto " * 50, "zstd")
+    assert CS.decompress(blob, "zstd") == "texto " * 50
+
+
+@pytest.mark.parametrize("mode", ["compressed", "file"])
+def test_packed_content_is_lazy(memory_qdrant, monkeypatch, tmp_path, mode):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    monkeypatch.setattr(CS, "CONTENT_STORE", mode)
+    monkeypatch.setattr(CS, "CONTENT_CODEC", "zlib")
+    monkeypatch.setattr(CS, "CONTENT_STORE_PATH", str(tmp_path))
+    CS.file_store.cache_clear()
+    try:
+        S.index_many([dict(d) for d in _DOCS])
+
+        raw = {r.payload["url"]: r.payload for r in qc.retrieve([S._id_from_url(d["url"]) for d in _DOCS])}
+        head = raw["https://a.com/1"]
+        assert "content" not in head and head["snippet"] == _DOCS[0]["content"][:CS.SNIPPET_CHARS]
+        assert head["content_len"] == len(_DOCS[0]["content"])
+        assert ("content_z" in head) == (mode == "compressed")
+
+        # Búsqueda: sólo snippet, sin descomprimir
+        unpacked = []
+        real_unpack = CS.unpack
+        monkeypatch.setattr(CS, "unpack", lambda *a: unpacked.append(a) or real_unpack(*a))
+        rows = S.search_query("banco central", k=2)
+        assert rows[0]["url"] == "https://a.com/1" and rows[0]["content"] is None
+        assert rows[0]["snippet"] == head["snippet"] and unpacked == []
+
+        # Builders y /doc: contenido completo
+        docs = S.get_topn_for_query("banco central", k=2, score_threshold=0.0)
+        assert {d["url"]: d["content"] for d in docs} == {d["url"]: d["content"] for d in _DOCS}
+        assert all("_packed" not in d for d in docs)
+
+        client = TestClient(M.app)
+        r = client.get("/doc", params={"url": "https://b.com/1"})
+        assert r.status_code == 200 and r.json()["content"] == _DOCS[1]["content"]
+        r = client.post("/docs", json={"urls": ["https://a.com/1"], "fields": ["title", "content"]})
+        assert r.json() == [{"title": "Tasas", "content": _DOCS[0]["content"]}]
+    finally:
+        CS.file_store.cache_clear()
+
+
+def test_unpack_reads_every_format():
+    item = {"content": "hola"}
+    CS.pack_many([("x", item)], mode="payload")
+    assert item == {"content": "hola"} and CS.unpack("x", item) == "hola"
+    CS.pack_many([("x", item)], mode="compressed")
+    assert "content" not in item and CS.unpack("x", item) == "hola"
+    assert CS.unpacked_payload("x", item) == {"snippet": "hola", "content_len": 4, "content": "hola"}
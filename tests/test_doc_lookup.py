@@ -0,0 +1,34 @@
+from conftest import hash_embed
+from fastapi.testclient import TestClient
+
+import clients.qdrant_client as qc
+from api import main as M
+from api import service as S
+
+
+def test_doc_lookup_by_id_with_legacy_fallback(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    S.index_many([
+        {"title": "Tasas", "url": "https://a.com/1", "source": "a", "content": "banco central sube tasas"},
+        {"title": "Liga", "url": "https://b.com/1", "source": "b", "content": "final de la liga"},
+    ])
+    # Punto legacy: ID aleatorio, sólo encontrable por payload.url
+    qc.upsert_article(None, hash_embed(["viejo"])[0].tolist(),
+                      {"title": "Viejo", "url": "https://c.com/1", "source": "c", "content": "nota vieja"})
+
+    scrolls = []
+    real_scroll = S._docs_by_url_scroll
+    monkeypatch.setattr(S, "_docs_by_url_scroll", lambda *a, **kw: scrolls.append(a) or real_scroll(*a, **kw))
+
+    client = TestClient(M.app)
+    r = client.get("/doc", params={"url": "https://a.com/1", "max_chars": 5})
+    assert r.status_code == 200 and r.json()["content"] == "banco"
+    assert scrolls == []
+
+    assert client.get("/doc", params={"url": "https://c.com/1"}).json()["title"] == "Viejo"
+    assert client.get("/doc", params={"url": "https://x.com/1"}).status_code == 404
+
+    r = client.post("/docs", json={
+        "urls": ["https://b.com/1", "https://x.com/1", "https://c.com/1"], "fields": ["title", "source"],
+    })
+    assert r.json() == [{"title": "Liga", "source": "b"}, None, {"title": "Viejo", "source": "c"}]
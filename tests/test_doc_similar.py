@@ -0,0 +1,54 @@
+from conftest import hash_embed
+from fastapi.testclient import TestClient
+
+import clients.qdrant_client as qc
+from api import main as M
+from api import service as S
+
+DOCS = [
+    {"title": "Tasas", "url": "https://a.com/1", "source": "a", "content": "banco central sube tasas de interés"},
+    {"title": "Tasas 2", "url": "https://b.com/1", "source": "b", "content": "banco central baja tasas de interés"},
+    {"title": "Dólar", "url": "https://a.com/2", "source": "a", "content": "banco central interviene el dólar"},
+    {"title": "Liga", "url": "https://b.com/2", "source": "b", "content": "final de la liga con gol agónico"},
+]
+
+
+def test_doc_similar_uses_stored_vectors(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    S.index_many(DOCS)
+    # Punto legacy: ID aleatorio, sólo encontrable por payload.url
+    qc.upsert_article(None, hash_embed(["liga gol"])[0].tolist(),
+                      {"title": "Viejo", "url": "https://c.com/1", "source": "c", "content": "liga gol"})
+
+    def _no_model(*a, **kw):
+        raise AssertionError("no debe embeber")
+    monkeypatch.setattr(S, "embed_texts", _no_model)
+    monkeypatch.setattr(S, "embed_documents", _no_model)
+
+    client = TestClient(M.app)
+    r = client.get("/doc/similar", params={"url": "https://a.com/1", "k": 3})
+    assert r.status_code == 200
+    urls = [x["url"] for x in r.json()]
+    assert "https://a.com/1" not in urls
+    assert urls[0] == "https://b.com/1"
+
+    r = client.get("/doc/similar", params={"url": "https://a.com/1", "source": "a"})
+    assert [x["url"] for x in r.json()] == ["https://a.com/2"]
+
+    r = client.get("/doc/similar", params={"url": "https://c.com/1", "k": 1})
+    assert [x["url"] for x in r.json()] == ["https://b.com/2"]
+
+    assert client.get("/doc/similar", params={"url": "https://x.com/1"}).status_code == 404
+
+
+def test_doc_similar_negative_and_strategies(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    S.index_many(DOCS)
+
+    for strategy in ("average_vector", "best_score", "sum_scores"):
+        rows = S.similar_docs("https://a.com/1", k=4, negative_urls=["https://b.com/1"], strategy=strategy)
+        urls = [x["url"] for x in rows]
+        assert "https://a.com/1" not in urls and "https://b.com/1" not in urls
+
+    rows = S.similar_docs("https://a.com/1", k=2, diversify=True, mmr_lambda=0.3)
+    assert len(rows) == 2
@@ -0,0 +1,179 @@
+import datetime as dt
+import multiprocessing
+
+import numpy as np
+import pytest
+from qdrant_client.http import models as qm
+
+from clients.embedded import EmbeddedClient
+
+
+def _client(path=None, n=20, dim=8):
+    c = EmbeddedClient(path)
+    c.create_collection("news", vectors_config=qm.VectorParams(size=dim, distance=qm.Distance.COSINE))
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(n, dim)).astype(np.float32)
+    c.upsert("news", points=[
+        qm.PointStruct(id=i, vector=vecs[i].tolist(), payload={
+            "title": f"Banco central nota {i}" if i % 2 else f"Liga final {i}",
+            "source": "a" if i < 10 else "b",
+            "published_at": dt.datetime(2025, 1, 1 + i, tzinfo=dt.timezone.utc),
+        })
+        for i in range(n)
+    ])
+    return c, vecs
+
+
+def test_exact_cosine_topk_and_filters():
+    c, vecs = _client()
+    q = vecs[3] + 0.01
+    expected = np.argsort(-(vecs / np.linalg.norm(vecs, axis=1, keepdims=True)) @ (q / np.linalg.norm(q)))[:5]
+    hits = c.query_points("news", query=q.tolist(), limit=5).points
+    assert [h.id for h in hits] == expected.tolist()
+    assert isinstance(hits[0].payload["published_at"], str)
+
+    flt = qm.Filter(
+        must=[
+            qm.FieldCondition(key="title", match=qm.MatchText(text="banco central")),
+            qm.FieldCondition(key="published_at", range=qm.DatetimeRange(gte=dt.datetime(2025, 1, 5))),
+        ],
+        must_not=[qm.FieldCondition(key="source", match=qm.MatchAny(any=["b"]))],
+    )
+    ids = {h.id for h in c.query_points("news", query=q.tolist(), query_filter=flt, limit=20).points}
+    assert ids == {5, 7, 9}
+    assert c.count("news", count_filter=flt).count == 3
+
+
+def test_scroll_delete_and_persistence(tmp_path):
+    c, _ = _client(str(tmp_path))
+    seen, offset = [], None
+    while True:
+        page, offset = c.scroll("news", limit=7, offset=offset)
+        seen.extend(r.id for r in page)
+        if offset is None:
+            break
+    assert seen == list(range(20))
+
+    c.delete("news", points_selector=qm.FilterSelector(
+        filter=qm.Filter(must=[qm.FieldCondition(key="source", match=qm.MatchValue(value="b"))])
+    ))
+    c.upsert("news", points=[qm.PointStruct(id=0, vector=[1.0] * 8, payload={"title": "nuevo"})])
+    c.update_collection_aliases(change_aliases_operations=[
+        qm.CreateAliasOperation(create_alias=qm.CreateAlias(collection_name="news", alias_name="live"))
+    ])
+
+    reopened = EmbeddedClient(str(tmp_path))
+    assert reopened.count("live").count == 10
+    rec = reopened.retrieve("live", ids=[0], with_vectors=True)[0]
+    assert rec.payload == {"title": "nuevo"}
+    assert np.allclose(rec.vector, [8 ** -0.5] * 8, atol=1e-6)
+
+
+def _filter_client():
+    c = EmbeddedClient()
+    c.create_collection("news", vectors_config=qm.VectorParams(size=2, distance=qm.Distance.COSINE))
+    head = "00000000-0000-0000-0000-000000000001"
+    other = "00000000-0000-0000-0000-000000000002"
+    rows = [
+        (head, {"title": "Banco central sube tasas", "source": "a", "url": "https://a/1",
+                "parent_id": head, "chunk_index": 0, "chunk_count": 2, "indexed_at": 100.0}),
+        ("00000000-0000-0000-0000-00000000000a", {"title": "Banco central sube tasas", "source": "a",
+                "url": "https://a/1", "parent_id": head, "chunk_index": 1, "chunk_count": 2, "indexed_at": 100.0}),
+        (other, {"title": "Final de la liga", "source": "b", "url": "https://b/1",
+                 "parent_id": other, "chunk_index": 0, "chunk_count": 1, "indexed_at": 200.0}),
+    ]
+    c.upsert("news", points=[qm.PointStruct(id=pid, vector=[1.0, 0.0], payload=p) for pid, p in rows])
+    return c, head, other
+
+
+# Cada filtro que arma el proyecto (service, qdrant_client, reindex) se evalúa en el backend embebido
+def test_every_project_filter_is_supported():
+    from api import service as S
+    from clients import qdrant_client as qc
+    from ingest import reindex as R
+
+    c, head, other = _filter_client()
+    passage = "00000000-0000-0000-0000-00000000000a"
+    FC, Range = qm.FieldCondition, qm.Range
+    no_passages = FC(key="chunk_index", range=Range(gt=0))
+    rec = [qm.Record(id=head, payload={"chunk_index": 0, "chunk_count": 1})]
+
+    cases = [
+        (S._query_filter("banco central", "a"), {head, passage}),
+        (S._query_filter(source="b"), {other}),
+        (qc.make_title_ft_filter("liga"), {other}),
+        (qc.combine_filters_and(qc.make_source_filter("a"), qc.make_title_ft_filter("tasas")), {head, passage}),
+        # near-duplicados, listados de artículos y /doc(s)
+        (qm.Filter(must_not=[qm.HasIdCondition(has_id=[head]), no_passages]), {other}),
+        (qm.Filter(must=[FC(key="url", match=qm.MatchAny(any=["https://b/1"]))], must_not=[no_passages]), {other}),
+        # /doc/similar y búsqueda por fuentes
+        (qm.Filter(must_not=[qm.HasIdCondition(has_id=[head]), FC(key="parent_id", match=qm.MatchValue(value=head))]),
+         {other}),
+        (qm.Filter(must=[FC(key="source", match=qm.MatchAny(any=["a"]))]), {head, passage}),
+        # delete_extra_passages
+        (qm.Filter(must=[FC(key="parent_id", match=qm.MatchAny(any=[head])), no_passages]), {passage}),
+        # reindex: puesta al día y pasajes sobrantes (con y sin vectores copiados)
+        (R._written_since(200.0 + R._CLOCK_SKEW), {other}),
+        (R._stale_passages(rec, keep_vectors=False), {passage}),
+        (R._stale_passages(rec, keep_vectors=True), {passage}),
+        (qm.Filter(must=[FC(key="published_at", values_count=qm.ValuesCount(gte=1))]), set()),
+        (qm.Filter(must=[qm.IsEmptyCondition(is_empty=qm.PayloadField(key="published_at"))]), {head, passage, other}),
+    ]
+    for flt, expected in cases:
+        got = {r.id for r in c.scroll("news", scroll_filter=flt, limit=10)[0]}
+        assert got == expected, flt
+        assert c.count("news", count_filter=flt).count == len(expected)
+
+
+def test_unsupported_filter_raises_value_error():
+    c, _, _ = _filter_client()
+    geo = qm.FieldCondition(key="loc", geo_radius=qm.GeoRadius(center=qm.GeoPoint(lon=0, lat=0), radius=1.0))
+    with pytest.raises(ValueError, match="loc"):
+        c.count("news", count_filter=qm.Filter(must=[geo]))
+    with pytest.raises(ValueError, match="MatchPhrase"):
+        c.count("news", count_filter=qm.Filter(must=[qm.FieldCondition(key="t", match=qm.MatchPhrase(phrase="x"))]))
+
+
+# Dos procesos (dos clientes) con el mismo EMBEDDED_PATH: filas únicas y escrituras visibles
+def test_shared_path_between_processes(tmp_path):
+    a = EmbeddedClient(str(tmp_path))
+    a.create_collection("news", vectors_config=qm.VectorParams(size=2, distance=qm.Distance.COSINE))
+    b = EmbeddedClient(str(tmp_path))
+    a.upsert("news", points=[qm.PointStruct(id=1, vector=[1.0, 0.0], payload={"w": "a"})])
+    b.upsert("news", points=[qm.PointStruct(id=2, vector=[0.0, 1.0], payload={"w": "b"})])
+    a.upsert("news", points=[qm.PointStruct(id=3, vector=[1.0, 1.0], payload={"w": "a"})])
+    b.delete("news", points_selector=qm.PointIdsList(points=[1]))
+    b.update_collection_aliases(change_aliases_operations=[
+        qm.CreateAliasOperation(create_alias=qm.CreateAlias(collection_name="news", alias_name="live"))
+    ])
+
+    for c in (a, b, EmbeddedClient(str(tmp_path))):
+        got = {r.id: r.vector for r in c.scroll("live", limit=10, with_vectors=True)[0]}
+        assert set(got) == {2, 3}
+        assert np.allclose(got[2], [0.0, 1.0]) and np.allclose(got[3], [2 ** -0.5] * 2)
+        assert c.query_points("live", query=[0.0, 1.0], limit=1).points[0].id == 2
+
+
+def _write_points(path, base):
+    c = EmbeddedClient(path)
+    for i in range(base, base + 40):
+        c.upsert("news", points=[qm.PointStruct(id=i, vector=[float(i), 1.0], payload={"i": i})])
+
+
+def test_concurrent_writers_keep_ids_and_vectors_aligned(tmp_path):
+    EmbeddedClient(str(tmp_path)).create_collection(
+        "news", vectors_config=qm.VectorParams(size=2, distance=qm.Distance.COSINE)
+    )
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_write_points, args=(str(tmp_path), base)) for base in (1, 1001)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(30)
+    assert all(p.exitcode == 0 for p in procs)
+
+    recs = EmbeddedClient(str(tmp_path)).scroll("news", limit=100, with_vectors=True)[0]
+    assert len(recs) == 80
+    for r in recs:
+        v = np.asarray([float(r.id), 1.0])
+        assert r.payload["i"] == r.id and np.allclose(r.vector, v / np.linalg.norm(v))
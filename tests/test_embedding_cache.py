@@ -0,0 +1,41 @@
+import numpy as np
+
+import embedding.provider as P
+from embedding.cache import EmbeddingCache, content_hash
+
+
+def test_cache_roundtrip_and_reopen(tmp_path):
+    c = EmbeddingCache(str(tmp_path), "org/model", dim=4)
+    keys = [content_hash("a"), content_hash("b")]
+    vecs = np.array([[1, 0, 0, 0], [0, 1, 0, 0]], dtype=np.float32)
+    c.put_many(keys, vecs)
+    c.put_many(keys[:1], vecs[:1])  # duplicado: se ignora
+    assert len(c) == 2
+
+    # Otro proceso/instancia ve las mismas entradas
+    c2 = EmbeddingCache(str(tmp_path), "org/model", dim=4)
+    found, missing = c2.get_many([keys[1], content_hash("z"), keys[0]])
+    assert missing == [1]
+    np.testing.assert_array_equal(found[0], vecs[1])
+    np.testing.assert_array_equal(found[2], vecs[0])
+
+
+# embed_documents sólo ejecuta el modelo para textos no cacheados
+def test_embed_documents_uses_cache(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_embed(texts, mode="query"):
+        calls.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+    cache = EmbeddingCache(str(tmp_path), "m", dim=2)
+    monkeypatch.setattr(P, "embed_texts", fake_embed)
+    monkeypatch.setattr(P, "_embed_cache", lambda: cache)
+
+    first = P.embed_documents(["c c c", "a", "b b"])
+    assert calls == [["a", "b b", "c c c"]]  # ordenado por longitud
+    assert first[:, 0].tolist() == [5, 1, 3]
+
+    again = P.embed_documents(["b b", "d d d d"])
+    assert calls[-1] == ["d d d d"]
+    assert again[:, 0].tolist() == [3, 7]
@@ -0,0 +1,53 @@
+import threading
+
+import embedding.provider as P
+
+
+# Cada modo lee sus propias variables con fallback a las genéricas
+def test_settings_per_mode(monkeypatch):
+    monkeypatch.setenv("EMBED_BATCH_SIZE", "16")
+    monkeypatch.setenv("EMBED_INGEST_BATCH_SIZE", "128")
+    monkeypatch.setenv("EMBED_QUERY_THREADS", "2")
+    monkeypatch.setenv("EMBED_INGEST_PARALLEL", "0")
+    P._settings.cache_clear()
+    try:
+        q = P._settings("query")
+        i = P._settings("ingest")
+        assert q["batch_size"] == 16 and q["threads"] == 2 and q["parallel"] is None
+        assert i["batch_size"] == 128 and i["parallel"] == 0 and i["pool_size"] == 1
+    finally:
+        P._settings.cache_clear()
+
+
+# Con size>1 cada llamada concurrente obtiene una instancia distinta
+def test_pool_hands_out_distinct_instances():
+    created = []
+
+    def factory():
+        created.append(object())
+        return created[-1]
+
+    pool = P._EmbedderPool(factory(), factory, size=3)
+    assert len(created) == 3
+
+    seen = []
+    barrier = threading.Barrier(3)
+
+    def worker():
+        with pool.acquire() as inst:
+            seen.append(inst)
+            barrier.wait(timeout=5)
+
+    ts = [threading.Thread(target=worker) for _ in range(3)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    assert len({id(x) for x in seen}) == 3
+
+
+def test_pool_single_instance_is_shared():
+    inst = object()
+    pool = P._EmbedderPool(inst, lambda: object(), size=1)
+    with pool.acquire() as a, pool.acquire() as b:
+        assert a is b is inst
@@ -0,0 +1,173 @@
+import time
+import types
+
+from ingest.pipeline import DedupStage, EnrichStage, Pipeline, Stage, ingest_feed
+from ingest.worker import FeedScheduler, FeedSpec, IngestWorker
+
+
+def _feed(n):
+    entries = [
+        types.SimpleNamespace(link=f"https://x/{i}", title=f"Nota  {i}", summary=f"resumen   {i}")
+        for i in range(n)
+    ]
+    entries.append(types.SimpleNamespace(link="https://x/0", title="Nota 0", summary="dup"))
+    return types.SimpleNamespace(entries=entries)
+
+
+class FakeExtract(Stage):
+    """Usa el summary como cuerpo; descarta /3 (sin contenido)."""
+
+    name = "extract"
+
+    def __call__(self, docs):
+        out = []
+        for d in docs:
+            if not d["url"].endswith("/3"):
+                d["content"] = d["_summary"]
+                out.append(d)
+        return out
+
+
+class RecordingSink(Stage):
+    name = "upsert"
+    phase = "sink"
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, docs):
+        assert not any(k.startswith("_") for d in docs for k in d if k != "_summary")
+        self.batches.append(list(docs))
+        return docs
+
+
+def _pipeline(sink, sink_batch=4):
+    return Pipeline([DedupStage(), FakeExtract(), EnrichStage(), sink], sink_batch=sink_batch)
+
+
+def _wait(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.status in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+# Los artículos pasan por las fases y se indexan en lotes; el job termina en "done"
+def test_worker_pipeline_batches_and_tracks_job():
+    sink = RecordingSink()
+    worker = IngestWorker(
+        queue_size=2,  # colas pequeñas: ejercita el backpressure
+        fetch_workers=2,
+        batch_size=4,
+        batch_wait=0.05,
+        parse_fn=lambda url: _feed(10),
+        pipeline=_pipeline(sink),
+    ).start()
+    try:
+        job = _wait(worker.submit("https://feed.example/rss", limit=20))
+        assert job.status == "done"
+        assert job.discovered == 10 and job.indexed == 9 and job.skipped == 1
+        assert all(len(b) <= 4 for b in sink.batches)
+        assert sum(len(b) for b in sink.batches) == 9
+        assert all(d["source"] == "feed.example" for b in sink.batches for d in b)
+        assert worker.get(job.id) is job
+        assert worker.stats()["extract"]["docs_in"] == 10
+    finally:
+        worker.stop()
+
+
+# Ingesta síncrona: misma semántica (dedup, fallback a summary, normalización) y timings
+def test_ingest_feed_sync_pipeline():
+    sink = RecordingSink()
+    pipe = _pipeline(sink, sink_batch=3)
+    n = ingest_feed("https://feed.example/rss", limit=20, pipeline=pipe, parse_fn=lambda url: _feed(5))
+    assert n == 4
+    assert [len(b) for b in sink.batches] == [3, 1]
+    assert sink.batches[0][0]["content"] == "resumen 0"
+    assert sink.batches[0][0]["title"] == "Nota 0"
+    st = pipe.stats()
+    assert st["dedup"]["docs_in"] == 6 and st["dedup"]["docs_out"] == 5
+    assert st["upsert"]["calls"] == 2
+
+
+def test_scheduler_run_once_submits_every_feed():
+    submitted = []
+
+    class W:
+        def submit(self, url, limit=20, lang=None):
+            submitted.append((url, limit, lang))
+
+    feeds = [FeedSpec(url="https://a/rss", limit=5), FeedSpec(url="https://b/rss", lang="en")]
+    FeedScheduler(W(), feeds).run_once()
+    assert submitted == [("https://a/rss", 5, None), ("https://b/rss", 20, "en")]
+
+
+def test_embed_upsert_stages_write_to_qdrant(memory_qdrant):
+    from ingest.pipeline import EmbedStage, UpsertStage
+
+    docs = [
+        {"title": "A", "url": "https://x/a", "source": "s", "content": "uno", "_summary": "x"},
+        {"title": "B", "url": "https://x/b", "source": "s", "content": "dos", "_summary": "y"},
+    ]
+    out = Pipeline([EmbedStage(), UpsertStage()]).run(docs)
+    assert len(out) == 2
+    points, _ = memory_qdrant.scroll("news", limit=10, with_payload=True)
+    assert len(points) == 2
+    assert all("_summary" not in p.payload for p in points)
+
+
+# Un lote que falla al escribir no anula los ya escritos
+def test_ingest_feed_counts_batches_that_succeeded():
+    class FailingSecondBatch(RecordingSink):
+        def __call__(self, docs):
+            if self.batches:
+                raise RuntimeError("qdrant caído")
+            return super().__call__(docs)
+
+    sink = FailingSecondBatch()
+    n = ingest_feed("https://feed.example/rss", limit=20, pipeline=_pipeline(sink, sink_batch=3),
+                    parse_fn=lambda url: _feed(5))
+    assert n == 3 and [len(b) for b in sink.batches] == [3]
+
+
+def test_upsert_stage_updates_term_model(memory_qdrant, monkeypatch):
+    from api import service as S
+    from ingest.pipeline import EmbedStage, UpsertStage
+
+    seen = []
+    monkeypatch.setitem(S._TERM_MODEL, "model", types.SimpleNamespace(partial_update=seen.extend))
+    docs = [{"title": "A", "url": "https://x/a", "source": "s", "content": "uno", "_summary": "x"}]
+    Pipeline([EmbedStage(), UpsertStage()]).run(docs)
+    assert seen == ["A\nuno"]
+
+
+# Near-dup en modo 'drop' descarta docs: cuentan como omitidos, no como indexados
+def test_worker_credits_dropped_docs_as_skipped(tmp_path):
+    class DropOdd(Stage):
+        name = "near_dup"
+        phase = "sink"
+
+        def __call__(self, docs):
+            return [d for d in docs if int(d["url"].rsplit("/", 1)[1]) % 2 == 0]
+
+    sink = RecordingSink()
+    indexed = []
+    worker = IngestWorker(
+        batch_size=4, batch_wait=0.05, parse_fn=lambda url: _feed(6), on_indexed=indexed.append,
+        pipeline=Pipeline([DedupStage(), FakeExtract(), EnrichStage(), DropOdd(), sink], sink_batch=4),
+        jobs_dir=str(tmp_path),
+    ).start()
+    try:
+        job = _wait(worker.submit("https://feed.example/rss"))
+        # 6 ítems: /3 sin contenido, /1 y /5 descartados por near_dup
+        assert (job.indexed, job.skipped, job.failed) == (3, 3, 0) and sum(indexed) == 3
+        # Otro worker (otro proceso) ve el estado a través de INGEST_JOBS_DIR
+        other = IngestWorker(parse_fn=lambda url: None, jobs_dir=str(tmp_path))
+        assert other.get(job.id) is None
+        deadline = time.monotonic() + 5
+        while other.status(job.id)["status"] != "done" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert other.status(job.id)["indexed"] == 3 and other.status(job.id)["status"] == "done"
+        assert other.status("no-existe") is None
+    finally:
+        worker.stop()
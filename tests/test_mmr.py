@@ -0,0 +1,31 @@
+import numpy as np
+
+from api import service as S
+from api.analysis import mmr_select
+
+
+def test_mmr_select_prefers_novel_candidates():
+    q = np.array([1.0, 0.0, 0.0])
+    cands = np.array([
+        [0.9, 0.1, 0.0],   # muy relevante
+        [0.9, 0.11, 0.0],  # casi idéntico al anterior
+        [0.6, 0.0, 0.8],   # menos relevante pero distinto
+    ])
+    assert mmr_select(q, cands, k=2, lam=1.0) == [0, 1]  # sólo relevancia
+    assert mmr_select(q, cands, k=2, lam=0.5)[1] == 2
+    assert mmr_select(q, cands, k=0) == []
+
+
+def test_search_diversify(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    S.index_many([
+        {"title": "Tasas", "url": f"https://a/{i}", "source": "a",
+         "content": "banco central sube tasa de interés" + " extra" * i}
+        for i in range(3)
+    ] + [{"title": "Bolsa", "url": "https://b/1", "source": "b", "content": "banco bolsa acciones"}])
+
+    plain = S.search_query("banco central tasa", k=2)
+    assert all(r["title"] == "Tasas" for r in plain)
+
+    diverse = S.search_query("banco central tasa", k=2, diversify=True, mmr_lambda=0.3)
+    assert [r["title"] for r in diverse] == ["Tasas", "Bolsa"]
@@ -0,0 +1,47 @@
+from api import service as S
+
+
+def _payloads(client):
+    points, _ = client.scroll("news", limit=100, with_payload=True)
+    return {p.payload["url"]: p.payload for p in points}
+
+
+WIRE = "el banco central sube la tasa de interés en medio punto por la inflación"
+
+
+# Notas sindicadas (mismo texto, otra URL/fuente) se enlazan al original, en lote y contra Qdrant
+def test_near_duplicates_linked_and_collapsed(memory_qdrant):
+    S.index_many([
+        {"title": "Tasas", "url": "https://a/1", "source": "a", "content": WIRE},
+        {"title": "Tasas", "url": "https://b/1", "source": "b", "content": WIRE},
+        {"title": "Fútbol", "url": "https://c/1", "source": "c", "content": "final del torneo de fútbol"},
+    ])
+    S.index_one({"title": "Tasas", "url": "https://d/1", "source": "d", "content": WIRE})
+
+    p = _payloads(memory_qdrant)
+    original = S._id_from_url("https://a/1")
+    assert p["https://a/1"]["canonical_id"] == original
+    assert p["https://b/1"]["canonical_id"] == original
+    assert p["https://d/1"]["canonical_id"] == original
+    assert p["https://c/1"]["canonical_id"] == S._id_from_url("https://c/1")
+
+    # Re-indexar el original no lo convierte en duplicado de sus copias
+    S.index_one({"title": "Tasas", "url": "https://a/1", "source": "a", "content": WIRE})
+    assert _payloads(memory_qdrant)["https://a/1"]["canonical_id"] == original
+
+    plain = S.search_query("banco central tasa de interés", k=2)
+    assert [r["title"] for r in plain] == ["Tasas", "Tasas"]
+
+    grouped = S.search_query("banco central tasa de interés", k=2, collapse="duplicates")
+    assert [r["title"] for r in grouped] == ["Tasas", "Fútbol"]
+    assert len(grouped[0]["duplicates"]) == 2
+
+
+def test_drop_mode_skips_duplicates(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "drop")
+    n = S.index_many([
+        {"title": "Tasas", "url": "https://a/1", "source": "a", "content": WIRE},
+        {"title": "Tasas", "url": "https://b/1", "source": "b", "content": WIRE},
+    ])
+    assert n == 1
+    assert set(_payloads(memory_qdrant)) == {"https://a/1"}
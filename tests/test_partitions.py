@@ -0,0 +1,82 @@
+import datetime as dt
+
+import pytest
+
+import clients.qdrant_client as qc
+from api import service as S
+
+DOCS = [
+    {"title": "Tasas enero", "url": "https://a.com/1", "source": "a", "published_at": "2025-01-10T08:00:00",
+     "content": "banco central sube tasas"},
+    {"title": "Tasas febrero", "url": "https://a.com/2", "source": "a", "published_at": "2025-02-12T08:00:00",
+     "content": "banco central mantiene tasas"},
+    {"title": "Tasas marzo", "url": "https://b.com/3", "source": "b", "published_at": "2025-03-05T08:00:00",
+     "content": "banco central baja tasas"},
+    {"title": "Liga", "url": "https://b.com/4", "source": "b", "content": "final de la liga"},
+]
+
+
+@pytest.fixture
+def partitioned(memory_qdrant, monkeypatch):
+    memory_qdrant.delete_collection(collection_name=qc.COLLECTION)
+    monkeypatch.setattr(qc, "PARTITION_BY", "month")
+    monkeypatch.setattr(qc, "_PARTITIONS", {"names": None, "at": 0.0})
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    qc.ensure_collection()
+    S.index_many(DOCS)
+    return memory_qdrant
+
+
+def test_writes_route_by_month_behind_alias(partitioned):
+    current = qc.partition_name()
+    assert qc.list_partitions() == [current, "news_m202503", "news_m202502", "news_m202501"]
+    assert qc.list_aliases()[qc.COLLECTION] == current
+    assert partitioned.count(collection_name="news_m202502").count == 1
+    # Sin fecha va al mes en curso
+    assert partitioned.count(collection_name=current).count == 1
+
+    assert qc._read_collections("2025-02-01", "2025-03-31") == ["news_m202503", "news_m202502"]
+    assert qc._read_collections(date_to="2025-01-31") == ["news_m202501"]
+
+
+def test_fanout_reads_merge_across_months(partitioned):
+    urls = [d["url"] for d in S.search_query("banco central tasas", k=3)]
+    assert set(urls) == {"https://a.com/1", "https://a.com/2", "https://b.com/3"}
+
+    docs = S.get_topn_for_query("banco central tasas", k=5, date_from="2025-02-01", date_to="2025-02-28")
+    assert [d["url"] for d in docs] == ["https://a.com/2"]
+
+    assert [d and d["title"] for d in S.get_docs_by_url(["https://b.com/3", "https://a.com/1"])] == [
+        "Tasas marzo", "Tasas enero",
+    ]
+    similar = [d["url"] for d in S.similar_docs("https://a.com/1", k=2)]
+    assert "https://a.com/1" not in similar and len(similar) == 2
+
+    groups = S._topn_by_source("banco central tasas", per_source=1)
+    assert sorted(d["source"] for d in groups) == ["a", "b"]
+
+
+def test_retention_drops_old_months(partitioned):
+    dropped = qc.apply_retention(months=2, now=dt.datetime(2025, 3, 15))
+    assert dropped == ["news_m202501"]
+    assert "news_m202501" not in qc.list_partitions()
+    assert S.get_doc_by_url("https://a.com/1") is None
+    assert S.get_doc_by_url("https://a.com/2")["title"] == "Tasas febrero"
+
+
+
+def test_undated_point_stays_in_its_month_after_rollover(partitioned, monkeypatch):
+    first = qc.partition_name()
+    y, m = qc._current_month()
+    monkeypatch.setattr(qc, "_current_month", lambda: (y + m // 12, m % 12 + 1))
+    S.index_many([DOCS[3]])
+    assert partitioned.count(collection_name=first).count == 1
+    assert qc.partition_name() not in qc.list_partitions(refresh=True)
+
+
+def test_merge_dedupes_ids_across_months(partitioned):
+    pid = S._id_from_url("https://b.com/4")
+    (rec,) = partitioned.retrieve(collection_name=qc.partition_name(), ids=[pid], with_vectors=True)
+    qc.upsert_articles([qc.qm.PointStruct(id=pid, vector=rec.vector, payload=rec.payload)], collection="news_m202501")
+    urls = [d["url"] for d in S.search_query("final de la liga", k=4)]
+    assert urls.count("https://b.com/4") == 1 and len(urls) == 4
@@ -0,0 +1,39 @@
+from api import service as S
+
+
+def _docs():
+    # Una fuente dominante (muchas notas muy parecidas a la consulta) y dos chicas
+    docs = [
+        {"title": f"Banco central {i}", "url": f"https://big.com/{i}", "source": "big",
+         "content": f"banco central tasas inflación nota {i}"}
+        for i in range(12)
+    ]
+    docs += [
+        {"title": "Tasas", "url": "https://small.com/1", "source": "small", "content": "tasas y mercado"},
+        {"title": "Inflación", "url": "https://small.com/2", "source": "small", "content": "inflación récord"},
+        {"title": "Liga", "url": "https://other.com/1", "source": "other", "content": "final de la liga"},
+    ]
+    return docs
+
+
+def test_topn_by_source_is_balanced(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    S.index_many(_docs())
+
+    docs = S._topn_by_source("banco central tasas", per_source=2)
+    per = {}
+    for d in docs:
+        per[d["source"]] = per.get(d["source"], 0) + 1
+    assert per == {"big": 2, "small": 2, "other": 1}
+
+    docs = S._topn_by_source("banco central tasas", sources_filter=["small", "other"], per_source=5)
+    assert {d["source"] for d in docs} == {"small", "other"}
+
+
+def test_build_perspective_per_source(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    monkeypatch.setattr(S, "term_model", lambda: None)
+    S.index_many(_docs())
+
+    res = S.build_perspective("banco central tasas", sources_filter=["big", "small"], k=4)
+    assert {s.source: s.volume for s in res.sources} == {"big": 2, "small": 2}
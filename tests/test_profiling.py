@@ -0,0 +1,78 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fastapi.testclient import TestClient
+
+from api import main as M
+from api import profiling
+from bench.loadgen import load_log, run_load
+
+
+def test_admin_endpoints_require_token(monkeypatch):
+    client = TestClient(M.app)
+    monkeypatch.setattr(M, "ADMIN_TOKEN", "")
+    assert client.get("/admin/profile/cpu").status_code == 404
+    monkeypatch.setattr(M, "ADMIN_TOKEN", "s3cret")
+    assert client.get("/admin/profile/cpu", headers={"X-Admin-Token": "nope"}).status_code == 403
+
+
+def test_cpu_profile_samples_busy_thread(monkeypatch):
+    monkeypatch.setattr(M, "ADMIN_TOKEN", "s3cret")
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(i * i for i in range(1000))
+
+    t = threading.Thread(target=busy_loop, daemon=True)
+    t.start()
+    try:
+        r = TestClient(M.app).get(
+            "/admin/profile/cpu",
+            params={"seconds": 0.3, "interval_ms": 2, "format": "folded"},
+            headers={"X-Admin-Token": "s3cret"},
+        )
+    finally:
+        stop.set()
+    assert r.status_code == 200
+    assert "test_profiling:busy_loop" in r.text
+
+
+def test_memory_profile_reports_growth():
+    holder = []
+
+    def alloc():
+        time.sleep(0.05)
+        holder.append([bytearray(1024) for _ in range(200)])
+
+    threading.Thread(target=alloc).start()
+    res = profiling.memory_profile(seconds=0.2, limit=5)
+    assert res["top"] and "growth" in res
+    assert not profiling.PROFILE_LOCK.locked()
+
+
+def test_loadgen_against_local_server(tmp_path):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"[]")
+
+        def log_message(self, *args):
+            pass
+
+    log = tmp_path / "q.txt"
+    log.write_text('banco central\n{"path": "/storyline", "params": {"q": "elecciones"}}\n', encoding="utf-8")
+    reqs = load_log(str(log))
+    assert reqs == [("/search", {"q": "banco central", "k": 10}), ("/storyline", {"q": "elecciones"})]
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        res = run_load(f"http://127.0.0.1:{server.server_address[1]}", reqs, rps=200, total=20, concurrency=4)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert res["ok"] == 20 and res["latency"]["n"] == 20
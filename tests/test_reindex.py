@@ -0,0 +1,80 @@
+import pytest
+
+import clients.qdrant_client as qc
+import ingest.reindex as R
+from api import service as S
+from ingest.reindex import reindex
+
+
+# Reindex a colección nueva + alias: las búsquedas siguen funcionando vía alias
+def test_reindex_switches_alias(memory_qdrant, monkeypatch):
+    S.index_many([
+        {"title": "Elecciones", "url": "https://x/1", "source": "a", "content": "votos congreso"},
+        {"title": "Fútbol", "url": "https://x/2", "source": "b", "content": "gol final"},
+    ])
+
+    total = reindex(target="news_v2", source="news", alias="news_read", page_size=1)
+    assert total == 2
+    assert qc.list_aliases()["news_read"] == "news_v2"
+    assert memory_qdrant.count("news_v2").count == 2
+
+    monkeypatch.setattr(qc, "COLLECTION", "news_read")
+    res = S.search_query("votos congreso", k=1)
+    assert res[0]["url"] == "https://x/1"
+
+    # Un segundo reindex mueve el alias de forma atómica
+    assert reindex(target="news_v3", alias="news_read", keep_vectors=True) == 2
+    assert qc.resolve_collection("news_read") == "news_v3"
+
+
+# Lo indexado en la origen mientras corre la copia llega a la destino antes del cambio
+def test_reindex_catches_up_writes_during_copy(memory_qdrant, monkeypatch):
+    S.index_many([{"title": "Uno", "url": "https://x/1", "source": "a", "content": "uno"}])
+    real_copy = R._copy_pages
+    calls = []
+
+    def copy_then_write(*a, **kw):
+        n = real_copy(*a, **kw)
+        if not calls:
+            S.index_many([
+                {"title": "Dos", "url": "https://x/2", "source": "a", "content": "dos"},
+                {"title": "Uno v2", "url": "https://x/1", "source": "a", "content": "uno editado"},
+            ])
+        calls.append(n)
+        return n
+
+    monkeypatch.setattr(R, "_copy_pages", copy_then_write)
+    assert reindex(target="news_v2", source="news", alias="news_read") == 3
+    # Copia completa, una ronda con lo nuevo y otra vacía; tras el cambio nada pendiente
+    assert calls == [1, 2, 0, 0]
+    got = {r.payload["url"]: r.payload["title"] for r in memory_qdrant.scroll("news_v2", limit=10)[0]}
+    assert got == {"https://x/1": "Uno v2", "https://x/2": "Dos"}
+
+
+# Si el alias sería una colección existente, aborta antes de crear la destino
+def test_reindex_collection_as_alias_requires_drop_source(memory_qdrant):
+    S.index_many([{"title": "Uno", "url": "https://x/1", "source": "a", "content": "uno"}])
+    with pytest.raises(ValueError, match="--drop-source"):
+        reindex(target="news_v2", source="news", alias="news")
+    assert not memory_qdrant.collection_exists("news_v2")
+
+    assert reindex(target="news_v2", source="news", alias="news", drop_source=True) == 1
+    assert qc.resolve_collection("news") == "news_v2"
+
+
+# Con --drop-source sin alias previo, no borra la origen si la ingesta sigue escribiendo
+def test_reindex_drop_source_refuses_while_writes_continue(memory_qdrant, monkeypatch):
+    S.index_many([{"title": "Uno", "url": "https://x/1", "source": "a", "content": "uno"}])
+    real_copy = R._copy_pages
+    seq = iter(range(2, 100))
+
+    def copy_then_write(*a, **kw):
+        n = real_copy(*a, **kw)
+        i = next(seq)
+        S.index_many([{"title": f"N{i}", "url": f"https://x/{i}", "source": "a", "content": "nuevo"}])
+        return n
+
+    monkeypatch.setattr(R, "_copy_pages", copy_then_write)
+    with pytest.raises(RuntimeError, match="para la ingesta"):
+        reindex(target="news_v2", source="news", alias="news", drop_source=True)
+    assert memory_qdrant.collection_exists("news") and "news" not in qc.list_aliases()
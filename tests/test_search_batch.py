@@ -0,0 +1,32 @@
+from conftest import hash_embed
+from fastapi.testclient import TestClient
+
+from api import main as M
+from api import service as S
+
+
+def test_search_batch_matches_single_queries(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    S.index_many([
+        {"title": "Tasas", "url": "https://a/1", "source": "a", "content": "banco central sube tasas"},
+        {"title": "Bolsa", "url": "https://b/1", "source": "b", "content": "bolsa cae por tasas"},
+        {"title": "Liga", "url": "https://b/2", "source": "b", "content": "final de la liga"},
+    ])
+    calls = []
+    monkeypatch.setattr(S, "embed_texts", lambda texts, mode="query": calls.append(texts) or hash_embed(texts))
+
+    body = {"queries": [
+        {"q": "banco central tasas", "k": 2},
+        {"q": "tasas", "k": 3, "source": "b"},
+        {"q": "liga final", "k": 1, "lambda": 0.3, "diversify": True},
+    ]}
+    r = TestClient(M.app).post("/search/batch", json=body)
+    assert r.status_code == 200
+    batch = r.json()
+    assert len(calls) == 1 and len(calls[0]) == 3
+
+    assert [x["title"] for x in batch[0]] == [x["title"] for x in S.search_query("banco central tasas", k=2)]
+    assert {x["source"] for x in batch[1]} == {"b"}
+    assert [x["title"] for x in batch[2]] == ["Liga"]
+
+    assert TestClient(M.app).post("/search/batch", json={"queries": []}).status_code == 422
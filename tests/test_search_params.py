@@ -0,0 +1,42 @@
+import numpy as np
+
+import clients.qdrant_client as qc
+from api import service as S
+
+
+class Hit:
+    def __init__(self, score, payload):
+        self.score = score
+        self.payload = payload
+
+
+def _fake_embed(texts):
+    return np.ones((len(texts), qc.VECTOR_SIZE), dtype=np.float32)
+
+
+# /search sólo pasa los knobs indicados; los builders usan el ef barato de análisis
+def test_search_knobs_passthrough(monkeypatch):
+    calls = []
+
+    def fake_search(vec, top_k=10, query_filter=None, **kw):
+        calls.append(kw)
+        return [Hit(0.8, {"title": "t", "url": "u", "source": "s", "content": "c"})]
+
+    monkeypatch.setattr(S, "embed_texts", _fake_embed)
+    monkeypatch.setattr(qc, "search", fake_search)
+
+    S.search_query("consulta", k=3)
+    assert calls[-1] == {}
+
+    S.search_query("consulta", k=3, ef=256, exact=True, score_threshold=0.4)
+    assert calls[-1] == {"hnsw_ef": 256, "exact": True, "score_threshold": 0.4}
+
+    S.get_topn_for_query("consulta", k=30)
+    assert calls[-1]["hnsw_ef"] == S.ANALYSIS_SEARCH_EF
+
+
+def test_search_params_merge_with_profile(monkeypatch):
+    monkeypatch.delenv("QDRANT_SEARCH_EF", raising=False)
+    assert qc.search_params() is None
+    sp = qc.search_params(hnsw_ef=32, exact=False)
+    assert sp.hnsw_ef == 32 and sp.exact is False
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import numpy as np
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from api import sentiment as SE
+from api import service as S
+
+
+def test_label_values():
+    assert SE.label_values(["negative", "neutral", "positive"]).tolist() == [-1.0, 0.0, 1.0]
+    assert SE.label_values(["1 star", "2 stars", "3 stars", "4 stars", "5 stars"]).tolist() == [-1.0, -0.5, 0.0, 0.5, 1.0]
+    assert SE.label_values(["LABEL_0", "LABEL_1"]).tolist() == [-1.0, 1.0]
+
+
+class _Session:
+    """Clasificador falso: logit positivo por cada token 'bien', negativo por cada 'mal'."""
+
+    def __init__(self):
+        self.batches = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, _, feeds):
+        ids = feeds["input_ids"]
+        self.batches.append(ids.shape)
+        pos = (ids == 2).sum(axis=1) * 4.0
+        neg = (ids == 3).sum(axis=1) * 4.0
+        return [np.stack([neg, np.zeros_like(pos), pos], axis=1)]
+
+
+def _engine(batch_size=2):
+    tok = Tokenizer(WordLevel({"[PAD]": 0, "[UNK]": 1, "bien": 2, "mal": 3}, unk_token="[UNK]"))
+    tok.pre_tokenizer = Whitespace()
+    tok.enable_padding(pad_id=0, pad_token="[PAD]")
+    return SE.OnnxEngine(_Session(), tok, ["negative", "neutral", "positive"], name="onnx:test", batch_size=batch_size)
+
+
+def test_onnx_engine_batches_and_caches(monkeypatch):
+    eng = _engine()
+    monkeypatch.setattr(SE, "engine", lambda: eng)
+    monkeypatch.setattr(SE, "_CACHE", SE.OrderedDict())
+
+    texts = ["todo bien bien", "muy mal", "nada", "todo bien bien"]
+    scores = SE.score_texts(texts)
+    assert scores[0] > 0.9 and scores[1] < -0.9 and abs(scores[2]) < 1e-6 and scores[3] == scores[0]
+    # 3 textos distintos en lotes de 2
+    assert len(eng.session.batches) == 2
+
+    assert SE.score_texts(["muy mal", "nada"]) == scores[1:3]
+    assert len(eng.session.batches) == 2
+
+
+def test_sentiment_at_ingest_is_reused_by_perspective(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    monkeypatch.setattr(S, "term_model", lambda: None)
+    S.index_many([
+        {"title": "Avance", "url": "https://a.com/1", "source": "a", "content": "mejora y avance exitoso"},
+        {"title": "Crisis", "url": "https://b.com/1", "source": "b", "content": "crisis y caída con riesgo"},
+    ])
+    assert S.get_doc_by_url("https://a.com/1")["sentiment_engine"] == "lexicon"
+
+    def _no_scoring(texts):
+        assert texts == []
+        return []
+    monkeypatch.setattr(S.sentiment, "score_texts", _no_scoring)
+    res = S.build_perspective("avance crisis", k=4)
+    tone = {s.source: s.avg_sentiment for s in res.sources}
+    assert tone == {"a": 1.0, "b": -1.0}
+
+
+# Si el modelo ONNX no carga, lo indexado queda marcado con el motor que realmente puntuó
+def test_ingest_records_fallback_engine(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    monkeypatch.setattr(SE, "SENTIMENT_ENGINE", "onnx")
+    monkeypatch.setattr(SE, "load_onnx_engine", lambda: (_ for _ in ()).throw(OSError("sin modelo")))
+    SE.engine.cache_clear()
+    try:
+        (head,), = S.build_point_groups([{"title": "t", "url": "https://a.com/1", "source": "a", "content": "avance"}])
+        assert head.payload["sentiment_engine"] == "lexicon" and head.payload["sentiment"] == 1.0
+    finally:
+        SE.engine.cache_clear()
@@ -0,0 +1,59 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requiere os.fork")
+def test_prefork_workers_share_preloaded_state(tmp_path):
+    # App mínima: el "modelo" se crea en el maestro antes del fork
+    (tmp_path / "tiny_app.py").write_text(textwrap.dedent("""
+        import os
+        from fastapi import FastAPI
+
+        MASTER = os.getpid()
+        WEIGHTS = bytearray(8 * 1024 * 1024)
+        app = FastAPI()
+
+        @app.get("/")
+        def root():
+            return {"pid": os.getpid(), "master": MASTER, "weights": id(WEIGHTS)}
+    """))
+    port = _free_port()
+    env = {**os.environ, "PYTHONPATH": f"{tmp_path}{os.pathsep}{ROOT}"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "api.serve", "--app", "tiny_app:app", "--no-preload",
+         "--host", "127.0.0.1", "--port", str(port), "--workers", "2", "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        seen = []
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline and len({r["pid"] for r in seen}) < 2:
+            try:
+                with httpx.Client() as client:  # conexión nueva: reparte entre workers
+                    seen.append(client.get(f"http://127.0.0.1:{port}/", timeout=2).json())
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        pids = {r["pid"] for r in seen}
+        assert len(pids) == 2 and proc.pid not in pids
+        # Todos heredan el estado del maestro (importado una sola vez, antes del fork)
+        assert {r["master"] for r in seen} == {proc.pid}
+        assert len({r["weights"] for r in seen}) == 1
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=30) == 0
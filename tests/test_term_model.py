@@ -0,0 +1,82 @@
+import fcntl
+import time
+
+import pytest
+
+from api import service as S
+from api.analysis import TermModel, grouped_top_terms
+
+DOCS = [
+    {"title": "Banco central", "url": "https://a/1", "source": "a", "content": "según el banco central las tasas suben"},
+    {"title": "Tasas", "url": "https://a/2", "source": "a", "content": "según analistas las tasas de interés"},
+    {"title": "Liga", "url": "https://b/1", "source": "b", "content": "según el técnico la final de la liga"},
+    {"title": "Gol", "url": "https://b/2", "source": "b", "content": "según la prensa el gol de la final"},
+]
+
+
+def test_grouped_top_terms_uses_corpus_idf():
+    texts = [S._doc_text(d) for d in DOCS]
+    sources = [d["source"] for d in DOCS]
+    local = grouped_top_terms(texts, sources, k=3)
+    assert set(local) == {"a", "b"} and "la" in local["b"]
+
+    # Con IDF del corpus "la" es ubicua y deja de encabezar la fuente b
+    model = TermModel(vocab_size=500).fit(texts + ["la casa de la ciudad"] * 20)
+    top = grouped_top_terms(texts, sources, k=3, model=model)
+    assert "tasas" in top["a"]
+    assert "la" not in top["b"] and "liga" in top["b"]
+
+
+def _fresh_term_model(monkeypatch, tmp_path):
+    monkeypatch.setattr(S, "_TERM_MODEL", {"model": None, "at": None, "refitting": False, "mtime": None})
+    monkeypatch.setattr(S, "_TERM_MODEL_OWNER", {"lock": None})
+    monkeypatch.setattr(S, "TFIDF_MODEL_PATH", str(tmp_path / "terms.npz"))
+
+
+def test_term_model_refit_and_incremental_update(memory_qdrant, monkeypatch, tmp_path):
+    _fresh_term_model(monkeypatch, tmp_path)
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    S.index_many(DOCS)
+
+    model = S.refit_term_model()
+    assert model is not None and model.n_docs == 4
+    assert S.term_model() is model
+
+    S.index_many([{"title": "Tasas", "url": "https://c/1", "source": "c", "content": "tasas récord"}])
+    assert model.n_docs == 5
+
+
+# Re-ingerir la misma URL (el worker re-lee cada feed) no infla df ni n_docs
+def test_reindexing_same_url_does_not_inflate_df(memory_qdrant, monkeypatch, tmp_path):
+    _fresh_term_model(monkeypatch, tmp_path)
+    monkeypatch.setattr(S, "NEAR_DUP_MODE", "off")
+    S.index_many(DOCS)
+    model = S.refit_term_model()
+    tasas = list(model.terms).index("tasas")
+    before = model.df[tasas]
+
+    doc = {"title": "Tasas", "url": "https://c/1", "source": "c", "content": "tasas récord"}
+    for _ in range(4):
+        S.index_many([dict(doc)])
+    S.index_many([dict(doc), {**doc, "url": "https://c/2"}, {**doc, "url": "https://c/2"}])
+    assert model.n_docs == 6 and model.df[tasas] == before + 2
+    assert memory_qdrant.count("news").count == 6
+
+
+# Con varios procesos sólo el dueño del flock ajusta; el resto carga el modelo publicado
+def test_term_model_single_owner(monkeypatch, tmp_path):
+    _fresh_term_model(monkeypatch, tmp_path)
+    owner = open(S.TFIDF_MODEL_PATH + ".lock", "a")
+    fcntl.flock(owner, fcntl.LOCK_EX | fcntl.LOCK_NB)  # otro proceso tiene el lock
+    monkeypatch.setattr(S, "refit_term_model", lambda: pytest.fail("sólo el dueño re-ajusta"))
+    try:
+        TermModel(vocab_size=500).fit([S._doc_text(d) for d in DOCS]).save(S.TFIDF_MODEL_PATH)
+        assert S.term_model() is None  # nunca bloquea: carga en segundo plano
+        deadline = time.monotonic() + 5
+        while S._TERM_MODEL["refitting"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        model = S.term_model()
+        assert model is not None and model.n_docs == 4 and "tasas" in set(model.terms)
+    finally:
+        owner.close()
+    assert S._TERM_MODEL_OWNER["lock"] is None
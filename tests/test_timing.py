@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+
+from api import main as M
+from api import service as S
+from api import timing as T
+
+
+def _sample(endpoint: str, stage: str) -> float:
+    return T.STAGE_LATENCY.labels(endpoint=endpoint, stage=stage)._sum.get()
+
+
+def test_span_accumulates_in_trace():
+    trace = T.start_trace()
+    with T.span("a"):
+        pass
+    T.timed("a")(lambda: None)()
+    with T.span("b"):
+        pass
+    assert set(trace.stages) == {"a", "b"}
+    assert trace.server_timing().startswith("a;dur=")
+    T._TRACE.set(None)
+
+
+def test_search_exports_stages_and_server_timing(memory_qdrant, monkeypatch):
+    monkeypatch.setattr(M, "SERVER_TIMING", True)
+    S.index_many([{"title": "Tasas", "url": "https://a/1", "source": "a", "content": "banco central sube tasas"}])
+    before = _sample("/search", "qdrant_search")
+
+    r = TestClient(M.app).get("/search", params={"q": "banco central", "k": 1})
+    assert r.status_code == 200
+    header = r.headers["Server-Timing"]
+    assert "embed_query;dur=" in header and "qdrant_search;dur=" in header
+    assert _sample("/search", "qdrant_search") > before
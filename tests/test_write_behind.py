@@ -0,0 +1,137 @@
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+from api import main as M
+from ingest.write_behind import Journal, WriteBehindBuffer
+
+
+class Recorder:
+    def __init__(self, fail=0):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, docs):
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("qdrant caído")
+        self.batches.append([d["url"] for d in docs])
+        return len(docs)
+
+
+def _doc(url, content="x"):
+    return {"title": "t", "url": url, "source": "s", "content": content}
+
+
+def _wait(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return cond()
+
+
+# Se vacía por tamaño; una URL re-enviada mientras está pendiente se escribe una vez
+def test_flush_by_size_coalesces_urls(tmp_path):
+    rec = Recorder()
+    buf = WriteBehindBuffer(rec, journal_dir=str(tmp_path), batch_size=3, max_wait=60).start()
+    try:
+        for url in ("https://a/1", "https://a/2", "https://a/1", "https://a/3"):
+            buf.submit(_doc(url))
+        assert _wait(lambda: rec.batches)
+        assert rec.batches == [["https://a/2", "https://a/1", "https://a/3"]]
+        assert buf.stats()["pending"] == 0 and buf.stats()["committed_seq"] == 4
+    finally:
+        buf.stop()
+
+
+def test_flush_by_time_and_retry_on_failure(tmp_path):
+    rec = Recorder(fail=1)
+    buf = WriteBehindBuffer(rec, journal_dir="", batch_size=100, max_wait=0.05).start()
+    try:
+        buf.submit(_doc("https://a/1"))
+        assert _wait(lambda: rec.batches)
+        assert rec.batches == [["https://a/1"]] and buf.stats()["flush_failures"] == 1
+    finally:
+        buf.stop()
+
+
+# Lo aceptado sobrevive a una caída: el siguiente proceso lo reproduce desde el journal
+def test_journal_replays_after_crash(tmp_path):
+    crashed = WriteBehindBuffer(Recorder(), journal_dir=str(tmp_path), batch_size=100, max_wait=60)
+    crashed.submit(_doc("https://a/1", "v1"))
+    crashed.submit(_doc("https://a/2"))
+    crashed.submit(_doc("https://a/1", "v2"))
+    # Otro proceso vivo usa otro slot; al "morir" se libera el flock sin vaciar
+    other = WriteBehindBuffer(Recorder(), journal_dir=str(tmp_path))
+    assert other.journal.root != crashed.journal.root
+    other.stop()
+    crashed._slot_lock.close()
+
+    seen = []
+    revived = WriteBehindBuffer(seen.extend, journal_dir=str(tmp_path), batch_size=100, max_wait=60)
+    assert revived.journal.root == crashed.journal.root and revived.stats()["pending"] == 2
+    revived.start()
+    assert revived.flush()
+    assert [(d["url"], d["content"]) for d in seen] == [("https://a/2", "x"), ("https://a/1", "v2")]
+    revived.submit(_doc("https://a/3"))
+    assert revived.flush()
+    revived.stop()
+
+    again = WriteBehindBuffer(Recorder(), journal_dir=str(tmp_path))
+    assert again.stats()["pending"] == 0 and again.stats()["last_seq"] == 4
+    # Los segmentos ya confirmados se compactan (queda sólo el activo, si lo hay)
+    assert len([f for f in os.listdir(again.journal.root) if f.startswith("seg-")]) <= 1
+    again.stop()
+
+
+def test_index_endpoint_write_behind(tmp_path, monkeypatch):
+    rec = Recorder()
+    buf = WriteBehindBuffer(rec, journal_dir=str(tmp_path), batch_size=100, max_wait=60, max_pending=1)
+    monkeypatch.setattr(M, "INDEX_WRITE_BEHIND", True)
+    monkeypatch.setattr(M, "_index_buffer", lambda: buf)
+    client = TestClient(M.app)
+
+    body = {"title": "t", "url": "https://a.com/1", "source": "s", "content": "c",
+            "published_at": "2025-03-01T10:00:00Z"}
+    r = client.post("/index", json=body)
+    assert r.status_code == 202 and r.json()["queued"] and r.json()["seq"] == 1
+    # Misma URL: se coalesce aunque el buffer esté lleno; otra URL -> 503
+    assert client.post("/index", json=body).status_code == 202
+    assert client.post("/index", json={**body, "url": "https://a.com/2"}).status_code == 503
+    assert client.get("/index/buffer").json()["pending"] == 1
+
+    buf.start()
+    assert buf.flush()
+    assert rec.batches == [["https://a.com/1"]]
+    buf.stop()
+
+
+# Menos workers tras un reinicio: los slots sin dueño se adoptan y se confirman
+def test_orphan_slots_are_adopted(tmp_path):
+    a = WriteBehindBuffer(Recorder(), journal_dir=str(tmp_path), batch_size=100, max_wait=60)
+    b = WriteBehindBuffer(Recorder(), journal_dir=str(tmp_path), batch_size=100, max_wait=60)
+    # Gana la versión más nueva de cada URL, esté en el slot propio o en el huérfano
+    b.submit(_doc("https://c/1", "vieja"))
+    a.submit(_doc("https://a/1"))
+    a.submit(_doc("https://c/1", "nueva"))
+    b.submit(_doc("https://b/1"))
+    b.submit(_doc("https://a/1", "v2"))
+    orphan_root = b.journal.root
+    a._slot_lock.close()
+    b._slot_lock.close()
+
+    seen = []
+    revived = WriteBehindBuffer(seen.extend, journal_dir=str(tmp_path), batch_size=100, max_wait=60)
+    assert revived.journal.root == a.journal.root and revived.stats()["pending"] == 3
+    revived.start()
+    assert revived.flush()
+    assert sorted((d["url"], d["content"]) for d in seen) == [
+        ("https://a/1", "v2"), ("https://b/1", "x"), ("https://c/1", "nueva")
+    ]
+    revived.stop()
+
+    assert Journal(orphan_root).recover() == []
+    again = WriteBehindBuffer(Recorder(), journal_dir=str(tmp_path))
+    assert again.stats()["pending"] == 0
+    again.stop()